@@ -0,0 +1,259 @@
+# apps/api/app/analytics.py
+"""
+Motor analítico opcional: histórico en Parquet consultado con DuckDB.
+
+Los meses cerrados de `transactions` y `expenses` se exportan a
+ANALYTICS_DIR/<tabla>/org_id=<org>/month=<YYYY-MM>/data.parquet y las
+consultas de /api/sales/timeseries y /api/sales/by-category se resuelven
+con DuckDB sobre esos ficheros, unidos a los agregados vivos de la BD
+(daily_sales / daily_expenses) desde la marca `exported_until`.
+
+Se activa con ANALYTICS_ENGINE=duckdb (requiere el extra `analytics`).
+Exportación (cron, p. ej. cada noche):
+
+    python -m app.analytics export [--org 1]
+
+Si la ingesta toca días ya exportados, la marca retrocede a ese mes y esos
+días vuelven a leerse de la BD hasta la siguiente exportación.
+"""
+import argparse
+import logging
+import os
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .db import API_DIR
+
+log = logging.getLogger(__name__)
+
+ENGINE = os.getenv("ANALYTICS_ENGINE", "db")
+ANALYTICS_DIR = Path(os.getenv("ANALYTICS_DIR", API_DIR / "data" / "analytics"))
+
+# tabla -> columnas exportadas
+EXPORTS = {
+    "transactions": ["txn_id", "date", "product_id", "quantity", "unit_price_gross", "discount"],
+    "expenses": ["id", "date", "category", "amount_gross"],
+}
+_MODELS = {"transactions": models.Transaction, "expenses": models.Expense}
+
+_warned = False
+
+
+def enabled() -> bool:
+    global _warned
+    if ENGINE != "duckdb":
+        return False
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        if not _warned:
+            log.warning("ANALYTICS_ENGINE=duckdb pero duckdb no está instalado; se usa la BD")
+            _warned = True
+        return False
+    return True
+
+
+def _add_months(d: date, n: int) -> date:
+    y, m = divmod(d.month - 1 + n, 12)
+    return date(d.year + y, m + 1, 1)
+
+
+def _month_file(table: str, org_id: int, month: date) -> Path:
+    return ANALYTICS_DIR / table / f"org_id={org_id}" / f"month={month:%Y-%m}" / "data.parquet"
+
+
+def _glob(table: str, org_id: int) -> Optional[str]:
+    base = ANALYTICS_DIR / table / f"org_id={org_id}"
+    if not any(base.glob("month=*/data.parquet")):
+        return None
+    return str(base / "month=*" / "data.parquet")
+
+
+def watermark(db: Session, org_id: int) -> Optional[date]:
+    return db.scalar(
+        select(models.AnalyticsExport.exported_until).where(models.AnalyticsExport.org_id == org_id)
+    )
+
+
+def invalidate(db: Session, org_id: int, days: Iterable[date]) -> None:
+    """La ingesta ha tocado `days`: si alguno ya estaba exportado, retrasa la marca."""
+    days = [d for d in days if d is not None]
+    if not days:
+        return
+    first = min(days).replace(day=1)
+    E = models.AnalyticsExport
+    db.execute(update(E).where(E.org_id == org_id, E.exported_until > first).values(exported_until=first))
+
+
+# ---- Exportación ----
+
+def export(db: Session, org_id: int, until: Optional[date] = None) -> List[Path]:
+    """
+    Exporta a Parquet los meses de [marca actual, until) de la organización
+    (por defecto, hasta el mes en curso, que nunca se exporta).
+    """
+    import duckdb
+    import pandas as pd
+
+    until = (until or date.today()).replace(day=1)
+    start = watermark(db, org_id)
+    if start is None:
+        firsts = [
+            db.scalar(select(func.min(m.date)).where(m.org_id == org_id)) for m in _MODELS.values()
+        ]
+        firsts = [d for d in firsts if d is not None]
+        start = min(firsts).replace(day=1) if firsts else until
+    initial = watermark(db, org_id)
+
+    written: List[Path] = []
+    con = duckdb.connect()
+    month = start
+    while month < until:
+        nxt = _add_months(month, 1)
+        for table, cols in EXPORTS.items():
+            model = _MODELS[table]
+            st = (
+                select(*(getattr(model, c) for c in cols))
+                .where(model.org_id == org_id, model.date >= month, model.date < nxt)
+            )
+            df = pd.DataFrame(db.execute(st).all(), columns=cols)
+            path = _month_file(table, org_id, month)
+            if df.empty:
+                path.unlink(missing_ok=True)
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            con.register("df", df)
+            con.execute(f"COPY (SELECT * REPLACE (CAST(date AS DATE) AS date) FROM df) TO '{tmp}' (FORMAT PARQUET)")
+            con.unregister("df")
+            os.replace(tmp, path)
+            written.append(path)
+        month = nxt
+    con.close()
+
+    # Solo se avanza la marca si nadie la ha movido durante la exportación
+    E = models.AnalyticsExport
+    if initial is None:
+        db.add(E(org_id=org_id, exported_until=until))
+    else:
+        db.execute(update(E).where(E.org_id == org_id, E.exported_until == initial).values(exported_until=until))
+    db.commit()
+    return written
+
+
+# ---- Consultas ----
+
+def _bucket(granularity: str) -> str:
+    if granularity == "day":
+        return "s.date"
+    return f"CAST(date_trunc('{granularity}', s.date) AS DATE)"
+
+
+def _connect(db: Session, org_id: int, f: Optional[date], t: Optional[date]):
+    """
+    Conexión DuckDB con las vistas `sales` (fecha, producto, ingresos, qty),
+    `exp` (fecha, importe) y `products`. Devuelve None si la organización no
+    tiene histórico exportado.
+    """
+    import duckdb
+    import pandas as pd
+    from . import catalog
+
+    wm = watermark(db, org_id)
+    sales_glob, exp_glob = _glob("transactions", org_id), _glob("expenses", org_id)
+    if wm is None or sales_glob is None:
+        return None
+
+    lo, hi = f or date.min, t or date.max
+    DS, DE = models.DailySales, models.DailyExpense
+    live_from = max(wm, lo)
+
+    con = duckdb.connect()
+    con.register("live_sales", pd.DataFrame(db.execute(
+        select(DS.date, DS.product_id, DS.revenue, DS.quantity)
+        .where(DS.org_id == org_id, DS.date >= live_from, DS.date <= hi)
+    ).all(), columns=["date", "product_id", "revenue", "quantity"]).astype({"date": "datetime64[ns]"}))
+    con.register("live_exp", pd.DataFrame(db.execute(
+        select(DE.date, DE.amount_gross)
+        .where(DE.org_id == org_id, DE.date >= live_from, DE.date <= hi)
+    ).all(), columns=["date", "amount_gross"]).astype({"date": "datetime64[ns]"}))
+    con.register("products", catalog.get(db, org_id).frame())
+
+    wm_month = f"{wm:%Y-%m}"
+    hive = "hive_partitioning = true, hive_types = {'org_id': INTEGER, 'month': VARCHAR}"
+    con.execute(f"""
+        CREATE TEMP VIEW sales AS
+        SELECT CAST(date AS DATE) AS date, product_id,
+               sum(unit_price_gross * quantity - coalesce(discount, 0)) AS revenue,
+               sum(quantity) AS quantity
+        FROM read_parquet('{sales_glob}', {hive})
+        WHERE month < '{wm_month}' AND date BETWEEN DATE '{lo}' AND DATE '{hi}'
+        GROUP BY ALL
+        UNION ALL
+        SELECT CAST(date AS DATE), product_id, revenue, quantity FROM live_sales
+    """)
+    hist_exp = (
+        f"SELECT CAST(date AS DATE) AS date, amount_gross FROM read_parquet('{exp_glob}', {hive}) "
+        f"WHERE month < '{wm_month}' AND date BETWEEN DATE '{lo}' AND DATE '{hi}' UNION ALL "
+        if exp_glob else ""
+    )
+    con.execute(f"CREATE TEMP VIEW exp AS {hist_exp}SELECT CAST(date AS DATE) AS date, amount_gross FROM live_exp")
+    return con
+
+
+def timeseries(
+    db: Session, org_id: int, granularity: str, f: Optional[date], t: Optional[date]
+) -> Optional[Tuple[list, Dict[date, float]]]:
+    """(filas (fecha, ingresos, cogs), gastos por fecha) o None si no aplica."""
+    con = _connect(db, org_id, f, t)
+    if con is None:
+        return None
+    try:
+        b = _bucket(granularity)
+        rows = con.execute(f"""
+            SELECT {b} AS d, sum(s.revenue), sum(s.quantity * coalesce(p.unit_cost, 0))
+            FROM sales s LEFT JOIN products p ON p.id = s.product_id
+            GROUP BY 1 ORDER BY 1
+        """).fetchall()
+        exp_rows = dict(con.execute(f"SELECT {b} AS d, sum(s.amount_gross) FROM exp s GROUP BY 1").fetchall())
+        return rows, exp_rows
+    finally:
+        con.close()
+
+
+def by_category(
+    db: Session, org_id: int, limit: int, f: Optional[date], t: Optional[date]
+) -> Optional[list]:
+    con = _connect(db, org_id, f, t)
+    if con is None:
+        return None
+    try:
+        return con.execute("""
+            SELECT p.category, sum(s.revenue) AS ingresos
+            FROM sales s JOIN products p ON p.id = s.product_id
+            GROUP BY 1 ORDER BY 2 DESC LIMIT ?
+        """, [limit]).fetchall()
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    from . import db as database
+    from .migrate import migrate
+
+    parser = argparse.ArgumentParser(description="Exporta los meses cerrados a Parquet para DuckDB")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("--org", type=int, default=None, help="Solo esta organización")
+    args = parser.parse_args()
+
+    migrate()  # esquema al día (tablas e índices) antes de escribir
+    with database.SessionLocal() as db:
+        org_ids = [args.org] if args.org else db.scalars(select(models.Org.id)).all()
+        for oid in org_ids:
+            paths = export(db, oid)
+            print(f"org {oid}: {len(paths)} ficheros Parquet")
@@ -0,0 +1,172 @@
+# apps/api/app/bulk.py
+"""
+Escritura masiva (upsert) para la ingesta.
+
+En lugar de hacer db.get() fila a fila, agrupamos las filas en lotes y
+lanzamos un INSERT ... ON CONFLICT DO UPDATE por lote (Postgres y SQLite).
+Para cualquier otro dialecto caemos a INSERT + UPDATE por lotes (executemany).
+"""
+import os
+from typing import Any, Iterable, Iterator, Mapping, Optional, Sequence
+
+from sqlalchemy import and_, bindparam, func, insert, select, tuple_, update
+from sqlalchemy.orm import Session
+
+Row = dict[str, Any]
+
+# Filas por sentencia. 5000 filas mantiene cada lote muy por debajo del
+# límite de parámetros de SQLite/psycopg2 cuando se envía como executemany.
+BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "5000"))
+
+
+def batched(rows: Sequence[Row], size: int = BATCH_SIZE) -> Iterator[Sequence[Row]]:
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def _dialect_insert(db: Session):
+    """
+    Devuelve el `insert` del dialecto si soporta ON CONFLICT, o None.
+    """
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert
+    if name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert
+    return None
+
+
+def existing_keys(db: Session, table, keys: Sequence[str], rows: Iterable[Row]) -> set[tuple]:
+    """
+    Claves de `rows` que ya existen en la tabla (una sola SELECT por lote).
+    """
+    cols = [table.c[k] for k in keys]
+    values = list({tuple(r[k] for k in keys) for r in rows})
+    if not values:
+        return set()
+    if len(cols) == 1:
+        stmt = select(cols[0]).where(cols[0].in_([v[0] for v in values]))
+    else:
+        stmt = select(*cols).where(tuple_(*cols).in_(values))
+    return {tuple(r) for r in db.execute(stmt)}
+
+
+def _update_rows(db: Session, table, rows, keys, update_cols, coalesce) -> None:
+    """UPDATE por clave en executemany (una sentencia para todo el lote)."""
+    if not rows or not update_cols:
+        return
+    stmt = (
+        update(table)
+        .where(and_(*(table.c[k] == bindparam(f"k_{k}") for k in keys)))
+        .values({
+            c: func.coalesce(bindparam(f"v_{c}"), table.c[c]) if c in coalesce else bindparam(f"v_{c}")
+            for c in update_cols
+        })
+    )
+    db.execute(stmt, [
+        {**{f"k_{k}": r[k] for k in keys}, **{f"v_{c}": r[c] for c in update_cols}}
+        for r in rows
+    ])
+
+
+def bulk_upsert(
+    db: Session,
+    model,
+    rows: Sequence[Row],
+    keys: Sequence[str],
+    *,
+    defaults: Optional[Mapping[str, Any]] = None,
+    coalesce: Iterable[str] = (),
+    conflict: Optional[Sequence[str]] = None,
+) -> tuple[int, int]:
+    """
+    Inserta o actualiza `rows` en la tabla de `model` por lotes.
+
+    - `keys`: columnas de la restricción única que define el conflicto.
+    - `defaults`: valores para columnas a None, solo en filas nuevas.
+    - `coalesce`: columnas que, si llegan a None, conservan el valor actual.
+    - `conflict`: objetivo de ON CONFLICT si no coincide con `keys` (p. ej.
+      tablas particionadas, cuya clave única incluye la fecha).
+
+    Devuelve (insertadas, actualizadas). Todas las filas deben tener las
+    mismas claves de diccionario.
+    """
+    if not rows:
+        return 0, 0
+    table = model.__table__
+    coalesce = set(coalesce)
+    defaults = dict(defaults or {})
+    conflict = list(conflict or keys)
+    update_cols = [c for c in rows[0] if c not in conflict]
+    dialect_insert = _dialect_insert(db)
+
+    inserted = updated = 0
+    for batch in batched(rows):
+        # La última fila gana: ON CONFLICT no puede tocar dos veces la misma
+        # fila dentro de una sentencia.
+        uniq = {tuple(r[k] for k in keys): r for r in batch}
+        found = existing_keys(db, table, keys, uniq.values())
+
+        new_rows: list[Row] = []
+        old_rows: list[Row] = []
+        for key, r in uniq.items():
+            if key in found:
+                old_rows.append(r)
+            else:
+                r = dict(r)
+                for col, value in defaults.items():
+                    if col in r and r[col] is None:
+                        r[col] = value
+                new_rows.append(r)
+
+        inserted += len(new_rows)
+        updated += len(old_rows) + (len(batch) - len(uniq))
+
+        if dialect_insert is not None:
+            stmt = dialect_insert(table)
+            set_ = {c: stmt.excluded[c] for c in update_cols}
+            if set_:
+                stmt = stmt.on_conflict_do_update(index_elements=[table.c[k] for k in conflict], set_=set_)
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=[table.c[k] for k in conflict])
+            # Con columnas `coalesce` las filas existentes van por UPDATE: un
+            # None en el INSERT propuesto rompería las columnas NOT NULL.
+            upsert_rows = new_rows if coalesce else new_rows + old_rows
+            if upsert_rows:
+                db.execute(stmt, upsert_rows)
+            if coalesce:
+                _update_rows(db, table, old_rows, keys, update_cols, coalesce)
+            continue
+
+        if new_rows:
+            db.execute(insert(table), new_rows)
+        _update_rows(db, table, old_rows, keys, update_cols, coalesce)
+
+    return inserted, updated
+
+
+def bulk_insert_missing(db: Session, model, rows: Sequence[Row], keys: Sequence[str]) -> int:
+    """
+    Inserta solo las filas cuya clave no exista todavía (ON CONFLICT DO NOTHING).
+    Devuelve cuántas filas nuevas se han creado.
+    """
+    if not rows:
+        return 0
+    table = model.__table__
+    dialect_insert = _dialect_insert(db)
+    created = 0
+    for batch in batched(rows):
+        uniq = {tuple(r[k] for k in keys): r for r in batch}
+        found = existing_keys(db, table, keys, uniq.values())
+        new_rows = [r for key, r in uniq.items() if key not in found]
+        if not new_rows:
+            continue
+        created += len(new_rows)
+        if dialect_insert is not None:
+            stmt = dialect_insert(table).on_conflict_do_nothing(index_elements=[table.c[k] for k in keys])
+            db.execute(stmt, new_rows)
+        else:
+            db.execute(insert(table), new_rows)
+    return created
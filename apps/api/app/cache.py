@@ -0,0 +1,239 @@
+# apps/api/app/cache.py
+"""
+Caché de respuestas para la analítica de ventas (/api/sales/*).
+
+- Backend: Redis si hay REDIS_URL. Sin él no hay caché: la ingesta (workers
+  de Celery, otros workers de la API) no podría invalidar la memoria de
+  este proceso. CACHE_LOCAL=1 usa un LRU en memoria, solo válido con un
+  único proceso (desarrollo, tests, bench/run.py).
+- Clave: (endpoint, org_id, versión de datos de la org, resto de parámetros).
+- Invalidación: la ingesta llama a bump_version(org_id) tras cada commit, con
+  lo que las claves antiguas dejan de usarse (y caducan por TTL).
+- ETag: derivado de la clave, así un If-None-Match se resuelve con un 304 sin
+  calcular ni leer la respuesta.
+
+El catálogo de productos (app/catalog.py) usa las mismas versiones.
+
+Middleware ASGI puro: las rutas que no se cachean pasan sin tocarse.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+from urllib.parse import urlencode
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders, QueryParams
+from starlette.responses import Response
+
+log = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL")
+# Sin Redis: LRU por proceso (solo con un único proceso; si no, sin caché)
+CACHE_LOCAL = os.getenv("CACHE_LOCAL", "0") == "1"
+# CACHE_ENABLED=0 desactiva la caché (p. ej. para medir con bench/run.py)
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "1") == "1"
+CACHE_TTL = int(os.getenv("CACHE_TTL_SECONDS", "3600"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+KEY_PREFIX = "leaf:cache"
+
+
+class _LocalBackend:
+    """LRU con TTL en memoria (por proceso)."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: int = CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._versions: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def version(self, org_id: str) -> Optional[int]:
+        with self._lock:
+            return self._versions.get(org_id, 0)
+
+    def bump(self, org_id: str) -> None:
+        with self._lock:
+            self._versions[org_id] = self._versions.get(org_id, 0) + 1
+
+
+class _NullBackend:
+    """Sin backend compartido: sin versión fiable, nunca se cachea."""
+
+    def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    def set(self, key: str, value: bytes) -> None:
+        pass
+
+    def version(self, org_id: str) -> Optional[int]:
+        return None
+
+    def bump(self, org_id: str) -> None:
+        pass
+
+
+class _RedisBackend:
+    """
+    Caché compartida en Redis. Si Redis falla se trata como fallo de caché
+    (se calcula la respuesta sin guardarla), nunca como error de la petición.
+    """
+
+    def __init__(self, url: str, ttl: int = CACHE_TTL):
+        import redis
+
+        self.ttl = ttl
+        self._errors = redis.RedisError
+        self._client = redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self._client.get(key)
+        except self._errors:
+            log.warning("Redis no disponible al leer la caché", exc_info=True)
+            return None
+
+    def set(self, key: str, value: bytes) -> None:
+        try:
+            self._client.set(key, value, ex=self.ttl)
+        except self._errors:
+            log.warning("Redis no disponible al escribir la caché", exc_info=True)
+
+    def version(self, org_id: str) -> Optional[int]:
+        try:
+            return int(self._client.get(f"{KEY_PREFIX}:ver:{org_id}") or 0)
+        except self._errors:
+            return None  # sin versión fiable no se usa la caché
+
+    def bump(self, org_id: str) -> None:
+        try:
+            self._client.incr(f"{KEY_PREFIX}:ver:{org_id}")
+        except self._errors:
+            log.error("No se pudo invalidar la caché de la org %s", org_id, exc_info=True)
+
+
+_backend = None
+
+
+def make_backend(redis_url: Optional[str] = REDIS_URL, local: bool = CACHE_LOCAL):
+    if redis_url:
+        return _RedisBackend(redis_url)
+    if local:
+        return _LocalBackend()
+    log.info("Caché de respuestas desactivada: sin REDIS_URL (CACHE_LOCAL=1 para un solo proceso)")
+    return _NullBackend()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = make_backend()
+    return _backend
+
+
+def bump_version(org_id: int) -> None:
+    """Invalida todas las respuestas cacheadas de la organización."""
+    get_backend().bump(str(org_id))
+
+
+def cache_key(endpoint: str, org_id: str, version: int, params: Iterable[tuple[str, str]]) -> str:
+    """Parámetros como pares: los repetidos (ma=7&ma=30) cuentan todos."""
+    rest = urlencode(sorted(params))
+    return f"{KEY_PREFIX}:{endpoint}:{org_id}:v{version}:{rest}"
+
+
+class ResponseCacheMiddleware:
+    """
+    Cachea las respuestas 200 de los GET `prefix/<endpoint>` indicados. El
+    resto de peticiones (y todas si no hay versión de datos) pasan directas.
+    """
+
+    def __init__(self, app, prefix: str, endpoints: Iterable[str]):
+        self.app = app
+        self.prefix = prefix.rstrip("/")
+        self.endpoints = set(endpoints)
+
+    def _endpoint(self, scope) -> Optional[str]:
+        path = scope["path"]
+        if not path.startswith(self.prefix + "/"):
+            return None
+        return path[len(self.prefix) + 1:].strip("/")
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or not CACHE_ENABLED or scope["method"] != "GET"
+                or self._endpoint(scope) not in self.endpoints):
+            await self.app(scope, receive, send)
+            return
+
+        backend = get_backend()
+        query = QueryParams(scope["query_string"])
+        org_id = query.get("org_id", "1")
+        params = [(k, v) for k, v in query.multi_items() if k != "org_id"]
+        version = await run_in_threadpool(backend.version, org_id)
+        if version is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = cache_key(self._endpoint(scope), org_id, version, params)
+        etag = 'W/"%s"' % hashlib.sha1(key.encode()).hexdigest()[:20]
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+        if etag in Headers(scope=scope).get("if-none-match", ""):
+            await Response(status_code=304, headers=headers)(scope, receive, send)
+            return
+
+        body = await run_in_threadpool(backend.get, key)
+        if body is not None:
+            response = Response(body, media_type="application/json", headers={**headers, "X-Cache": "HIT"})
+            await response(scope, receive, send)
+            return
+
+        # Fallo de caché: se acumula el cuerpo de la respuesta 200 para
+        # guardarlo; cualquier otro estado pasa tal cual
+        start: dict = {}
+        chunks: list[bytes] = []
+
+        async def capture(message) -> None:
+            if message["type"] == "http.response.start":
+                if message["status"] != 200:
+                    await send(message)
+                    return
+                start.update(message)
+                return
+            if not start:
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            out = MutableHeaders(raw=list(start["headers"]))
+            out.update({**headers, "X-Cache": "MISS"})
+            out["content-length"] = str(len(body))
+            await send({**start, "headers": out.raw})
+            await send({"type": "http.response.body", "body": body})
+            await run_in_threadpool(backend.set, key, body)
+
+        await self.app(scope, receive, capture)
@@ -0,0 +1,152 @@
+# apps/api/app/catalog.py
+"""
+Catálogo de productos por organización, precargado y en memoria.
+
+Una sola consulta carga todos los productos de la org en arrays paralelos
+(id → coste, IVA, categoría, nombre); las búsquedas son vectoriales con
+Index.get_indexer. Lo usan la ingesta (qué productos faltan por crear y,
+con INGEST_UNKNOWN_PRODUCTS=reject, cuáles son desconocidos) y la
+analítica (nombres y categorías sin JOIN con `products`).
+
+Invalidación: la ingesta marca la sesión al escribir productos y, tras el
+commit, se incrementa la versión `catalog:<org>` del backend de app/cache.py,
+así el resto de workers recargan en la siguiente lectura. Sin backend
+compartido (Redis) no se guarda nada y cada lectura va a la BD.
+"""
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import event, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import models
+from .cache import get_backend
+
+_DIRTY = "catalog_dirty"
+
+
+class Catalog:
+    """Productos de una organización como arrays alineados con `ids`."""
+
+    __slots__ = ("ids", "unit_cost", "vat_rate", "category", "name")
+
+    def __init__(self, rows: list):
+        cols = list(zip(*rows)) or [(), (), (), (), ()]
+        self.ids = pd.Index(cols[0], dtype=object)
+        self.name = np.array(cols[1], dtype=object)
+        # Pocas categorías distintas: códigos + tabla
+        self.category = pd.Categorical(cols[2])
+        self.unit_cost = np.array(cols[3], dtype=np.float64)
+        self.vat_rate = np.array(cols[4], dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def positions(self, product_ids) -> np.ndarray:
+        """Posición de cada id en el catálogo (-1 si no está)."""
+        return self.ids.get_indexer(pd.Index(product_ids, dtype=object))
+
+    def missing(self, product_ids: pd.Series) -> pd.Series:
+        """Ids distintos de `product_ids` que no están en el catálogo."""
+        uniq = pd.Series(pd.unique(product_ids.dropna()), dtype=object)
+        return uniq[self.positions(uniq) < 0]
+
+    def _take(self, values: np.ndarray, product_ids, fallback) -> np.ndarray:
+        pos = self.positions(product_ids)
+        out = np.array(fallback if np.ndim(fallback) else [fallback] * len(pos), dtype=object)
+        found = pos >= 0
+        out[found] = values[pos[found]]
+        return out
+
+    def _category_values(self) -> np.ndarray:
+        cats = np.asarray(self.category, dtype=object)
+        cats[pd.isna(cats)] = None
+        return cats
+
+    def names(self, product_ids) -> np.ndarray:
+        """Nombre de cada producto; el propio id si no está en el catálogo."""
+        return self._take(self.name, product_ids, np.asarray(product_ids, dtype=object))
+
+    def categories(self, product_ids) -> np.ndarray:
+        """Categoría de cada producto (None si no tiene o no está en el catálogo)."""
+        return self._take(self._category_values(), product_ids, None)
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            "id": self.ids.to_numpy(), "name": self.name,
+            "category": self._category_values(), "unit_cost": self.unit_cost,
+        })
+
+
+_cache: dict[int, tuple[int, Catalog]] = {}
+_lock = threading.Lock()
+
+
+def _query(org_id: int):
+    P = models.Product
+    return (
+        select(P.id, P.name, P.category, P.unit_cost, P.vat_rate)
+        .where(or_(P.org_id == org_id, P.org_id.is_(None)))
+    )
+
+
+def _version(org_id: int) -> Optional[int]:
+    return get_backend().version(f"catalog:{org_id}")
+
+
+def _cached(org_id: int, version: Optional[int]) -> Optional[Catalog]:
+    if version is None:
+        return None
+    with _lock:
+        hit = _cache.get(org_id)
+    return hit[1] if hit is not None and hit[0] == version else None
+
+
+def _store(org_id: int, version: Optional[int], cat: Catalog) -> Catalog:
+    if version is not None:
+        with _lock:
+            _cache[org_id] = (version, cat)
+    return cat
+
+
+def get(db: Session, org_id: int) -> Catalog:
+    """Catálogo de la org; lo recarga si otra ingesta lo ha invalidado."""
+    version = _version(org_id)
+    cat = _cached(org_id, version)
+    if cat is None:
+        cat = _store(org_id, version, Catalog(db.execute(_query(org_id)).all()))
+    return cat
+
+
+async def get_async(s: AsyncSession, org_id: int) -> Catalog:
+    version = await run_in_threadpool(_version, org_id)
+    cat = _cached(org_id, version)
+    if cat is None:
+        cat = _store(org_id, version, Catalog((await s.execute(_query(org_id))).all()))
+    return cat
+
+
+def mark_dirty(db: Session, org_id: int) -> None:
+    """La sesión ha escrito productos de `org_id`: se invalida al confirmar."""
+    db.info.setdefault(_DIRTY, set()).add(org_id)
+
+
+def invalidate(org_id: int) -> None:
+    with _lock:
+        _cache.pop(org_id, None)
+    get_backend().bump(f"catalog:{org_id}")
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    for org_id in session.info.pop(_DIRTY, ()):
+        invalidate(org_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_DIRTY, None)
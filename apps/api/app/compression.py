@@ -0,0 +1,126 @@
+# apps/api/app/compression.py
+"""
+Compresión de respuestas negociada con Accept-Encoding (brotli > gzip).
+
+Middleware ASGI puro: comprime al vuelo también las respuestas en streaming
+(exportaciones), bloque a bloque, sin acumularlas en memoria. Solo comprime
+tipos de texto/JSON por encima de COMPRESS_MIN_BYTES; Parquet u otros
+binarios ya comprimidos pasan tal cual. Brotli requiere el paquete `brotli`
+(extra `compression`); sin él se ofrece solo gzip.
+"""
+import os
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - extra opcional
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# Calidad baja-media: para contenido dinámico importa más la CPU que el último byte
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE = ("text/", "application/json", "application/x-ndjson")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """'br' o 'gzip' según lo que acepte el cliente (q=0 descarta)."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._flush = self._c.flush
+            self._finish = self._c.finish
+            self._compress = self._c.process
+        else:
+            self._c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: cabecera gzip
+            self._flush = lambda: self._c.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._c.flush
+            self._compress = self._c.compress
+
+    def chunk(self, data: bytes) -> bytes:
+        """Comprime un bloque intermedio y lo vacía para enviarlo ya."""
+        return self._compress(data) + self._flush()
+
+    def last(self, data: bytes) -> bytes:
+        return self._compress(data) + self._finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                headers = Headers(raw=message["headers"])
+                ctype = headers.get("content-type", "")
+                passthrough = "content-encoding" in headers or not ctype.startswith(COMPRESSIBLE)
+                if passthrough:
+                    await send(message)
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if compressor is None:
+                if not more and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                headers = MutableHeaders(raw=start["headers"])
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    del headers["content-length"]
+                if not more:
+                    body = compressor.last(body)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start)
+            body = compressor.chunk(body) if more else compressor.last(body)
+            await send({"type": "http.response.body", "body": body, "more_body": more})
+
+        await self.app(scope, receive, send_wrapper)
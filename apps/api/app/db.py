@@ -1,8 +1,15 @@
 import os
 from pathlib import Path
+from typing import AsyncIterator, Iterator
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from .metrics import instrument_engine
+from .pools import PoolStats, instrumented
+from . import slowlog
 
 # Cargar .env de forma robusta (busca apps/api/.env o leaf-ai/.env)
 HERE = Path(__file__).resolve()
@@ -17,12 +24,54 @@ else:
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Driver asíncrono equivalente al de DATABASE_URL
+_ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+def async_url(url: str | None) -> str | None:
+    """postgresql[+psycopg2]://... -> postgresql+asyncpg://..., sqlite -> sqlite+aiosqlite."""
+    if not url:
+        return url
+    u = make_url(url)
+    driver = _ASYNC_DRIVERS.get(u.get_backend_name())
+    return u.set(drivername=driver).render_as_string(hide_password=False) if driver else url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_url(DATABASE_URL)
+
+# Pools (Postgres). Conexiones por worker = DB_POOL_SIZE + DB_MAX_OVERFLOW
+# (sync) + ASYNC_POOL_SIZE + ASYNC_MAX_OVERFLOW (async); el total de todos los
+# workers debe quedar por debajo de max_connections. Ver /api/health/pool.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# El engine asíncrono limita las consultas de analítica en vuelo por worker
+ASYNC_POOL_SIZE = int(os.getenv("ASYNC_POOL_SIZE", "20"))
+ASYNC_MAX_OVERFLOW = int(os.getenv("ASYNC_MAX_OVERFLOW", "80"))
+# Segundos esperando conexión libre antes de fallar / vida máxima de una conexión
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
 _engine = None
 SessionLocal = None
 
+_async_engine = None
+AsyncSessionLocal = None
+
+POOL_STATS = {"sync": PoolStats("sync"), "async": PoolStats("async")}
+
 class Base(DeclarativeBase):
     pass
 
+def _pool_args(url: str, base: type, stats: PoolStats, size: int, overflow: int) -> dict:
+    """Pool instrumentado con tamaño configurable (SQLite usa el pool por defecto)."""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "poolclass": instrumented(base, stats),
+        "pool_size": size,
+        "max_overflow": overflow,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+
 def init_engine():
     global _engine, SessionLocal
     if _engine is None:
@@ -30,6 +79,53 @@ def init_engine():
         connect_args = {}
         if DATABASE_URL.startswith("sqlite"):
             connect_args = {"check_same_thread": False}
-        _engine = create_engine(DATABASE_URL, pool_pre_ping=True, connect_args=connect_args)
+        _engine = create_engine(
+            DATABASE_URL, pool_pre_ping=True, connect_args=connect_args,
+            **_pool_args(DATABASE_URL, QueuePool, POOL_STATS["sync"], DB_POOL_SIZE, DB_MAX_OVERFLOW),
+        )
+        instrument_engine(_engine, "sync")
+        slowlog.install(_engine)
         SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
     return _engine
+
+def init_async_engine():
+    """
+    Engine asíncrono (asyncpg / aiosqlite) para los endpoints de solo lectura:
+    las consultas esperan en el event loop en lugar de ocupar un hilo.
+    """
+    global _async_engine, AsyncSessionLocal
+    if _async_engine is None:
+        assert ASYNC_DATABASE_URL, "DATABASE_URL no configurada"
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL, pool_pre_ping=True,
+            **_pool_args(ASYNC_DATABASE_URL, AsyncAdaptedQueuePool, POOL_STATS["async"],
+                         ASYNC_POOL_SIZE, ASYNC_MAX_OVERFLOW),
+        )
+        instrument_engine(_async_engine.sync_engine, "async")
+        slowlog.install(_async_engine.sync_engine)
+        AsyncSessionLocal = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+async def close_async_engine() -> None:
+    global _async_engine, AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = AsyncSessionLocal = None
+
+# ---- Dependencias FastAPI: una sesión por petición ----
+
+def get_db() -> Iterator[Session]:
+    init_engine()
+    with SessionLocal() as db:
+        yield db
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    init_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def pool_status() -> list[dict]:
+    """Estado y contadores de los pools instrumentados (engines ya creados)."""
+    engines = [_engine, _async_engine]
+    pools = [e.pool for e in engines if e is not None]
+    return [p.stats.snapshot(p) for p in pools if hasattr(p, "stats")]
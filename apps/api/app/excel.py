@@ -0,0 +1,66 @@
+# apps/api/app/excel.py
+"""
+Lectura rápida de Excel (.xlsx / .xls) para la ingesta.
+
+- Motor: calamine (Rust, extra `excel`) si está instalado; si no, el de
+  pandas por defecto (openpyxl), varias veces más lento.
+- Las hojas se decodifican en un pool de procesos (una tarea por hoja), así
+  un libro grande no acapara el GIL del worker de la API ni las hojas de un
+  mismo libro se leen en serie. INGEST_EXCEL_WORKERS=0 lee en el proceso
+  actual; también se hace así dentro de procesos daemon (workers de Celery),
+  que no pueden crear hijos.
+- Se leen todas las hojas con las columnas de la plantilla; si ninguna las
+  tiene, la primera (la validación de cabecera dará el error).
+"""
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Iterator, Optional, Sequence
+
+import pandas as pd
+
+try:
+    import python_calamine  # noqa: F401
+    ENGINE: Optional[str] = "calamine"
+except ImportError:  # pragma: no cover - extra opcional
+    ENGINE = None
+
+EXCEL_WORKERS = int(os.getenv("INGEST_EXCEL_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if EXCEL_WORKERS <= 0 or multiprocessing.current_process().daemon:
+        return None
+    if _pool is None:
+        # spawn: el proceso de la API tiene hilos, fork no es seguro
+        _pool = ProcessPoolExecutor(EXCEL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _read_sheet(data: bytes, sheet: str, wanted: Sequence[str], dtype: dict) -> pd.DataFrame:
+    """Una hoja con solo las columnas de la plantilla (se ejecuta en el pool)."""
+    wanted = set(wanted)
+    return pd.read_excel(
+        io.BytesIO(data), sheet_name=sheet, engine=ENGINE, dtype=dtype,
+        usecols=lambda c: str(c).strip() in wanted,
+    )
+
+
+def read_frames(fh: BinaryIO, wanted: Sequence[str], dtype: dict) -> Iterator[pd.DataFrame]:
+    """Un DataFrame por hoja con las columnas de la plantilla, en orden de hoja."""
+    data = fh.read()
+    sheets = pd.ExcelFile(io.BytesIO(data), engine=ENGINE).sheet_names
+    pool = _get_pool()
+    if pool is None:
+        frames = [_read_sheet(data, s, wanted, dtype) for s in sheets]
+    else:
+        futures = [pool.submit(_read_sheet, data, s, wanted, dtype) for s in sheets]
+        frames = [f.result() for f in futures]
+
+    required = {c.strip() for c in wanted}
+    matching = [df for df in frames if required <= {str(c).strip() for c in df.columns}]
+    yield from matching or frames[:1]
@@ -0,0 +1,141 @@
+# apps/api/app/exports.py
+"""
+Exportación masiva en streaming (CSV / NDJSON / Parquet).
+
+La consulta se ejecuta con cursor de servidor (stream_results + yield_per) y
+cada lote se codifica y se envía al cliente según llega: la memoria no
+depende del número de filas exportadas. Parquet requiere pyarrow (extra
+`export`); se escribe un row group por lote.
+"""
+import csv
+import io
+import json
+import os
+from typing import Iterator, Literal, Sequence
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Date, Float, Integer
+
+from .db import init_engine
+from . import db as database
+
+# Filas por lote leído del cursor (y por row group en Parquet)
+EXPORT_BATCH = int(os.getenv("EXPORT_BATCH_ROWS", "10000"))
+
+ExportFormat = Literal["csv", "ndjson", "parquet"]
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def check_format(fmt: ExportFormat) -> None:
+    """Valida el formato antes de empezar a enviar la respuesta."""
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(400, "La exportación a Parquet requiere pyarrow (extra `export`)")
+
+
+def _batches(stmt) -> Iterator[Sequence]:
+    init_engine()
+    with database.SessionLocal() as db:
+        result = db.execute(stmt, execution_options={"stream_results": True, "yield_per": EXPORT_BATCH})
+        yield from result.partitions()
+
+
+def _csv(names: list[str], batches) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(names)
+    for part in batches:
+        writer.writerows(part)
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+
+def _ndjson(names: list[str], batches) -> Iterator[bytes]:
+    for part in batches:
+        yield "".join(
+            json.dumps(dict(zip(names, row)), default=str, ensure_ascii=False) + "\n" for row in part
+        ).encode()
+
+
+class _Sink(io.RawIOBase):
+    """Destino de ParquetWriter que se vacía tras cada row group."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def drain(self) -> bytes:
+        out, self._chunks = b"".join(self._chunks), []
+        return out
+
+
+def _arrow_type(sql_type):
+    import pyarrow as pa
+
+    if isinstance(sql_type, Date):
+        return pa.date32()
+    if isinstance(sql_type, Float):
+        return pa.float64()
+    if isinstance(sql_type, Integer):
+        return pa.int64()
+    return pa.string()
+
+
+def _parquet(columns, batches) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(c.name, _arrow_type(c.type)) for c in columns])
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for part in batches:
+            values = list(zip(*part))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(v, type=f.type) for v, f in zip(values, schema)], schema=schema
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def stream(stmt, fmt: ExportFormat) -> Iterator[bytes]:
+    columns = list(stmt.selected_columns)
+    names = [c.name for c in columns]
+    if fmt == "csv":
+        return _csv(names, _batches(stmt))
+    if fmt == "ndjson":
+        return _ndjson(names, _batches(stmt))
+    return _parquet(columns, _batches(stmt))
+
+
+def response(stmt, fmt: ExportFormat, filename: str) -> StreamingResponse:
+    check_format(fmt)
+    return StreamingResponse(
+        stream(stmt, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
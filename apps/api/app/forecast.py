@@ -0,0 +1,193 @@
+# apps/api/app/forecast.py
+"""
+Previsión de demanda por producto, precalculada en lote.
+
+Modelo: suavizado exponencial simple sobre la serie desestacionalizada con
+factores por día de la semana (lunes..domingo). Se ajustan todos los SKU de
+la organización a la vez sobre una matriz (sku × día) construida a partir de
+las ventas diarias (daily_sales, el agregado de `transactions`): el bucle
+recorre los días y cada paso opera sobre todos los SKU con NumPy.
+
+Solo se reajustan los SKU cuya huella de ventas (nº de días, unidades y
+última fecha) ha cambiado desde la última ejecución. Para los demás, los
+días sin ventas transcurridos desde `fitted_until` se aplican al leer la
+previsión (con ventas 0 el nivel decae exactamente (1 - alpha) por día).
+
+Ejecución: tarea periódica de Celery (`forecast.run_all`, ver app/worker.py)
+o a mano:
+
+    python -m app.forecast            # todas las organizaciones
+    python -m app.forecast --org 1 --full
+"""
+import argparse
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .bulk import BATCH_SIZE, bulk_upsert
+
+# Días de historial usados en el ajuste y constante de suavizado
+FORECAST_WINDOW = int(os.getenv("FORECAST_WINDOW_DAYS", "112"))
+FORECAST_ALPHA = float(os.getenv("FORECAST_ALPHA", "0.2"))
+# Días con ventas a partir de los cuales la estacionalidad pesa la mitad
+SEASON_SHRINK = 14
+
+SEASON_COLUMNS = [f"season_{d}" for d in range(7)]
+
+
+def fit(y: np.ndarray, weekdays: np.ndarray, alpha: float = FORECAST_ALPHA) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ajusta todos los SKU a la vez.
+
+    y: matriz (sku × día) de unidades vendidas; weekdays: día de la semana
+    (0 = lunes) de cada columna. Devuelve (nivel final, factores (sku × 7)).
+    """
+    n, days = y.shape
+    onehot = np.zeros((days, 7))
+    onehot[np.arange(days), weekdays] = 1.0
+
+    # Factores semanales: media de cada día de la semana / media global,
+    # encogidos hacia 1 cuando hay pocos días con ventas
+    per_wd = (y @ onehot) / np.maximum(onehot.sum(axis=0), 1.0)
+    mean = y.mean(axis=1, keepdims=True)
+    raw = np.divide(per_wd, mean, out=np.ones_like(per_wd), where=mean > 0)
+    sold_days = (y > 0).sum(axis=1, keepdims=True)
+    season = 1.0 + (raw - 1.0) * sold_days / (sold_days + SEASON_SHRINK)
+    season = np.maximum(season, 0.05)
+    season /= season.mean(axis=1, keepdims=True)
+
+    # Suavizado exponencial de la serie desestacionalizada
+    z = y / season[:, weekdays]
+    level = z[:, :min(7, days)].mean(axis=1)
+    for t in range(days):
+        level = alpha * z[:, t] + (1.0 - alpha) * level
+    return level, season
+
+
+def horizon_demand(fc: pd.DataFrame, start: date, h: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Para cada fila de `fc` (columnas de DemandForecast): demanda diaria media
+    y demanda total de los `h` días desde `start`, con el decaimiento de los
+    días transcurridos desde `fitted_until` sin reajuste.
+    """
+    if fc.empty:
+        return np.zeros(0), np.zeros(0)
+    fitted = pd.to_datetime(fc["fitted_until"]).to_numpy(dtype="datetime64[D]")
+    gap = (np.datetime64(start - timedelta(days=1), "D") - fitted).astype(np.int64).clip(min=0)
+    level = fc["level"].to_numpy(dtype=float) * (1.0 - fc["alpha"].to_numpy(dtype=float)) ** gap
+
+    counts = np.bincount([(start + timedelta(days=i)).weekday() for i in range(h)], minlength=7)
+    season = fc[SEASON_COLUMNS].to_numpy(dtype=float)
+    return level, level * (season @ counts)
+
+
+def load_forecasts(conn, org_id: int) -> pd.DataFrame:
+    F = models.DemandForecast
+    cols = ["product_id", "level", "alpha", "fitted_until", *SEASON_COLUMNS]
+    return pd.DataFrame(
+        conn.execute(select(*(getattr(F, c) for c in cols)).where(F.org_id == org_id)).all(),
+        columns=cols,
+    )
+
+
+def _signatures(db: Session, org_id: int) -> pd.Series:
+    DS = models.DailySales
+    rows = db.execute(
+        select(DS.product_id, func.count(), func.sum(DS.quantity), func.max(DS.date))
+        .where(DS.org_id == org_id)
+        .group_by(DS.product_id)
+    ).all()
+    return pd.Series(
+        {pid: f"{n}:{qty or 0:.4f}:{last}" for pid, n, qty, last in rows}, dtype=object
+    )
+
+
+def _matrix(db: Session, org_id: int, pids: list, start: date, days: int) -> np.ndarray:
+    DS = models.DailySales
+    pos = pd.Index(pids)
+    y = np.zeros((len(pids), days))
+    for i in range(0, len(pids), BATCH_SIZE):
+        part = pids[i:i + BATCH_SIZE]
+        df = pd.DataFrame(db.execute(
+            select(DS.product_id, DS.date, DS.quantity)
+            .where(DS.org_id == org_id, DS.date >= start, DS.product_id.in_(part))
+        ).all(), columns=["product_id", "date", "quantity"])
+        if df.empty:
+            continue
+        rows = pos.get_indexer(df["product_id"])
+        cols = (pd.to_datetime(df["date"]) - pd.Timestamp(start)).dt.days.to_numpy()
+        np.add.at(y, (rows, cols), df["quantity"].fillna(0).to_numpy(dtype=float))
+    return y
+
+
+def run(db: Session, org_id: int, full: bool = False,
+        window: int = FORECAST_WINDOW, alpha: float = FORECAST_ALPHA) -> int:
+    """
+    Reajusta las previsiones de la organización (solo los SKU con cambios,
+    salvo `full`) y actualiza Inventory.demand_h. Devuelve los SKU ajustados.
+    """
+    DS, F, I = models.DailySales, models.DemandForecast, models.Inventory
+    last = db.scalar(select(func.max(DS.date)).where(DS.org_id == org_id))
+    if last is None:
+        return 0
+
+    current = _signatures(db, org_id)
+    if not full:
+        stored = pd.Series(dict(db.execute(
+            select(F.product_id, F.signature).where(F.org_id == org_id)
+        ).all()), dtype=object)
+        current = current[current.ne(stored.reindex(current.index))]
+    if current.empty:
+        return 0
+
+    pids = current.index.tolist()
+    start = last - timedelta(days=window - 1)
+    weekdays = (np.arange(window) + start.weekday()) % 7
+    level, season = fit(_matrix(db, org_id, pids, start, window), weekdays, alpha)
+
+    # fitted_at va en el payload: ON CONFLICT DO UPDATE no aplica onupdate
+    fitted_at = datetime.now(timezone.utc)
+    rows = [
+        {"org_id": org_id, "product_id": pid, "level": float(lv), "alpha": alpha,
+         "fitted_until": last, "fitted_at": fitted_at, "signature": current[pid],
+         **dict(zip(SEASON_COLUMNS, map(float, s)))}
+        for pid, lv, s in zip(pids, level, season)
+    ]
+    bulk_upsert(db, F, rows, keys=["org_id", "product_id"])
+
+    # demand_h del inventario = demanda diaria prevista
+    inv = I.__table__
+    db.execute(
+        update(inv)
+        .where(inv.c.org_id == org_id, inv.c.product_id == bindparam("pid"))
+        .values(demand_h=bindparam("lv")),
+        [{"pid": r["product_id"], "lv": round(r["level"], 4)} for r in rows],
+    )
+    db.commit()
+    return len(rows)
+
+
+def run_all(db: Session, full: bool = False) -> dict[int, int]:
+    return {oid: run(db, oid, full) for oid in db.scalars(select(models.Org.id)).all()}
+
+
+if __name__ == "__main__":
+    from . import db as database
+    from .migrate import migrate
+
+    parser = argparse.ArgumentParser(description="Recalcula las previsiones de demanda por producto")
+    parser.add_argument("--org", type=int, default=None, help="Solo esta organización")
+    parser.add_argument("--full", action="store_true", help="Reajusta todos los SKU, aunque no hayan cambiado")
+    args = parser.parse_args()
+
+    migrate()  # esquema al día (tablas e índices) antes de escribir
+    with database.SessionLocal() as db:
+        result = {args.org: run(db, args.org, args.full)} if args.org else run_all(db, args.full)
+        for oid, n in result.items():
+            print(f"org {oid}: {n} SKU reajustados")
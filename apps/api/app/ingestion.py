@@ -0,0 +1,270 @@
+# apps/api/app/ingestion.py
+"""
+Motor de la ingesta: lectura de CSV/Excel por bloques, validación, escritura
+masiva y confirmación por bloque.
+
+Aquí vive todo lo que necesita pandas. El router (app/routers/ingest.py)
+solo define la API e importa este módulo dentro de cada endpoint, así un
+worker que solo sirve analítica no carga pandas al arrancar.
+"""
+from __future__ import annotations
+from typing import BinaryIO, Iterable, Iterator
+
+import pandas as pd
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from . import db as database
+from . import analytics, catalog, dedup, excel, models, partitions, rollups, validation
+from .bulk import bulk_upsert, bulk_insert_missing
+from .cache import bump_version
+from .routers.ingest import (
+    CHUNK_ROWS, REJECTED_DIR, TEMPLATES, DataKind, IngestJobOut, IngestSummary, _check_format,
+)
+
+# Columnas identificador: siempre texto (p. ej. "0012" no debe pasar a 12)
+_ID_COLUMNS = {"txn_id": str, "exp_id": str, "product_id": str}
+
+def _read_excel(fh: BinaryIO, kind: DataKind) -> Iterator[pd.DataFrame]:
+    try:
+        yield from excel.read_frames(fh, TEMPLATES[kind], _ID_COLUMNS)
+    except ImportError as e:
+        raise HTTPException(400, f"Lectura de Excel no disponible en el servidor ({e}). Usa .csv") from e
+
+def iter_table(fh: BinaryIO, filename: str | None, kind: DataKind,
+                chunk_rows: int | None = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Lee el CSV por bloques de `chunk_rows` filas, solo con las columnas de la
+    plantilla; sin `chunk_rows`, en un único bloque. Excel no admite bloques:
+    un bloque por hoja, decodificadas en paralelo (app/excel.py).
+    """
+    name = _check_format(filename)
+    if not name.endswith(".csv"):
+        yield from _read_excel(fh, kind)
+        return
+    if not chunk_rows:
+        yield pd.read_csv(fh, dtype=_ID_COLUMNS)
+        return
+    wanted = set(TEMPLATES[kind])
+    yield from pd.read_csv(
+        fh, dtype=_ID_COLUMNS, chunksize=chunk_rows,
+        usecols=lambda c: c.strip() in wanted,
+    )
+
+def _clean(df: pd.DataFrame, kind: DataKind, db: Session | None = None,
+           org_id: int = 1) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Comprueba la cabecera y separa filas válidas (ya convertidas) y rechazadas."""
+    df.columns = [c.strip() for c in df.columns]
+
+    required = set(TEMPLATES[kind])
+    missing = [c for c in required if c not in df.columns]
+    if missing:
+        raise HTTPException(400, f"Faltan columnas: {missing}. Esperadas: {sorted(required)}")
+
+    return validation.validate(df, kind, db, org_id)
+
+def ensure_org(db: Session, org_id: int = 1) -> None:
+    if not db.get(models.Org, org_id):
+        db.add(models.Org(id=org_id, name="Demo"))
+        db.commit()
+
+def _write_frame(kind: DataKind, df: pd.DataFrame, db: Session, org_id: int = 1):
+    if kind == "products":
+        return _upsert_products(df, db, org_id)
+    if kind == "sales":
+        return _upsert_sales(df, db, org_id)
+    if kind == "expenses":
+        return _upsert_expenses(df, db, org_id)
+    return _upsert_inventory(df, db, org_id)
+
+def ingest_frames(kind: DataKind, frames: Iterable[pd.DataFrame], db: Session, org_id: int = 1,
+                  report: validation.RejectReport | None = None) -> Iterator[IngestSummary]:
+    """
+    Valida, escribe y confirma cada bloque por separado. Devuelve el resumen
+    de cada bloque ya confirmado; si uno falla se deshace solo ese bloque.
+    Las filas rechazadas cuentan como errores y van a `report` si se pasa.
+
+    El error de un bloque (500) lleva en `detail` lo ya confirmado por los
+    anteriores (`committed`) y la última línea confirmada del fichero
+    (`last_committed_line`). Reintentar con el mismo fichero es seguro: las
+    filas ya escritas no han cambiado y cuentan como skipped (app/dedup.py).
+    """
+    ensure_org(db, org_id)
+    committed = IngestSummary(kind=kind, rows_in_file=0, inserted=0, updated=0, skipped=0, errors=0)
+    last_line = None
+    for df in frames:
+        rows = len(df)
+        # Línea del fichero de la última fila (índice + 2: cabecera en la 1)
+        end_line = int(df.index[-1]) + 2 if rows else last_line
+        df, rejected = _clean(df, kind, db, org_id)
+        if report is not None:
+            report.add(rejected)
+        try:
+            ins, upd, skipped = _write_frame(kind, df, db, org_id)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(500, {
+                "message": f"Error guardando datos: {e}",
+                "committed": committed.model_dump(exclude={"rejected_report"}),
+                "last_committed_line": last_line,
+            }) from e
+        bump_version(org_id)
+        part = IngestSummary(kind=kind, rows_in_file=rows,
+                             inserted=ins, updated=upd, skipped=skipped, errors=len(rejected))
+        for field in ("rows_in_file", "inserted", "updated", "skipped", "errors"):
+            setattr(committed, field, getattr(committed, field) + getattr(part, field))
+        last_line = end_line
+        yield part
+
+def reject_seen(db: Session, kind: DataKind, digest: str, org_id: int = 1) -> None:
+    """409 si este mismo fichero ya se importó con éxito y sin rechazos."""
+    seen = dedup.seen_file(db, org_id, kind, digest)
+    if seen is not None:
+        raise HTTPException(409, f"Este fichero ya se importó ({seen.filename or 'sin nombre'}, "
+                                 f"{seen.rows} filas, {seen.created_at:%Y-%m-%d %H:%M}). No hay cambios.")
+
+def report_url(report: validation.RejectReport) -> str | None:
+    return f"/api/ingest/rejected/{report.id}" if report.path.exists() else None
+
+def job_out(job: models.IngestJob) -> IngestJobOut:
+    out = IngestJobOut.model_validate(job)
+    out.rejected_report = report_url(validation.RejectReport(REJECTED_DIR, job.id))
+    return out
+
+def write_stream_batch(rows: list[dict], lines: list[int], report: validation.RejectReport,
+                        org_id: int = 1) -> IngestSummary:
+    """Escribe un micro-lote de ventas en su propia sesión (se llama en un hilo)."""
+    # Índice = línea - 2, como en un CSV con cabecera: el informe lleva la línea NDJSON
+    df = pd.DataFrame.from_records(rows, columns=TEMPLATES["sales"], index=[n - 2 for n in lines])
+    with database.SessionLocal() as db:
+        return next(ingest_frames("sales", [df], db, org_id, report))
+
+# ---- helpers ----
+# Cada helper recibe solo filas ya validadas (app/validation.py), las normaliza
+# por columnas, salta las que no han cambiado desde la última ingesta (cuentan
+# como skipped) y escribe con bulk_upsert por lotes.
+
+def _text(s: pd.Series) -> pd.Series:
+    """Texto limpio; vacíos y NaN pasan a None."""
+    s = s.astype("string").str.strip()
+    return s.mask(s.isna() | (s == ""))
+
+def _records(df: pd.DataFrame) -> list[dict]:
+    """Filas como dicts con None en lugar de NaN/NaT."""
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+def _ensure_products(db: Session, pids: pd.Series, vat: pd.Series | None, org_id: int) -> None:
+    """
+    Crea de una vez los productos referenciados que aún no existen. El
+    catálogo en memoria descarta los conocidos sin ir a la BD.
+    """
+    missing = catalog.get(db, org_id).missing(pids)
+    if missing.empty:
+        return
+    placeholders = pd.DataFrame({"id": pids, "vat_rate": vat if vat is not None else 0.21})
+    placeholders = placeholders[placeholders["id"].isin(missing)].drop_duplicates("id")
+    placeholders["vat_rate"] = placeholders["vat_rate"].fillna(0.21)
+    placeholders["org_id"] = org_id
+    placeholders["name"] = placeholders["id"]
+    placeholders["category"] = ""
+    placeholders["unit_cost"] = 0.0
+    if bulk_insert_missing(db, models.Product, _records(placeholders), keys=["id"]):
+        catalog.mark_dirty(db, org_id)
+
+def _upsert_products(df: pd.DataFrame, db: Session, org_id: int = 1):
+    pid = _text(df["product_id"])
+    out = pd.DataFrame({
+        "id": pid,
+        "org_id": org_id,
+        "name": _text(df["name"]),
+        "category": _text(df["category"]),
+        "unit_cost": df["unit_cost"],
+        "vat_rate": df["vat_rate"],
+    })
+    out, digests = dedup.changed_rows(db, org_id, "products", out, "id")
+    ins, upd = bulk_upsert(
+        db, models.Product, _records(out), keys=["id"],
+        defaults={"name": "", "category": "", "unit_cost": 0.0, "vat_rate": 0.21},
+        coalesce=("name", "category", "unit_cost", "vat_rate"),
+    )
+    if upd:
+        rollups.refresh_product_cogs(db, out["id"].tolist())
+    if ins or upd:
+        catalog.mark_dirty(db, org_id)
+    dedup.remember_rows(db, org_id, "products", out["id"], digests)
+    return ins, upd, len(df) - len(out)
+
+def _upsert_sales(df: pd.DataFrame, db: Session, org_id: int = 1):
+    txn = _text(df["txn_id"])
+    pid = _text(df["product_id"])
+    out = pd.DataFrame({
+        "txn_id": txn,
+        "org_id": org_id,
+        "date": df["date"],
+        "product_id": pid,
+        "quantity": df["quantity"],
+        "unit_price_gross": df["unit_price_gross"],
+        "discount": df["discount"].fillna(0.0),
+        "payment_method": _text(df["payment_method"]).fillna("efectivo"),
+        "vat_rate": df["vat_rate"].fillna(0.21),
+    })
+    out, digests = dedup.changed_rows(db, org_id, "sales", out, "txn_id")
+    _ensure_products(db, out["product_id"], out["vat_rate"], org_id)
+    # Las ventas nuevas se suman a su día; solo se recalculan los días de las
+    # que ya existían (su fecha anterior y la nueva)
+    before = rollups.txn_dates(db, out["txn_id"].unique())
+    changed = out["txn_id"].isin(list(before))
+    refresh = set(before.values()) | set(out.loc[changed, "date"].unique())
+    rows = _records(out)
+    ins, upd = bulk_upsert(db, models.Transaction, rows, keys=["txn_id"],
+                           conflict=partitions.conflict_keys(db, "transactions", ["txn_id"]))
+    partitions.delete_moved(db, models.Transaction, "txn_id", rows)
+    rollups.add_sales(db, org_id, out.loc[~changed, "txn_id"].unique())
+    rollups.refresh_sales_days(db, org_id, refresh)
+    analytics.invalidate(db, org_id, refresh | set(out["date"].unique()))
+    dedup.remember_rows(db, org_id, "sales", out["txn_id"], digests)
+    return ins, upd, len(df) - len(out)
+
+def _upsert_expenses(df: pd.DataFrame, db: Session, org_id: int = 1):
+    eid = _text(df["exp_id"])
+    out = pd.DataFrame({
+        "id": eid,
+        "org_id": org_id,
+        "date": df["date"],
+        "category": _text(df["category"]).fillna(""),
+        "description": _text(df["description"]).fillna(""),
+        "amount_gross": df["amount_gross"],
+        "vat_rate": df["vat_rate"].fillna(0.21),
+        "payment_method": _text(df["payment_method"]).fillna("transferencia"),
+    })
+    out, digests = dedup.changed_rows(db, org_id, "expenses", out, "id")
+    days = rollups.expense_days(db, out["id"].unique()) | set(out["date"].unique())
+    rows = _records(out)
+    ins, upd = bulk_upsert(db, models.Expense, rows, keys=["id"],
+                           conflict=partitions.conflict_keys(db, "expenses", ["id"]))
+    partitions.delete_moved(db, models.Expense, "id", rows)
+    rollups.refresh_expense_days(db, org_id, days)
+    analytics.invalidate(db, org_id, days)
+    dedup.remember_rows(db, org_id, "expenses", out["id"], digests)
+    return ins, upd, len(df) - len(out)
+
+def _upsert_inventory(df: pd.DataFrame, db: Session, org_id: int = 1):
+    pid = _text(df["product_id"])
+    out = pd.DataFrame({
+        "org_id": org_id,
+        "product_id": pid,
+        "stock_on_hand": df["stock_on_hand"],
+        # 0 = sin dato: en filas existentes se conserva el valor actual
+        "lead_time_days": df["lead_time_days"].mask(df["lead_time_days"] == 0).astype("Int64"),
+        "safety_stock": df["safety_stock"].mask(df["safety_stock"] == 0).astype("Int64"),
+    })
+    out, digests = dedup.changed_rows(db, org_id, "inventory", out, "product_id")
+    _ensure_products(db, out["product_id"], None, org_id)
+    ins, upd = bulk_upsert(
+        db, models.Inventory, _records(out), keys=["org_id", "product_id"],
+        defaults={"lead_time_days": 7, "safety_stock": 3},
+        coalesce=("lead_time_days", "safety_stock"),
+    )
+    dedup.remember_rows(db, org_id, "inventory", out["product_id"], digests)
+    return ins, upd, len(df) - len(out)
@@ -1,16 +1,37 @@
 # apps/api/app/main.py
+import time
+
+_IMPORT_START = time.perf_counter()
+
+import asyncio
+import logging
+import os
+import sys
+from typing import Dict, List, Optional
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
-from .routers import sales, inventory, campaigns, ingest
-
 
 # Inicialización de BD y modelos
-from .db import init_engine, Base
+from sqlalchemy import text
+from .db import init_async_engine, close_async_engine, init_engine, pool_status
 from . import models  # noqa: F401  # Asegura que SQLAlchemy vea los modelos
+from .cache import ResponseCacheMiddleware
+from .compression import CompressionMiddleware
+from . import metrics
 
-# Routers
-from .routers import sales, inventory, campaigns, ingest
+# Routers (pandas/numpy se cargan dentro de los endpoints que los usan)
+from .routers import sales, expenses, inventory, campaigns, ingest, admin
+
+log = logging.getLogger(__name__)
+
+# Solo desarrollo: crea el esquema al arrancar. En producción, `python -m app.migrate`
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "0") == "1"
+
+# Dependencias pesadas cuya carga se vigila en el informe de arranque
+HEAVY_MODULES = ("pandas", "numpy", "duckdb", "pyarrow", "celery")
 
 
 # --- App ---
@@ -33,36 +54,139 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Caché de analítica (se invalida al ingerir datos) ---
+app.add_middleware(
+    ResponseCacheMiddleware,
+    prefix="/api/sales",
+    endpoints=["kpi", "timeseries", "top-products", "by-category", "cashflow", "dashboard"],
+)
+
+# --- Compresión gzip/brotli negociada (también en streaming) ---
+app.add_middleware(CompressionMiddleware)
+
+# --- Métricas Prometheus (el más externo: mide también la caché) ---
+app.add_middleware(metrics.MetricsMiddleware)
+
 # --- Registrar routers ---
 app.include_router(sales.router, prefix="/api/sales", tags=["Flujo de Caja"])
+app.include_router(expenses.router, prefix="/api/expenses", tags=["Gastos"])
 app.include_router(inventory.router, prefix="/api/inventory", tags=["Inventario"])
 app.include_router(campaigns.router, prefix="/api/campaigns", tags=["Campañas"])
 app.include_router(ingest.router, prefix="/api/ingest", tags=["Ingesta"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
 
 # --- Health ---
+# Segundos máximos para el ping a la BD del health check
+HEALTH_DB_TIMEOUT = float(os.getenv("HEALTH_DB_TIMEOUT", "2"))
+
 class HealthOut(BaseModel):
     ok: bool
     db: bool
 
+class PoolOut(BaseModel):
+    name: str
+    pool_size: int
+    max_overflow: int
+    checked_out: int
+    saturation: float
+    peak_checked_out: int
+    checkouts: int
+    timeouts: int
+    wait_seconds_sum: float
+    wait_seconds_max: float
+    wait_buckets: Dict[str, int]
+
+class StartupOut(BaseModel):
+    import_seconds: float
+    startup_seconds: float
+    migrate_seconds: Optional[float] = None
+    modules: int
+    heavy_modules: Dict[str, bool]
+    max_rss_mb: Optional[float] = None
+
+_startup: Dict[str, object] = {}
+
+def _max_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+_IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
+
 @app.on_event("startup")
 def on_startup() -> None:
     """
-    Arranca el engine y crea tablas si no existen.
+    Arranca el engine (sin crear tablas: ver app/migrate.py) y registra
+    cuánto ha costado arrancar el worker.
     """
+    start = time.perf_counter()
     engine = init_engine()
-    Base.metadata.create_all(bind=engine)
+    migrate_seconds = None
+    if DB_AUTO_MIGRATE:
+        from .migrate import migrate
+        migrate_seconds = migrate(engine)
+    _startup.update(
+        import_seconds=round(_IMPORT_SECONDS, 4),
+        startup_seconds=round(time.perf_counter() - start, 4),
+        migrate_seconds=None if migrate_seconds is None else round(migrate_seconds, 4),
+        modules=len(sys.modules),
+        heavy_modules={m: m in sys.modules for m in HEAVY_MODULES},
+        max_rss_mb=_max_rss_mb(),
+    )
+    metrics.STARTUP.set(_startup["import_seconds"], "import")
+    metrics.STARTUP.set(_startup["startup_seconds"], "startup")
+    loaded = [m for m, on in _startup["heavy_modules"].items() if on]
+    log.info("Worker listo: imports %.3fs, startup %.3fs, %d módulos, RSS %s MB, pesados cargados: %s",
+             _startup["import_seconds"], _startup["startup_seconds"], _startup["modules"],
+             _startup["max_rss_mb"], ", ".join(loaded) or "ninguno")
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    await close_async_engine()
 
 @app.get("/api/health", response_model=HealthOut)
-def health() -> HealthOut:
+async def health() -> HealthOut:
     """
-    Comprueba que la app está viva y que la base de datos responde.
+    Comprueba que la app está viva y que la base de datos responde (SELECT 1).
     """
+    async def ping() -> None:
+        async with init_async_engine().connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
     try:
-        init_engine()
+        await asyncio.wait_for(ping(), HEALTH_DB_TIMEOUT)
         return HealthOut(ok=True, db=True)
     except Exception:
         return HealthOut(ok=True, db=False)
 
+@app.get("/api/health/pool", response_model=List[PoolOut])
+def health_pool() -> List[PoolOut]:
+    """
+    Pools de conexiones de este worker: ocupación, saturación (en uso /
+    capacidad) y espera en checkout. Para dimensionar workers frente a
+    `max_connections` de Postgres.
+    """
+    return [PoolOut(**p) for p in pool_status()]
+
+
+@app.get("/api/health/startup", response_model=StartupOut)
+def health_startup() -> StartupOut:
+    """
+    Coste del arranque de este worker: tiempo de imports y de startup,
+    módulos cargados, RSS máximo y qué dependencias pesadas estaban ya en
+    memoria al terminar (deberían ser ninguna: se cargan bajo demanda).
+    """
+    return StartupOut(**_startup)
+
+
+# --- Métricas ---
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics() -> PlainTextResponse:
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 
 # --- Raíz: redirige a docs de la API ---
 @app.get("/", include_in_schema=False)
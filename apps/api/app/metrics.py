@@ -0,0 +1,255 @@
+# apps/api/app/metrics.py
+"""
+Métricas de la API en formato de texto de Prometheus (GET /metrics).
+
+- Latencia y nº de peticiones por ruta (plantilla de la ruta, no la URL).
+- Consultas SQL y tiempo de BD por petición, medidos con los eventos
+  before/after_cursor_execute de los engines (ver instrument_engine).
+- Filas/segundo de la ingesta.
+- Duración del arranque del worker (imports y startup).
+- Estado de los pools de conexiones (app/pools.py).
+
+Todo vive en memoria del proceso, sin servicios externos: con varios
+workers, Prometheus debe raspar cada uno (o agregarse por instancia).
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from starlette.routing import Match
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()):
+        self.name, self.doc, self.labels = name, doc, tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, *labelvalues: str) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        out += [f"{self.name}{_labels(self.labels, lv)} {v}" for lv, v in items]
+        return out
+
+
+class Gauge(Counter):
+    def set(self, value: float, *labelvalues: str) -> None:
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def render(self) -> List[str]:
+        out = super().render()
+        out[1] = f"# TYPE {self.name} gauge"
+        return out
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, buckets: Sequence[float], labels: Sequence[str] = ()):
+        self.name, self.doc, self.labels = name, doc, tuple(labels)
+        self.buckets = tuple(buckets)
+        # labelvalues -> [conteos por cubeta (+Inf al final), suma, total]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labelvalues)
+            if s is None:
+                s = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(lv, list(s[0]), s[1], s[2]) for lv, s in self._series.items()]
+        for lv, counts, total, n in items:
+            acc = 0
+            for le, c in zip([*map(str, self.buckets), "+Inf"], counts):
+                acc += c
+                le_label = f'le="{le}"'
+                out.append(f"{self.name}_bucket{_labels(self.labels, lv, le_label)} {acc}")
+            out.append(f"{self.name}_sum{_labels(self.labels, lv)} {total}")
+            out.append(f"{self.name}_count{_labels(self.labels, lv)} {n}")
+        return out
+
+
+# ---- Métricas ----
+
+REQUESTS = Counter("leaf_http_requests_total", "Peticiones HTTP", ["method", "route", "status"])
+LATENCY = Histogram("leaf_http_request_duration_seconds", "Latencia de las peticiones HTTP",
+                    LATENCY_BUCKETS, ["method", "route"])
+REQUEST_QUERIES = Histogram("leaf_http_request_sql_queries", "Consultas SQL por petición",
+                            QUERY_BUCKETS, ["route"])
+REQUEST_DB_TIME = Histogram("leaf_http_request_db_seconds", "Tiempo de BD acumulado por petición",
+                            LATENCY_BUCKETS, ["route"])
+SQL_QUERIES = Counter("leaf_sql_queries_total", "Consultas SQL ejecutadas", ["engine"])
+SQL_TIME = Counter("leaf_sql_seconds_total", "Tiempo total en consultas SQL", ["engine"])
+INGEST_ROWS = Counter("leaf_ingest_rows_total", "Filas ingeridas", ["kind"])
+INGEST_TIME = Counter("leaf_ingest_seconds_total", "Tiempo dedicado a la ingesta", ["kind"])
+INGEST_RATE = Gauge("leaf_ingest_rows_per_second", "Filas/segundo de la última ingesta", ["kind"])
+STARTUP = Gauge("leaf_startup_seconds", "Duración del arranque del worker por fase", ["phase"])
+
+REGISTRY = [REQUESTS, LATENCY, REQUEST_QUERIES, REQUEST_DB_TIME, SQL_QUERIES, SQL_TIME,
+            INGEST_ROWS, INGEST_TIME, INGEST_RATE, STARTUP]
+
+
+def _pool_metrics() -> List[str]:
+    """Estado de los pools (app/pools.py) en el momento del raspado."""
+    from .db import pool_status
+
+    pools = pool_status()
+    if not pools:
+        return []
+    gauges = [
+        ("leaf_db_pool_size", "pool_size", "gauge", "Conexiones fijas del pool"),
+        ("leaf_db_pool_max_overflow", "max_overflow", "gauge", "Conexiones extra permitidas"),
+        ("leaf_db_pool_checked_out", "checked_out", "gauge", "Conexiones en uso"),
+        ("leaf_db_pool_saturation", "saturation", "gauge", "En uso / capacidad del pool"),
+        ("leaf_db_pool_peak_checked_out", "peak_checked_out", "gauge", "Máximo de conexiones en uso"),
+        ("leaf_db_pool_timeouts_total", "timeouts", "counter", "Checkouts que agotaron pool_timeout"),
+    ]
+    out: List[str] = []
+    for name, key, kind, doc in gauges:
+        out += [f"# HELP {name} {doc}", f"# TYPE {name} {kind}"]
+        out += [f'{name}{{pool="{p["name"]}"}} {p[key]}' for p in pools]
+
+    name = "leaf_db_pool_wait_seconds"
+    out += [f"# HELP {name} Espera hasta obtener conexión del pool", f"# TYPE {name} histogram"]
+    for p in pools:
+        acc = 0
+        for le, c in p["wait_buckets"].items():
+            acc += c
+            out.append(f'{name}_bucket{{pool="{p["name"]}",le="{le}"}} {acc}')
+        out.append(f'{name}_sum{{pool="{p["name"]}"}} {p["wait_seconds_sum"]}')
+        out.append(f'{name}_count{{pool="{p["name"]}"}} {p["checkouts"]}')
+    return out
+
+
+# Colectores que se evalúan al raspar
+COLLECTORS: List[Callable[[], List[str]]] = [_pool_metrics]
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    for collect in COLLECTORS:
+        lines += collect()
+    return "\n".join(lines) + "\n"
+
+
+def observe_ingest(kind: str, rows: int, seconds: float) -> None:
+    INGEST_ROWS.inc(rows, kind)
+    INGEST_TIME.inc(seconds, kind)
+    if seconds > 0:
+        INGEST_RATE.set(round(rows / seconds, 2), kind)
+
+
+# ---- SQL por petición ----
+
+class _RequestDB:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# Acumulador de la petición en curso (mutable: lo comparten el threadpool y
+# los greenlets del engine asíncrono, que copian el contexto)
+_current: ContextVar[Optional[_RequestDB]] = ContextVar("leaf_request_db", default=None)
+
+
+def instrument_engine(engine, name: str) -> None:
+    """Cuenta consultas y tiempo de BD del engine (síncrono; para async, .sync_engine)."""
+
+    # El inicio va en el contexto de ejecución (como en slowlog.py), no en la
+    # conexión: si la sentencia falla no queda nada pendiente en el pool
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._leaf_t0 = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        dt = time.perf_counter() - context._leaf_t0
+        SQL_QUERIES.inc(1, name)
+        SQL_TIME.inc(dt, name)
+        acc = _current.get()
+        if acc is not None:
+            acc.queries += 1
+            acc.seconds += dt
+
+
+def _route_path(scope) -> str:
+    """
+    Plantilla de la ruta (p. ej. /api/ingest/jobs/{job_id}) para no crear una
+    serie por URL. Si la petición no llegó al router (acierto de caché), se
+    busca la ruta que la habría atendido.
+    """
+    route = scope.get("route")
+    if route is None and "app" in scope:
+        for candidate in scope["app"].router.routes:
+            if candidate.matches(scope)[0] == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Middleware ASGI (sin BaseHTTPMiddleware, para no añadir coste por petición)."""
+
+    def __init__(self, app, exclude: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.exclude = set(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            return await self.app(scope, receive, send)
+
+        acc = _RequestDB()
+        token = _current.set(acc)
+        status = [500]
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            route = _route_path(scope)
+            method = scope["method"]
+            REQUESTS.inc(1, method, route, str(status[0]))
+            LATENCY.observe(elapsed, method, route)
+            REQUEST_QUERIES.observe(acc.queries, route)
+            REQUEST_DB_TIME.observe(acc.seconds, route)
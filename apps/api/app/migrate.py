@@ -0,0 +1,87 @@
+# apps/api/app/migrate.py
+"""
+Puesta al día del esquema de la BD.
+
+Se ejecuta una vez por despliegue, antes de arrancar los workers de la API,
+y no en cada arranque de worker:
+
+    python -m app.migrate
+
+Dos fases:
+- `create_all`: crea las tablas que falten, con sus índices. No toca las
+  tablas que ya existen.
+- UPGRADES: pasos idempotentes para lo que create_all no añade a una tabla
+  existente (clave única del inventario, índices org + fecha). Un cambio
+  de índices o restricciones en models.py necesita aquí su paso; las
+  columnas nuevas en tablas existentes siguen siendo un ALTER TABLE manual.
+
+En desarrollo, DB_AUTO_MIGRATE=1 hace que la API lo ejecute al arrancar.
+El particionado de Postgres tiene su propio comando (app/partitions.py).
+"""
+import time
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+from .db import Base, init_engine
+
+
+def _has_unique(conn: Connection, table: str, columns: list[str]) -> bool:
+    """¿Hay ya una restricción o índice único exactamente sobre `columns`?"""
+    insp = inspect(conn)
+    uniques = [u["column_names"] for u in insp.get_unique_constraints(table)]
+    uniques += [i["column_names"] for i in insp.get_indexes(table) if i["unique"]]
+    return any(list(cols) == columns for cols in uniques)
+
+
+def _inventory_unique(conn: Connection) -> None:
+    """
+    Clave única (org_id, product_id) del inventario, objetivo del ON CONFLICT
+    de la ingesta. create_all no la añade a una tabla que ya existía: se
+    dejan solo las filas más recientes de cada producto y se crea el índice.
+    """
+    if _has_unique(conn, "inventory", ["org_id", "product_id"]):
+        return
+    conn.execute(text(
+        "DELETE FROM inventory WHERE id NOT IN "
+        "(SELECT max(id) FROM inventory GROUP BY org_id, product_id)"
+    ))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_inventory_org_product ON inventory (org_id, product_id)"
+    ))
+
+
+def _org_date_indexes(conn: Connection) -> None:
+    """
+    Índices cubrientes org + fecha de `transactions` y `expenses` (INCLUDE
+    solo en Postgres). En tablas ya particionadas los crea `partitions init`.
+    """
+    from .partitions import PARTITIONED
+
+    pg = conn.dialect.name == "postgresql"
+    for table, (_, include) in PARTITIONED.items():
+        covering = f" INCLUDE ({', '.join(include)})" if pg else ""
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_org_date ON {table} (org_id, date){covering}"
+        ))
+
+
+# Pasos sobre tablas existentes, idempotentes y en orden
+UPGRADES = [_inventory_unique, _org_date_indexes]
+
+
+def migrate(engine=None) -> float:
+    """Crea las tablas que falten y aplica UPGRADES. Devuelve los segundos empleados."""
+    from . import models  # noqa: F401  # registra las tablas en Base.metadata
+
+    start = time.perf_counter()
+    engine = engine or init_engine()
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for step in UPGRADES:
+            step(conn)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    print(f"Esquema al día en {migrate():.2f}s")
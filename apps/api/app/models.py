@@ -10,7 +10,9 @@ from sqlalchemy import (
     Date,
     DateTime,
     ForeignKey,
+    Index,
     Text,
+    UniqueConstraint,
     func,
 )
 from sqlalchemy.orm import relationship
@@ -93,6 +95,15 @@ class Transaction(Base):
     MUY IMPORTANTE: 'created_at' para solucionar el error de columna ausente.
     """
     __tablename__ = "transactions"
+    # Índice cubriente para los rangos org + fecha: la analítica y los
+    # recálculos de agregados no necesitan leer la tabla (INCLUDE en PG).
+    # En Postgres la tabla puede estar particionada por mes: app/partitions.py
+    __table_args__ = (
+        Index(
+            "ix_transactions_org_date", "org_id", "date",
+            postgresql_include=["product_id", "quantity", "unit_price_gross", "discount"],
+        ),
+    )
 
     # ID de la transacción (puede venir del TPV / ERP, lo tratamos como texto)
     txn_id = Column(String(80), primary_key=True)
@@ -136,6 +147,9 @@ class Expense(Base):
     'gastos_neto' y también para campañas si quisiéramos calcular ROAS.
     """
     __tablename__ = "expenses"
+    __table_args__ = (
+        Index("ix_expenses_org_date", "org_id", "date", postgresql_include=["amount_gross"]),
+    )
 
     id = Column(String(80), primary_key=True)
     org_id = Column(Integer, ForeignKey("orgs.id"), nullable=True)
@@ -156,6 +170,65 @@ class Expense(Base):
         return f"<Expense id={self.id!r} date={self.date} gross={self.amount_gross}>"
 
 
+# ---------------------------
+#  Agregados diarios (rollups para /api/sales/*)
+# ---------------------------
+
+class DailySales(Base):
+    """
+    Ventas agregadas por organización, día y producto. La ingesta la mantiene
+    al día recalculando solo los días afectados (ver app/rollups.py), así los
+    endpoints de analítica escanean días y no transacciones.
+    """
+    __tablename__ = "daily_sales"
+    # La PK (org_id, date, product_id) sirve los rangos; este índice sirve
+    # el recálculo de COGS por producto.
+    __table_args__ = (Index("ix_daily_sales_product", "product_id"),)
+
+    org_id = Column(Integer, ForeignKey("orgs.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    product_id = Column(String(60), ForeignKey("products.id"), primary_key=True)
+
+    revenue = Column(Float, nullable=False, default=0.0)   # sum(precio * qty - descuento)
+    cogs = Column(Float, nullable=False, default=0.0)      # sum(qty) * unit_cost actual
+    quantity = Column(Float, nullable=False, default=0.0)
+
+    def __repr__(self) -> str:
+        return f"<DailySales org={self.org_id} date={self.date} prod={self.product_id!r}>"
+
+
+class DailyExpense(Base):
+    """
+    Gastos agregados por organización y día.
+    """
+    __tablename__ = "daily_expenses"
+
+    org_id = Column(Integer, ForeignKey("orgs.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+
+    amount_gross = Column(Float, nullable=False, default=0.0)
+
+    def __repr__(self) -> str:
+        return f"<DailyExpense org={self.org_id} date={self.date} gross={self.amount_gross}>"
+
+
+class AnalyticsExport(Base):
+    """
+    Hasta dónde están exportados a Parquet los datos de una organización
+    (motor analítico opcional, app/analytics.py). Las fechas anteriores a
+    `exported_until` se leen de Parquet; el resto, de la BD. La ingesta lo
+    retrasa si toca días ya exportados.
+    """
+    __tablename__ = "analytics_exports"
+
+    org_id = Column(Integer, ForeignKey("orgs.id"), primary_key=True)
+    exported_until = Column(Date, nullable=False)  # exclusivo, siempre día 1 de mes
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<AnalyticsExport org={self.org_id} until={self.exported_until}>"
+
+
 # ---------------------------
 #  Inventario (para reaprovisionamiento / forecast simple)
 # ---------------------------
@@ -167,6 +240,8 @@ class Inventory(Base):
     demanda, LT y stock de seguridad.
     """
     __tablename__ = "inventory"
+    # Un registro por producto y organización (clave del upsert de ingesta)
+    __table_args__ = (UniqueConstraint("org_id", "product_id", name="uq_inventory_org_product"),)
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     org_id = Column(Integer, ForeignKey("orgs.id"), nullable=True)
@@ -192,6 +267,111 @@ class Inventory(Base):
         return f"<Inventory pid={self.product_id!r} stock={self.stock_on_hand}>"
 
 
+# ---------------------------
+#  Trabajos de ingesta en segundo plano
+# ---------------------------
+
+class IngestJob(Base):
+    """
+    Subida procesada por un worker de Celery (/api/ingest/jobs). El fichero
+    se guarda en disco y aquí llevamos el estado y los contadores por bloque.
+    """
+    __tablename__ = "ingest_jobs"
+
+    id = Column(String(36), primary_key=True)  # uuid4
+    org_id = Column(Integer, ForeignKey("orgs.id"), nullable=True)
+
+    kind = Column(String(20), nullable=False)
+    filename = Column(String(255), nullable=True)
+    path = Column(Text, nullable=False)  # copia en el directorio de spool
+
+    # queued -> running -> done | error
+    status = Column(String(20), nullable=False, default="queued")
+
+    rows_in_file = Column(Integer, nullable=False, default=0)
+    inserted = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    errors = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<IngestJob id={self.id!r} kind={self.kind!r} status={self.status!r}>"
+
+
+class IngestFile(Base):
+    """
+    Fichero ya importado con éxito (huella sha256 de su contenido). Una
+    subida idéntica del mismo tipo se rechaza sin procesarla (app/dedup.py).
+    """
+    __tablename__ = "ingest_files"
+
+    org_id = Column(Integer, ForeignKey("orgs.id"), primary_key=True)
+    kind = Column(String(20), primary_key=True)
+    sha256 = Column(String(64), primary_key=True)
+
+    filename = Column(String(255), nullable=True)
+    rows = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<IngestFile org={self.org_id} kind={self.kind!r} sha256={self.sha256[:12]}>"
+
+
+class IngestRowHash(Base):
+    """
+    Huella de los valores de la última versión ingerida de cada fila, por
+    clave (txn_id, exp_id o product_id). Las filas sin cambios se saltan.
+    """
+    __tablename__ = "ingest_row_hashes"
+
+    org_id = Column(Integer, ForeignKey("orgs.id"), primary_key=True)
+    kind = Column(String(20), primary_key=True)
+    key = Column(String(80), primary_key=True)
+
+    digest = Column(String(16), nullable=False)  # hash de 64 bits en hex
+
+    def __repr__(self) -> str:
+        return f"<IngestRowHash org={self.org_id} kind={self.kind!r} key={self.key!r}>"
+
+
+class DemandForecast(Base):
+    """
+    Previsión de demanda por producto (suavizado exponencial con
+    estacionalidad semanal), calculada en lote por app/forecast.py.
+    La demanda del día d (0 = lunes) es level * season_<d>.
+    """
+    __tablename__ = "demand_forecasts"
+
+    org_id = Column(Integer, ForeignKey("orgs.id"), primary_key=True)
+    product_id = Column(String(60), ForeignKey("products.id"), primary_key=True)
+
+    # Nivel desestacionalizado (unidades/día) al cierre de `fitted_until`
+    level = Column(Float, nullable=False, default=0.0)
+    alpha = Column(Float, nullable=False)
+
+    # Factores por día de la semana (media 1)
+    season_0 = Column(Float, nullable=False, default=1.0)
+    season_1 = Column(Float, nullable=False, default=1.0)
+    season_2 = Column(Float, nullable=False, default=1.0)
+    season_3 = Column(Float, nullable=False, default=1.0)
+    season_4 = Column(Float, nullable=False, default=1.0)
+    season_5 = Column(Float, nullable=False, default=1.0)
+    season_6 = Column(Float, nullable=False, default=1.0)
+
+    fitted_until = Column(Date, nullable=False)
+    # Huella de las ventas del producto: si no cambia, no se reajusta
+    signature = Column(String(80), nullable=False)
+    fitted_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<DemandForecast org={self.org_id} prod={self.product_id!r} level={self.level}>"
+
+
 # ---------------------------
 #  Campañas (plan + posts)
 # ---------------------------
@@ -0,0 +1,174 @@
+# apps/api/app/partitions.py
+"""
+Particionado mensual por rango de fecha de `transactions` y `expenses` (Postgres).
+
+    python -m app.partitions init  [--ahead 3]   # convierte las tablas (una vez)
+    python -m app.partitions ensure [--ahead 3]  # crea las particiones futuras (cron)
+
+`init` recrea cada tabla como PARTITION BY RANGE (date), con PK (id, date)
+(Postgres exige que la clave de partición forme parte de la PK), copia los
+datos y crea las particiones del histórico más `--ahead` meses. Conviene
+reiniciar la API y los workers después.
+
+Con la tabla particionada, el upsert de la ingesta usa (id, date) como
+objetivo de ON CONFLICT y borra la versión antigua de las filas que cambian
+de fecha (ver conflict_keys / delete_moved). En SQLite no hace nada.
+"""
+import argparse
+from datetime import date
+from typing import Iterable, Sequence
+
+from sqlalchemy import and_, bindparam, delete, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+# tabla -> (columna id, columnas INCLUDE del índice cubriente org + fecha)
+PARTITIONED = {
+    "transactions": ("txn_id", ["product_id", "quantity", "unit_price_gross", "discount"]),
+    "expenses": ("id", ["amount_gross"]),
+}
+
+
+def is_partitioned(db: Session | Connection, table: str) -> bool:
+    bind = db.get_bind() if isinstance(db, Session) else db
+    if bind.dialect.name != "postgresql":
+        return False
+    relkind = db.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:t)"), {"t": table}
+    ).scalar()
+    return relkind == "p"
+
+
+def conflict_keys(db: Session, table: str, keys: Sequence[str]) -> list[str]:
+    """Objetivo de ON CONFLICT para `table`: añade `date` si está particionada."""
+    keys = list(keys)
+    if is_partitioned(db, table):
+        keys.append("date")
+    return keys
+
+
+def delete_moved(db: Session, model, key: str, rows: Sequence[dict]) -> None:
+    """
+    Tras un upsert sobre (id, date), borra las copias de esas filas que
+    siguen en su fecha anterior. Solo aplica a tablas particionadas.
+    """
+    if not rows or not is_partitioned(db, model.__tablename__):
+        return
+    table = model.__table__
+    stmt = delete(table).where(and_(table.c[key] == bindparam("k"), table.c.date != bindparam("d")))
+    db.execute(stmt, [{"k": r[key], "d": r["date"]} for r in rows])
+
+
+# ---- DDL ----
+
+def _month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def _add_months(d: date, n: int) -> date:
+    y, m = divmod(d.month - 1 + n, 12)
+    return date(d.year + y, m + 1, 1)
+
+
+def _months(start: date, end: date) -> Iterable[date]:
+    d = _month_start(start)
+    while d <= end:
+        yield d
+        d = _add_months(d, 1)
+
+
+def _partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+
+def ensure_partitions(conn: Connection, table: str, start: date, end: date) -> list[str]:
+    """
+    Crea las particiones mensuales de [start, end] que falten. Si la partición
+    por defecto tiene filas de ese mes, se mueven a la nueva partición.
+    """
+    created = []
+    existing = set(conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:t)"
+    ), {"t": table}).scalars())
+    for month in _months(start, end):
+        name = _partition_name(table, month)
+        if name in existing:
+            continue
+        lo, hi = month.isoformat(), _add_months(month, 1).isoformat()
+        conn.execute(text(f"CREATE TEMP TABLE _moved (LIKE {table})"))
+        conn.execute(text(
+            f"WITH m AS (DELETE FROM {table}_default WHERE date >= :lo AND date < :hi RETURNING *) "
+            f"INSERT INTO _moved SELECT * FROM m"
+        ), {"lo": lo, "hi": hi})
+        conn.execute(text(
+            f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ('{lo}') TO ('{hi}')"
+        ))
+        conn.execute(text(f"INSERT INTO {table} SELECT * FROM _moved"))
+        conn.execute(text("DROP TABLE _moved"))
+        created.append(name)
+    return created
+
+
+def convert_table(conn: Connection, table: str, ahead: int) -> None:
+    """Recrea `table` como tabla particionada por mes conservando los datos."""
+    key, include = PARTITIONED[table]
+    fks = conn.execute(text(
+        "SELECT pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = to_regclass(:t) AND contype = 'f'"
+    ), {"t": table}).scalars().all()
+
+    conn.execute(text(f"DROP INDEX IF EXISTS ix_{table}_org_date"))
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {table}_old"))
+    conn.execute(text(
+        f"CREATE TABLE {table} (LIKE {table}_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        f"PARTITION BY RANGE (date)"
+    ))
+    conn.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {table}_part_pkey PRIMARY KEY ({key}, date)"))
+    for fk in fks:
+        conn.execute(text(f"ALTER TABLE {table} ADD {fk}"))
+    conn.execute(text(
+        f"CREATE INDEX ix_{table}_org_date ON {table} (org_id, date) INCLUDE ({', '.join(include)})"
+    ))
+    conn.execute(text(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT"))
+
+    lo, hi = conn.execute(text(f"SELECT min(date), max(date) FROM {table}_old")).one()
+    today = date.today()
+    ensure_partitions(conn, table, min(lo or today, today), _add_months(max(hi or today, today), ahead))
+    conn.execute(text(f"INSERT INTO {table} SELECT * FROM {table}_old"))
+    conn.execute(text(f"DROP TABLE {table}_old"))
+
+
+def main() -> None:
+    from .db import init_engine
+    from .migrate import migrate
+
+    parser = argparse.ArgumentParser(description="Particionado mensual de transactions/expenses (Postgres)")
+    parser.add_argument("command", choices=["init", "ensure"])
+    parser.add_argument("--ahead", type=int, default=3, help="Meses futuros a crear por adelantado")
+    args = parser.parse_args()
+
+    engine = init_engine()
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("El particionado solo está disponible en Postgres")
+    migrate(engine)
+
+    with engine.begin() as conn:
+        for table in PARTITIONED:
+            if args.command == "init":
+                if is_partitioned(conn, table):
+                    print(f"{table}: ya particionada")
+                    continue
+                convert_table(conn, table, args.ahead)
+                print(f"{table}: convertida a particionada")
+            else:
+                if not is_partitioned(conn, table):
+                    print(f"{table}: no particionada (ejecuta 'init' primero)")
+                    continue
+                today = date.today()
+                created = ensure_partitions(conn, table, today, _add_months(today, args.ahead))
+                print(f"{table}: {len(created)} particiones nuevas {created}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# apps/api/app/pools.py
+"""
+Instrumentación de los pools de conexiones de SQLAlchemy.
+
+Cada engine de Postgres usa una subclase de su pool (QueuePool o
+AsyncAdaptedQueuePool) que mide cuánto espera cada checkout hasta obtener
+conexión. Con eso y la ocupación del pool se dimensiona el nº de workers
+frente a `max_connections` de Postgres:
+
+    conexiones por worker = pool_size + max_overflow (sync) + ídem (async)
+
+Las métricas se consultan en GET /api/health/pool.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Optional
+
+from sqlalchemy import exc
+from sqlalchemy.pool import Pool
+
+# Límites superiores (segundos) del histograma de espera en checkout
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PoolStats:
+    """Contadores acumulados de un pool (por proceso)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.buckets = [0] * (len(WAIT_BUCKETS) + 1)  # no acumulativos; el último es > 10 s
+        self.peak_checked_out = 0
+        self._lock = threading.Lock()
+
+    def observe(self, wait: float, checked_out: int) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_sum += wait
+            self.wait_max = max(self.wait_max, wait)
+            self.buckets[bisect_left(WAIT_BUCKETS, wait)] += 1
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self, pool: Optional[Pool]) -> dict:
+        """Contadores + estado actual del pool (tamaño, en uso, saturación)."""
+        size = pool.size() if pool is not None else 0
+        overflow_max = getattr(pool, "_max_overflow", 0) if pool is not None else 0
+        checked_out = pool.checkedout() if pool is not None else 0
+        capacity = size + max(overflow_max, 0)
+        with self._lock:
+            return {
+                "name": self.name,
+                "pool_size": size,
+                "max_overflow": overflow_max,
+                "checked_out": checked_out,
+                "saturation": round(checked_out / capacity, 4) if capacity else 0.0,
+                "peak_checked_out": self.peak_checked_out,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_sum": round(self.wait_sum, 6),
+                "wait_seconds_max": round(self.wait_max, 6),
+                "wait_buckets": dict(zip([*map(str, WAIT_BUCKETS), "+Inf"], self.buckets)),
+            }
+
+
+def instrumented(base: type[Pool], stats: PoolStats) -> type[Pool]:
+    """Subclase de `base` que mide la espera de cada checkout en `stats`."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = base._do_get(self)
+        except exc.TimeoutError:
+            stats.timeout()
+            raise
+        stats.observe(time.perf_counter() - start, self.checkedout())
+        return conn
+
+    return type(f"Instrumented{base.__name__}", (base,), {"_do_get": _do_get, "stats": stats})
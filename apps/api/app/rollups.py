@@ -0,0 +1,165 @@
+# apps/api/app/rollups.py
+"""
+Mantenimiento de los agregados diarios (daily_sales / daily_expenses).
+
+La ingesta llama a estas funciones con los días que ha tocado cada bloque:
+se borran y se recalculan solo esos días con un INSERT ... SELECT agrupado.
+Las ventas nuevas no recalculan su día: se suman al agregado (add_sales),
+así el coste de un bloque depende de sus filas y no de las que ya tenga el
+día (un TPV que envía por /stream escribe en el mismo día toda la jornada).
+Para rellenar los agregados de datos ya existentes:
+
+    python -m app.rollups            # todas las organizaciones
+    python -m app.rollups --org 1
+"""
+import argparse
+from datetime import date
+from typing import Iterable, Optional, Sequence
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .bulk import BATCH_SIZE, _dialect_insert
+
+
+def revenue_expr():
+    # ingreso = precio * qty - descuento
+    return (models.Transaction.unit_price_gross * models.Transaction.quantity) - func.coalesce(models.Transaction.discount, 0.0)
+
+
+def cogs_expr():
+    # COGS = sum(unit_cost * qty) usando join con products
+    return (models.Product.unit_cost * models.Transaction.quantity)
+
+
+def _chunks(values: Sequence, size: int = BATCH_SIZE):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def txn_dates(db: Session, txn_ids: Iterable[str]) -> dict[str, date]:
+    """Fecha actual de las transacciones dadas que ya existen (antes de reescribirlas)."""
+    T = models.Transaction
+    ids = list(txn_ids)
+    found: dict[str, date] = {}
+    for part in _chunks(ids):
+        found.update(db.execute(select(T.txn_id, T.date).where(T.txn_id.in_(part))).all())
+    return found
+
+
+def expense_days(db: Session, exp_ids: Iterable[str]) -> set[date]:
+    ids = list(exp_ids)
+    days: set[date] = set()
+    for part in _chunks(ids):
+        days.update(db.scalars(
+            select(models.Expense.date).where(models.Expense.id.in_(part)).distinct()
+        ))
+    return days
+
+
+def refresh_sales_days(db: Session, org_id: int, days: Iterable[date]) -> None:
+    """Recalcula daily_sales de `org_id` para los días dados."""
+    T, P, D = models.Transaction, models.Product, models.DailySales
+    for part in _chunks(sorted(set(days))):
+        db.execute(delete(D).where(D.org_id == org_id, D.date.in_(part)))
+        src = (
+            select(
+                T.org_id, T.date, T.product_id,
+                func.sum(revenue_expr()),
+                func.sum(func.coalesce(cogs_expr(), 0.0)),
+                func.sum(T.quantity),
+            )
+            .select_from(T)
+            .outerjoin(P, P.id == T.product_id)
+            .where(T.org_id == org_id, T.date.in_(part))
+            .group_by(T.org_id, T.date, T.product_id)
+        )
+        db.execute(insert(D).from_select(["org_id", "date", "product_id", "revenue", "cogs", "quantity"], src))
+
+
+def add_sales(db: Session, org_id: int, txn_ids: Iterable[str]) -> None:
+    """
+    Suma a daily_sales las transacciones recién insertadas `txn_ids`
+    (INSERT ... SELECT agrupado con ON CONFLICT DO UPDATE revenue + ...).
+    Solo para filas nuevas: las que cambian necesitan refresh_sales_days.
+    """
+    T, P, D = models.Transaction, models.Product, models.DailySales
+    ids = list(txn_ids)
+    upsert = _dialect_insert(db)
+    if upsert is None:
+        refresh_sales_days(db, org_id, txn_dates(db, ids).values())
+        return
+    for part in _chunks(ids):
+        src = (
+            select(
+                T.org_id, T.date, T.product_id,
+                func.sum(revenue_expr()),
+                func.sum(func.coalesce(cogs_expr(), 0.0)),
+                func.sum(T.quantity),
+            )
+            .select_from(T)
+            .outerjoin(P, P.id == T.product_id)
+            .where(T.org_id == org_id, T.txn_id.in_(part))
+            .group_by(T.org_id, T.date, T.product_id)
+        )
+        stmt = upsert(D).from_select(["org_id", "date", "product_id", "revenue", "cogs", "quantity"], src)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[D.org_id, D.date, D.product_id],
+            set_={c: D.__table__.c[c] + stmt.excluded[c] for c in ("revenue", "cogs", "quantity")},
+        )
+        db.execute(stmt)
+
+
+def refresh_expense_days(db: Session, org_id: int, days: Iterable[date]) -> None:
+    """Recalcula daily_expenses de `org_id` para los días dados."""
+    E, D = models.Expense, models.DailyExpense
+    for part in _chunks(sorted(set(days))):
+        db.execute(delete(D).where(D.org_id == org_id, D.date.in_(part)))
+        src = (
+            select(E.org_id, E.date, func.sum(E.amount_gross))
+            .where(E.org_id == org_id, E.date.in_(part))
+            .group_by(E.org_id, E.date)
+        )
+        db.execute(insert(D).from_select(["org_id", "date", "amount_gross"], src))
+
+
+def refresh_product_cogs(db: Session, product_ids: Iterable[str]) -> None:
+    """El COGS usa el coste unitario actual: al cambiarlo se recalcula en bloque."""
+    D, P = models.DailySales, models.Product
+    unit_cost = select(P.unit_cost).where(P.id == D.product_id).scalar_subquery()
+    for part in _chunks(list(product_ids)):
+        db.execute(
+            update(D)
+            .where(D.product_id.in_(part))
+            .values(cogs=D.quantity * func.coalesce(unit_cost, 0.0))
+        )
+
+
+def rebuild(db: Session, org_id: Optional[int] = None) -> None:
+    """Reconstruye los agregados completos de una organización (o de todas)."""
+    if org_id is None:
+        org_ids = db.scalars(select(models.Org.id)).all()
+    else:
+        org_ids = [org_id]
+    for oid in org_ids:
+        refresh_sales_days(db, oid, db.scalars(
+            select(models.Transaction.date).where(models.Transaction.org_id == oid).distinct()
+        ).all())
+        refresh_expense_days(db, oid, db.scalars(
+            select(models.Expense.date).where(models.Expense.org_id == oid).distinct()
+        ).all())
+        db.commit()
+
+
+if __name__ == "__main__":
+    from . import db as database
+    from .migrate import migrate
+
+    parser = argparse.ArgumentParser(description="Reconstruye los agregados diarios de ventas y gastos")
+    parser.add_argument("--org", type=int, default=None, help="Solo esta organización")
+    args = parser.parse_args()
+
+    migrate()  # esquema al día (tablas e índices) antes de escribir
+    with database.SessionLocal() as db:
+        rebuild(db, args.org)
@@ -0,0 +1,58 @@
+# apps/api/app/routers/admin.py
+import os
+import secrets
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+from .. import slowlog
+
+router = APIRouter()
+
+# Los endpoints de admin exigen la cabecera X-Admin-Token. Sin ADMIN_TOKEN
+# configurado no existen (404): muestran SQL con parámetros de los clientes.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(404, "Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(403, "Token de administración no válido")
+
+class SlowQueryOut(BaseModel):
+    id: int
+    at: datetime
+    label: Optional[str] = None
+    duration_ms: float
+    statement: str
+    params: str
+    plan: Optional[str] = None
+
+# ---------- Consultas lentas ----------
+@router.get("/slow-queries", response_model=List[SlowQueryOut], dependencies=[Depends(require_admin)])
+def slow_queries(
+    label: Optional[str] = Query(None, description="p. ej. sales.timeseries"),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """Últimas consultas por encima de SLOW_QUERY_MS en este worker."""
+    return slowlog.entries(label, limit)
+
+@router.get("/slow-queries/{entry_id}", response_model=SlowQueryOut, dependencies=[Depends(require_admin)])
+def slow_query(entry_id: int):
+    entry = slowlog.get(entry_id)
+    if entry is None:
+        raise HTTPException(404, "Consulta no encontrada")
+    return entry
+
+@router.get("/slow-queries/{entry_id}/plan", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+def slow_query_plan(entry_id: int):
+    """Plan capturado, en texto tal cual lo devuelve la BD."""
+    entry = slowlog.get(entry_id)
+    if entry is None:
+        raise HTTPException(404, "Consulta no encontrada")
+    if entry["plan"] is None:
+        raise HTTPException(404, "Sin plan capturado para esta consulta (muestreo)")
+    return entry["plan"]
@@ -0,0 +1,29 @@
+# apps/api/app/routers/expenses.py
+from typing import Optional
+
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from .. import exports, models
+from .sales import apply_date_range, period_bounds
+
+router = APIRouter()
+
+# ---------- Exportación (streaming) ----------
+@router.get("/export", response_class=StreamingResponse)
+def export(
+    org_id: int = 1,
+    _from: Optional[str] = None,
+    _to: Optional[str] = None,
+    fmt: exports.ExportFormat = Query("csv", alias="format"),
+):
+    """Gastos del periodo en CSV, NDJSON o Parquet (columnas de la plantilla de ingesta)."""
+    f, t = period_bounds(_from, _to)
+    E = models.Expense
+    stmt = select(
+        E.id.label("exp_id"), E.date, E.category, E.description,
+        E.amount_gross, E.vat_rate, E.payment_method,
+    ).where(E.org_id == org_id)
+    stmt = apply_date_range(stmt, E.date, f, t).order_by(E.date, E.id)
+    return exports.response(stmt, fmt, f"expenses_org{org_id}_{f or 'inicio'}_{t or 'fin'}")
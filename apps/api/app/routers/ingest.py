@@ -1,12 +1,25 @@
 from __future__ import annotations
-from fastapi import APIRouter, UploadFile, File, Query, HTTPException
-from pydantic import BaseModel
-from typing import Literal
-import pandas as pd
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import closing
+from datetime import datetime, timezone
+from pathlib import Path
+from fastapi import APIRouter, Depends, Request, UploadFile, File, Query, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict
+from typing import AsyncIterator, Literal
+import orjson
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from ..db import init_engine, SessionLocal
-from .. import models
+from starlette.concurrency import run_in_threadpool
+from ..db import get_db, init_engine
+from .. import metrics, models
+
+# El motor (pandas) está en app/ingestion.py y se importa dentro de cada
+# endpoint: se carga con la primera petición de ingesta, no al arrancar.
 
 router = APIRouter()
 
@@ -25,6 +38,24 @@ TEMPLATES: dict[DataKind, list[str]] = {
     "inventory": ["product_id", "stock_on_hand", "lead_time_days", "safety_stock"],
 }
 
+class IngestJobOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    kind: DataKind
+    status: Literal["queued", "running", "done", "error"]
+    filename: str | None = None
+    rows_in_file: int
+    inserted: int
+    updated: int
+    skipped: int
+    errors: int
+    error: str | None = None
+    created_at: datetime | None = None
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    rejected_report: str | None = None
+
 class IngestSummary(BaseModel):
     kind: DataKind
     rows_in_file: int
@@ -32,161 +63,261 @@ class IngestSummary(BaseModel):
     updated: int
     skipped: int
     errors: int
+    # URL del CSV con las filas rechazadas y su motivo (si hay alguna)
+    rejected_report: str | None = None
 
-def _read_table(file: UploadFile) -> pd.DataFrame:
-    name = (file.filename or "").lower()
-    if name.endswith(".csv"):
-        return pd.read_csv(file.file)
-    if name.endswith(".xlsx") or name.endswith(".xls"):
-        return pd.read_excel(file.file)
-    raise HTTPException(400, "Formato no soportado. Usa .csv o .xlsx")
+class StreamAck(IngestSummary):
+    """Confirmación de un micro-lote de /stream (líneas first_line..last_line)."""
+    batch: int
+    first_line: int
+    last_line: int
+    final: bool = False
+    error: str | None = None
+
+# Filas por bloque en modo streaming: acota la memoria pico por petición
+CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "50000"))
+
+# Micro-lotes de /stream: se escribe al llegar a N filas o a los X ms de la
+# primera fila pendiente, lo que ocurra antes
+STREAM_BATCH_ROWS = int(os.getenv("INGEST_STREAM_BATCH_ROWS", "2000"))
+STREAM_FLUSH_MS = int(os.getenv("INGEST_STREAM_FLUSH_MS", "250"))
+
+# Directorio donde se guardan las subidas hasta que un worker las procesa.
+# Debe ser compartido entre la API y los workers de Celery.
+SPOOL_DIR = Path(os.getenv("INGEST_SPOOL_DIR", Path(tempfile.gettempdir()) / "leaf-ingest"))
+# Informes de filas rechazadas (uno por subida, stream o trabajo)
+REJECTED_DIR = SPOOL_DIR / "rejected"
+
+def _check_format(filename: str | None) -> str:
+    name = (filename or "").lower()
+    if not name.endswith((".csv", ".xlsx", ".xls")):
+        raise HTTPException(400, "Formato no soportado. Usa .csv o .xlsx")
+    return name
+
+def error_message(e: HTTPException) -> str:
+    """Texto del error de ingesta (`detail` puede traer el progreso confirmado)."""
+    return e.detail["message"] if isinstance(e.detail, dict) else str(e.detail)
+
+def _add(total: IngestSummary, part: IngestSummary) -> IngestSummary:
+    for field in ("rows_in_file", "inserted", "updated", "skipped", "errors"):
+        setattr(total, field, getattr(total, field) + getattr(part, field))
+    return total
 
 @router.get("/template")
 def template(kind: DataKind):
     return {"kind": kind, "columns": TEMPLATES[kind]}
 
 @router.post("/upload", response_model=IngestSummary)
-def upload(kind: DataKind = Query(...), file: UploadFile = File(...)):
+def upload(
+    kind: DataKind = Query(...),
+    file: UploadFile = File(...),
+    stream: bool = Query(True, description="Procesa el CSV por bloques de INGEST_CHUNK_ROWS filas y confirma "
+                                            "cada bloque (memoria acotada); false = una sola transacción"),
+    db: Session = Depends(get_db),
+):
+    """
+    Importa un CSV/Excel. Por defecto el CSV se lee y confirma por bloques:
+    si un bloque falla, el 500 indica lo ya confirmado y la última línea
+    escrita (ver ingestion.ingest_frames) y el reintento salta esas filas.
+    """
+    from .. import dedup, ingestion, validation
+
+    _check_format(file.filename)
+    digest = dedup.file_digest(file.file)
+    ingestion.reject_seen(db, kind, digest)
+    frames = ingestion.iter_table(file.file, file.filename, kind, CHUNK_ROWS if stream else None)
+
+    total = IngestSummary(kind=kind, rows_in_file=0, inserted=0, updated=0, skipped=0, errors=0)
+    report = validation.RejectReport(REJECTED_DIR)
+    start = time.perf_counter()
+    with closing(frames):
+        for part in ingestion.ingest_frames(kind, frames, db, report=report):
+            _add(total, part)
+    total.rejected_report = ingestion.report_url(report)
+    # Con filas rechazadas el mismo fichero debe poder volver a subirse
+    # (p. ej. tras dar de alta los productos que faltaban)
+    if not total.errors:
+        dedup.remember_file(db, 1, kind, digest, file.filename, total.rows_in_file)
+    db.commit()
+    metrics.observe_ingest(kind, total.rows_in_file, time.perf_counter() - start)
+    return total
+
+@router.post("/jobs", response_model=IngestJobOut, status_code=202)
+def create_job(kind: DataKind = Query(...), file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """
+    Guarda la subida en disco y encola su procesamiento en un worker.
+    Devuelve el trabajo al momento; el progreso se consulta en /jobs/{id}.
+    Un fichero idéntico a otro ya importado se rechaza con 409; si no se
+    puede encolar (broker caído), el trabajo queda en error y responde 503.
+    """
+    from .. import dedup, ingestion
+    from ..worker import run_ingest_job
+
+    name = _check_format(file.filename)
+    job_id = str(uuid.uuid4())
+    SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+    path = SPOOL_DIR / f"{job_id}{Path(name).suffix}"
+    digest = dedup.file_digest(file.file)
+    ingestion.reject_seen(db, kind, digest)
+    with open(path, "wb") as out:
+        shutil.copyfileobj(file.file, out, 1024 * 1024)
+
+    ingestion.ensure_org(db)
+    job = models.IngestJob(id=job_id, org_id=1, kind=kind, filename=file.filename,
+                           path=str(path), status="queued")
+    db.add(job)
+    db.commit()
+
+    try:
+        run_ingest_job.delay(job_id)
+    except Exception as e:
+        # Sin worker que lo recoja: no dejar el trabajo "queued" ni el fichero
+        job.status = "error"
+        job.error = f"No se pudo encolar el trabajo: {e}"
+        job.finished_at = datetime.now(timezone.utc)
+        db.commit()
+        path.unlink(missing_ok=True)
+        raise HTTPException(503, "Cola de ingesta no disponible, inténtalo de nuevo más tarde")
+    db.refresh(job)  # en modo eager el trabajo ya ha terminado
+    return ingestion.job_out(job)
+
+@router.get("/jobs/{job_id}", response_model=IngestJobOut)
+def get_job(job_id: str, db: Session = Depends(get_db)):
+    from .. import ingestion
+
+    job = db.get(models.IngestJob, job_id)
+    if not job:
+        raise HTTPException(404, "Trabajo de ingesta no encontrado")
+    return ingestion.job_out(job)
+
+@router.get("/rejected/{report_id}", response_class=FileResponse)
+def rejected(report_id: str):
+    """
+    CSV con las filas rechazadas de una subida, stream o trabajo: valores
+    originales, `linea` del fichero y `motivo`.
+    """
+    from .. import validation
+
+    try:
+        report_id = str(uuid.UUID(report_id))
+    except ValueError:
+        raise HTTPException(404, "Informe no encontrado")
+    path = validation.RejectReport(REJECTED_DIR, report_id).path
+    if not path.exists():
+        raise HTTPException(404, "Informe no encontrado")
+    return FileResponse(path, media_type="text/csv; charset=utf-8", filename=f"rechazadas-{report_id}.csv")
+
+# ---- streaming NDJSON (TPV) ----
+
+class _DuplexResponse(StreamingResponse):
+    """
+    StreamingResponse sin la escucha de desconexión: esa tarea consume
+    `receive` y se comería el cuerpo que el generador aún está leyendo.
+    La desconexión del cliente llega igual como ClientDisconnect al leer.
+    """
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+async def _stream_acks(request: Request) -> AsyncIterator[bytes]:
+    """
+    Lee el cuerpo por trozos, parte en líneas y agrupa filas en micro-lotes.
+    Cada lote se confirma con una línea StreamAck; al final, una con los totales.
+    """
+    from .. import ingestion, validation
+
     init_engine()
-    df = _read_table(file)
-    df.columns = [c.strip() for c in df.columns]
-
-    required = set(TEMPLATES[kind])
-    missing = [c for c in required if c not in df.columns]
-    if missing:
-        raise HTTPException(400, f"Faltan columnas: {missing}. Esperadas: {sorted(required)}")
-
-    # Limpieza
-    for col in df.columns:
-        if col.endswith("_gross") or col in {"unit_cost", "unit_price_gross", "discount", "vat_rate"}:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-        if col in {"quantity", "stock_on_hand", "lead_time_days", "safety_stock"}:
-            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(int)
-        if col == "date":
-            df[col] = pd.to_datetime(df[col], errors="coerce").dt.date.astype(str)
-
-    ins = upd = skipped = err = 0
-
-    with SessionLocal() as db:
-        org = db.scalar(select(models.Org).where(models.Org.id == 1))
-        if not org:
-            org = models.Org(id=1, name="Demo")
-            db.add(org); db.commit()
+    loop = asyncio.get_running_loop()
+    fields = TEMPLATES["sales"]
+    chunks = request.stream().__aiter__()
+    pending: asyncio.Task | None = None
+    tail = b""
+    rows: list[dict] = []
+    row_lines: list[int] = []
+    bad_lines: list[int] = []
+    report = validation.RejectReport(REJECTED_DIR)
+    line_no = first_line = 0
+    deadline = 0.0
+    total = StreamAck(kind="sales", rows_in_file=0, inserted=0, updated=0, skipped=0, errors=0,
+                      batch=0, first_line=1, last_line=0, final=True)
 
+    async def flush() -> bytes:
+        nonlocal rows, row_lines, bad_lines, first_line
+        start = time.perf_counter()
+        report.add_lines(bad_lines, fields, "JSON no válido")
+        part = await run_in_threadpool(ingestion.write_stream_batch, rows, row_lines, report) if rows else None
+        metrics.observe_ingest("sales", len(rows), time.perf_counter() - start)
+        total.batch += 1
+        ack = StreamAck(kind="sales", rows_in_file=len(rows) + len(bad_lines),
+                        inserted=part.inserted if part else 0, updated=part.updated if part else 0,
+                        skipped=part.skipped if part else 0,
+                        errors=(part.errors if part else 0) + len(bad_lines),
+                        batch=total.batch, first_line=first_line, last_line=line_no)
+        _add(total, ack)
+        rows, row_lines, bad_lines, first_line = [], [], [], 0
+        return ack.model_dump_json().encode() + b"\n"
+
+    def parse(line: bytes) -> None:
+        nonlocal first_line, deadline, line_no
+        line_no += 1
+        if not first_line:
+            first_line = line_no
+            deadline = loop.time() + STREAM_FLUSH_MS / 1000
         try:
-            if kind == "products":
-                ins, upd, skipped, err = _upsert_products(df, db)
-            elif kind == "sales":
-                ins, upd, skipped, err = _upsert_sales(df, db)
-            elif kind == "expenses":
-                ins, upd, skipped, err = _upsert_expenses(df, db)
-            elif kind == "inventory":
-                ins, upd, skipped, err = _upsert_inventory(df, db)
-            db.commit()
-        except Exception as e:
-            db.rollback()
-            raise HTTPException(500, f"Error guardando datos: {e}") from e
-
-    return IngestSummary(kind=kind, rows_in_file=len(df),
-                         inserted=ins, updated=upd, skipped=skipped, errors=err)
-
-# ---- helpers ----
-def _upsert_products(df: pd.DataFrame, db: Session):
-    ins = upd = skipped = err = 0
-    for _, r in df.iterrows():
-        try:
-            obj = db.get(models.Product, r["product_id"])
-            if obj:
-                obj.name = str(r.get("name") or obj.name)
-                obj.category = str(r.get("category") or obj.category or "")
-                if pd.notna(r.get("unit_cost")): obj.unit_cost = float(r["unit_cost"])
-                if pd.notna(r.get("vat_rate")): obj.vat_rate = float(r["vat_rate"])
-                upd += 1
-            else:
-                db.add(models.Product(
-                    product_id=str(r["product_id"]), org_id=1,
-                    name=str(r.get("name") or ""), category=str(r.get("category") or ""),
-                    unit_cost=float(r.get("unit_cost") or 0.0),
-                    vat_rate=float(r.get("vat_rate") or 0.21),
-                ))
-                ins += 1
-        except Exception:
-            err += 1
-    return ins, upd, skipped, err
-
-def _upsert_sales(df: pd.DataFrame, db: Session):
-    ins = upd = skipped = err = 0
-    for _, r in df.iterrows():
-        try:
-            pid = str(r["product_id"])
-            if not db.get(models.Product, pid):
-                db.add(models.Product(product_id=pid, org_id=1, name=pid, category="", unit_cost=0.0, vat_rate=float(r.get("vat_rate") or 0.21)))
-            obj = db.get(models.Transaction, str(r["txn_id"]))
-            if obj:
-                obj.date = str(r["date"]); obj.product_id = pid
-                obj.quantity = int(r["quantity"])
-                obj.unit_price_gross = float(r["unit_price_gross"])
-                obj.discount = float(r.get("discount") or 0.0)
-                obj.payment_method = str(r.get("payment_method") or "efectivo")
-                obj.vat_rate = float(r.get("vat_rate") or 0.21)
-                upd += 1
-            else:
-                db.add(models.Transaction(
-                    txn_id=str(r["txn_id"]), org_id=1, date=str(r["date"]),
-                    product_id=pid, quantity=int(r["quantity"]),
-                    unit_price_gross=float(r["unit_price_gross"]),
-                    discount=float(r.get("discount") or 0.0),
-                    payment_method=str(r.get("payment_method") or "efectivo"),
-                    vat_rate=float(r.get("vat_rate") or 0.21),
-                )); ins += 1
-        except Exception:
-            err += 1
-    return ins, upd, skipped, err
-
-def _upsert_expenses(df: pd.DataFrame, db: Session):
-    ins = upd = skipped = err = 0
-    for _, r in df.iterrows():
-        try:
-            obj = db.get(models.Expense, str(r["exp_id"]))
-            if obj:
-                obj.date = str(r["date"]); obj.category = str(r["category"])
-                obj.description = str(r.get("description") or "")
-                obj.amount_gross = float(r["amount_gross"])
-                obj.vat_rate = float(r.get("vat_rate") or 0.21)
-                obj.payment_method = str(r.get("payment_method") or "transferencia")
-                upd += 1
-            else:
-                db.add(models.Expense(
-                    exp_id=str(r["exp_id"]), org_id=1, date=str(r["date"]),
-                    category=str(r["category"]), description=str(r.get("description") or ""),
-                    amount_gross=float(r["amount_gross"]),
-                    vat_rate=float(r.get("vat_rate") or 0.21),
-                    payment_method=str(r.get("payment_method") or "transferencia"),
-                )); ins += 1
-        except Exception:
-            err += 1
-    return ins, upd, skipped, err
-
-def _upsert_inventory(df: pd.DataFrame, db: Session):
-    ins = upd = skipped = err = 0
-    for _, r in df.iterrows():
-        try:
-            pid = str(r["product_id"])
-            obj = db.get(models.Inventory, pid)
-            if obj:
-                obj.stock_on_hand = int(r["stock_on_hand"])
-                obj.lead_time_days = int(r.get("lead_time_days") or obj.lead_time_days)
-                obj.safety_stock = int(r.get("safety_stock") or obj.safety_stock)
-                upd += 1
-            else:
-                if not db.get(models.Product, pid):
-                    db.add(models.Product(product_id=pid, org_id=1, name=pid, category="", unit_cost=0.0, vat_rate=0.21))
-                db.add(models.Inventory(
-                    product_id=pid, org_id=1,
-                    stock_on_hand=int(r["stock_on_hand"]),
-                    lead_time_days=int(r.get("lead_time_days") or 7),
-                    safety_stock=int(r.get("safety_stock") or 3),
-                )); ins += 1
-        except Exception:
-            err += 1
-    return ins, upd, skipped, err
+            obj = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            obj = None
+        if isinstance(obj, dict):
+            rows.append({k: obj.get(k) for k in fields})
+            row_lines.append(line_no)
+        else:
+            bad_lines.append(line_no)
+
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(chunks.__anext__())
+            # Sin filas pendientes se espera sin límite; con filas, hasta el plazo
+            timeout = max(deadline - loop.time(), 0) if first_line else None
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                yield await flush()
+                continue
+            try:
+                chunk = pending.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                pending = None
+            lines = (tail + chunk).split(b"\n")
+            tail = lines.pop()
+            for line in lines:
+                if line.strip():
+                    parse(line)
+                    if len(rows) >= STREAM_BATCH_ROWS:
+                        yield await flush()
+        if tail.strip():
+            parse(tail)
+        if first_line:
+            yield await flush()
+    except HTTPException as e:
+        total.error = error_message(e)
+    finally:
+        if pending is not None:
+            pending.cancel()
+    total.last_line = line_no
+    total.rejected_report = ingestion.report_url(report)
+    yield total.model_dump_json().encode() + b"\n"
+
+@router.post("/stream", response_class=StreamingResponse)
+async def stream(request: Request):
+    """
+    Ingesta continua de ventas desde TPV: cuerpo NDJSON (una venta por
+    línea, campos de TEMPLATES["sales"]), en streaming. Las filas se
+    escriben en micro-lotes (INGEST_STREAM_BATCH_ROWS filas o
+    INGEST_STREAM_FLUSH_MS ms) y cada lote confirmado se responde con una
+    línea StreamAck; la última línea (final=true) lleva los totales y, si
+    hay filas rechazadas, la URL de su informe. Las líneas que no son un
+    objeto JSON cuentan como error. Si falla la escritura de un lote, se
+    deshace ese lote y la última línea trae `error`.
+    """
+    return _DuplexResponse(_stream_acks(request), media_type="application/x-ndjson")
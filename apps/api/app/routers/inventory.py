@@ -1,9 +1,24 @@
-from fastapi import APIRouter
+from __future__ import annotations
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Iterator, List
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..db import get_db
+from .. import models
+
+if TYPE_CHECKING:  # numpy/pandas se importan al primer cálculo, no al arrancar
+    import pandas as pd
 
 router = APIRouter()
 
+# Filas por trozo de JSON al hacer streaming de la respuesta
+STREAM_ROWS = 5000
+
 class ReorderRow(BaseModel):
     product_id: str
     name: str | None = None
@@ -11,11 +26,100 @@ class ReorderRow(BaseModel):
     stock_on_hand: int
     lead_time_days: int
     safety_stock: int
+    reorder_point: float
     reorder_qty: int
 
+def reorder_table(
+    inv: pd.DataFrame, hist: pd.DataFrame, h: int, window: int,
+    fc: pd.DataFrame | None = None, start: date | None = None,
+) -> pd.DataFrame:
+    """
+    Cálculo vectorizado (NumPy) para todos los SKU a la vez:
+
+    - demanda diaria = unidades vendidas en la ventana / `window`
+    - demand_h = demanda diaria * h
+      (si el SKU tiene previsión en `fc`, ambas salen de la previsión para
+      los `h` días desde `start`, con su estacionalidad semanal)
+    - punto de pedido = demanda diaria * plazo + stock de seguridad
+    - si stock <= punto de pedido: pedir hasta cubrir punto de pedido + demand_h
+    """
+    import numpy as np
+    import pandas as pd
+    from .. import forecast
+
+    qty = hist["quantity"].to_numpy(dtype=float)
+    pos = pd.Index(hist["product_id"]).get_indexer(inv["product_id"])
+    daily = np.where(pos >= 0, qty[pos] if len(qty) else 0.0, 0.0) / window
+    demand_h = daily * h
+
+    if fc is not None and len(fc):
+        fc_daily, fc_h = forecast.horizon_demand(fc, start, h)
+        pos = pd.Index(fc["product_id"]).get_indexer(inv["product_id"])
+        has = pos >= 0
+        daily = np.where(has, fc_daily[pos], daily)
+        demand_h = np.where(has, fc_h[pos], demand_h)
+
+    stock = inv["stock_on_hand"].fillna(0).to_numpy(dtype=float)
+    lead = inv["lead_time_days"].fillna(0).to_numpy(dtype=float)
+    safety = inv["safety_stock"].fillna(0).to_numpy(dtype=float)
+
+    rop = daily * lead + safety
+    need = np.ceil(rop + demand_h - stock)
+    order = np.where(stock <= rop, np.maximum(need, 0), 0)
+
+    out = pd.DataFrame({
+        "product_id": inv["product_id"].to_numpy(),
+        "name": inv["name"].to_numpy(),
+        "demand_h": demand_h.round(2),
+        "stock_on_hand": stock.astype(np.int64),
+        "lead_time_days": lead.astype(np.int64),
+        "safety_stock": safety.astype(np.int64),
+        "reorder_point": rop.round(2),
+        "reorder_qty": order.astype(np.int64),
+    })
+    # Lo más urgente primero
+    return out.sort_values(["reorder_qty", "product_id"], ascending=[False, True], kind="stable")
+
+def _json_chunks(df: pd.DataFrame, rows: int = STREAM_ROWS) -> Iterator[str]:
+    """Array JSON por trozos: la serialización se hace en C (to_json) por bloque."""
+    yield "["
+    for i in range(0, len(df), rows):
+        chunk = df.iloc[i:i + rows].to_json(orient="records", force_ascii=False)
+        yield ("," if i else "") + chunk[1:-1]
+    yield "]"
+
 @router.get("/reorder", response_model=List[ReorderRow])
-def reorder(h: int = 14):
-    return [
-        ReorderRow(product_id="SKU-001", name="Sandalia", demand_h=20, stock_on_hand=5, lead_time_days=7, safety_stock=4, reorder_qty=9),
-        ReorderRow(product_id="SKU-002", name="Novela", demand_h=8, stock_on_hand=10, lead_time_days=5, safety_stock=2, reorder_qty=0),
-    ]
+def reorder(
+    org_id: int = 1,
+    h: int = Query(14, ge=1, le=365, description="Horizonte a cubrir (días)"),
+    window: int = Query(28, ge=7, le=365, description="Días de historial para estimar la demanda"),
+    db: Session = Depends(get_db),
+):
+    import pandas as pd
+    from .. import forecast
+
+    I, P, DS = models.Inventory, models.Product, models.DailySales
+    # Core (no ORM) para no construir un objeto por fila
+    conn = db.connection()
+    inv = pd.DataFrame(conn.execute(
+        select(I.product_id, P.name, I.stock_on_hand, I.lead_time_days, I.safety_stock)
+        .outerjoin(P, P.id == I.product_id)
+        .where(I.org_id == org_id)
+    ).all(), columns=["product_id", "name", "stock_on_hand", "lead_time_days", "safety_stock"])
+
+    # Historial por SKU en una sola consulta agrupada (sobre el agregado
+    # diario), anclado al último día con ventas de la organización
+    last = conn.scalar(select(func.max(DS.date)).where(DS.org_id == org_id))
+    hist = pd.DataFrame(conn.execute(
+        select(DS.product_id, func.sum(DS.quantity))
+        .where(DS.org_id == org_id, DS.date > last - timedelta(days=window))
+        .group_by(DS.product_id)
+    ).all() if last else [], columns=["product_id", "quantity"])
+
+    # Previsiones precalculadas (app/forecast.py); sin ellas, historial
+    fc = forecast.load_forecasts(conn, org_id) if last else None
+    db.close()  # devuelve la conexión al pool antes del cálculo
+
+    start = last + timedelta(days=1) if last else None
+    table = reorder_table(inv, hist, h, window, fc, start)
+    return StreamingResponse(_json_chunks(table), media_type="application/json")
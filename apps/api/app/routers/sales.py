@@ -1,14 +1,17 @@
 # apps/api/app/routers/sales.py
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from typing import List, Optional, Literal, Dict
 
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy import func, select, cast, Date
-from sqlalchemy.orm import aliased
+from sqlalchemy import func, select, cast, null, literal, literal_column, or_, union_all, Date, String
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
-from ..db import SessionLocal
-from .. import models
+from ..db import get_async_db, init_engine
+from .. import db as database
+from .. import analytics, exports, models
 
 router = APIRouter()
 
@@ -20,6 +23,13 @@ class SalesKPI(BaseModel):
     gastos_neto: float
     beneficio_neto: float
 
+class OrgKPI(SalesKPI):
+    org_id: int
+
+class OrgKPIPage(BaseModel):
+    total: int
+    items: List[OrgKPI]
+
 class TSPoint(BaseModel):
     date: date
     ingresos: float
@@ -28,18 +38,42 @@ class TSPoint(BaseModel):
     beneficio: float
     margen_bruto: float
 
+class CashflowPoint(TSPoint):
+    # Solo con las opciones de ventana de /cashflow
+    flujo: Optional[float] = None
+    saldo: Optional[float] = None
+    medias: Optional[Dict[str, float]] = None
+
 class NamedValue(BaseModel):
     name: str
     value: float
 
+class Dashboard(BaseModel):
+    kpi: SalesKPI
+    timeseries: List[TSPoint]
+    top_products: List[NamedValue]
+    by_category: List[NamedValue]
+
 # ---------- Helpers ----------
-def revenue_expr():
-    # ingreso = precio * qty - descuento
-    return (models.Transaction.unit_price_gross * models.Transaction.quantity) - func.coalesce(models.Transaction.discount, 0.0)
+# Todas las consultas leen de los agregados diarios (models.DailySales /
+# models.DailyExpense), que la ingesta mantiene al día: el coste depende del
+# número de días del rango, no del número de transacciones.
+#
+# Los endpoints son async y reciben una sesión del engine asíncrono
+# (db.get_async_db): mientras la BD responde, el worker sigue atendiendo
+# otras peticiones.
+
+def _label(endpoint: str) -> dict:
+    """Etiqueta para el registro de consultas lentas (app/slowlog.py)."""
+    return {"query_label": f"sales.{endpoint}"}
 
-def cogs_expr():
-    # COGS = sum(unit_cost * qty) usando join con products
-    return (models.Product.unit_cost * models.Transaction.quantity)
+async def _analytics(fn, *args):
+    """El motor DuckDB es síncrono: se ejecuta en el threadpool con sesión síncrona."""
+    def run():
+        init_engine()
+        with database.SessionLocal() as s:
+            return fn(s, *args)
+    return await run_in_threadpool(run)
 
 def period_bounds(
     f: Optional[str], t: Optional[str]
@@ -55,183 +89,542 @@ def apply_date_range(stmt, col, _from: Optional[date], _to: Optional[date]):
         stmt = stmt.where(col <= _to)
     return stmt
 
+def bucket(col, granularity: str):
+    """Fecha agrupada por día / semana ISO / mes (date_trunc en PG)."""
+    if granularity == "day":
+        return col
+    return func.date_trunc(granularity, col).cast(Date)
+
+def _kpi_out(ingresos: float, cogs: float, gastos: float) -> SalesKPI:
+    margen = ingresos - cogs
+    beneficio = margen - gastos
+    return SalesKPI(
+        ingresos_neto=round(ingresos, 2),
+        cogs_neto=round(cogs, 2),
+        margen_bruto=round(margen, 2),
+        gastos_neto=round(gastos, 2),
+        beneficio_neto=round(beneficio, 2),
+    )
+
+def _ts_points(rows, exp_rows: Dict[date, float]) -> List[TSPoint]:
+    """Une (fecha, ingresos, cogs) con los gastos del mismo periodo."""
+    out: List[TSPoint] = []
+    for d, ingresos, cogs in rows:
+        gastos = float(exp_rows.get(d, 0.0))
+        margen = ingresos - cogs
+        beneficio = margen - gastos
+        out.append(
+            TSPoint(
+                date=d,
+                ingresos=round(ingresos, 2),
+                gastos=round(gastos, 2),
+                cogs=round(cogs, 2),
+                margen_bruto=round(margen, 2),
+                beneficio=round(beneficio, 2),
+            )
+        )
+    return out
+
+TSFormat = Literal["rows", "columnar"]
+
+def _ts_columns(rows, exp_rows: Dict[date, float]) -> dict:
+    """
+    Igual que _ts_points pero en arrays paralelos: sin un modelo por punto
+    ni revalidación, y con un JSON mucho más pequeño (claves una sola vez).
+    """
+    dates = [r[0] for r in rows]
+    ingresos = [r[1] for r in rows]
+    cogs = [r[2] for r in rows]
+    gastos = [float(exp_rows.get(d, 0.0)) for d in dates]
+    margen = [i - c for i, c in zip(ingresos, cogs)]
+    beneficio = [m - g for m, g in zip(margen, gastos)]
+    return {
+        "dates": dates,
+        "ingresos": [round(x, 2) for x in ingresos],
+        "gastos": [round(x, 2) for x in gastos],
+        "cogs": [round(x, 2) for x in cogs],
+        "margen_bruto": [round(x, 2) for x in margen],
+        "beneficio": [round(x, 2) for x in beneficio],
+    }
+
+def _ts_response(rows, exp_rows: Dict[date, float], fmt: TSFormat):
+    if fmt == "columnar":
+        return ORJSONResponse(_ts_columns(rows, exp_rows))
+    return _ts_points(rows, exp_rows)
+
 # ---------- KPI ----------
 @router.get("/kpi", response_model=SalesKPI)
-def kpi(
+async def kpi(
     org_id: int = 1,
     _from: Optional[str] = None,
     _to: Optional[str] = None,
+    s: AsyncSession = Depends(get_async_db),
 ):
     f, t = period_bounds(_from, _to)
+    DS, DE = models.DailySales, models.DailyExpense
 
-    with SessionLocal() as s:
-        # Ingresos
-        st_rev = select(func.coalesce(func.sum(revenue_expr()), 0.0)).select_from(models.Transaction).where(models.Transaction.org_id == org_id)
-        st_rev = apply_date_range(st_rev, models.Transaction.date, f, t)
-        ingresos = s.execute(st_rev).scalar_one()
-
-        # COGS (join a products)
-        st_cogs = (
-            select(func.coalesce(func.sum(cogs_expr()), 0.0))
-            .select_from(models.Transaction)
-            .join(models.Product, models.Product.product_id == models.Transaction.product_id)
-            .where(models.Transaction.org_id == org_id)
+    # Ingresos y COGS
+    st_sales = (
+        select(
+            func.coalesce(func.sum(DS.revenue), 0.0),
+            func.coalesce(func.sum(DS.cogs), 0.0),
         )
-        st_cogs = apply_date_range(st_cogs, models.Transaction.date, f, t)
-        cogs = s.execute(st_cogs).scalar_one()
+        .where(DS.org_id == org_id)
+    )
+    st_sales = apply_date_range(st_sales, DS.date, f, t)
+    ingresos, cogs = (await s.execute(st_sales, execution_options=_label("kpi"))).one()
 
-        margen = ingresos - cogs
+    # Gastos
+    st_exp = select(func.coalesce(func.sum(DE.amount_gross), 0.0)).where(DE.org_id == org_id)
+    st_exp = apply_date_range(st_exp, DE.date, f, t)
+    gastos = (await s.execute(st_exp, execution_options=_label("kpi"))).scalar_one()
 
-        # Gastos
-        st_exp = (
-            select(func.coalesce(func.sum(models.Expense.amount_gross), 0.0))
-            .select_from(models.Expense)
-            .where(models.Expense.org_id == org_id)
-        )
-        st_exp = apply_date_range(st_exp, models.Expense.date, f, t)
-        gastos = s.execute(st_exp).scalar_one()
+    return _kpi_out(ingresos, cogs, gastos)
 
-        beneficio = margen - gastos
+# ---------- KPI por organización (cadenas / central) ----------
+KPISort = Literal["org_id", "ingresos_neto", "cogs_neto", "margen_bruto", "gastos_neto", "beneficio_neto"]
 
-        return SalesKPI(
-            ingresos_neto=round(ingresos, 2),
-            cogs_neto=round(cogs, 2),
-            margen_bruto=round(margen, 2),
-            gastos_neto=round(gastos, 2),
-            beneficio_neto=round(beneficio, 2),
-        )
+def _org_ids(raw: str) -> Optional[List[int]]:
+    """'all' -> None (todas); '1,2,3' -> [1, 2, 3]."""
+    if raw.strip().lower() == "all":
+        return None
+    try:
+        ids = sorted({int(x) for x in raw.split(",") if x.strip()})
+    except ValueError:
+        raise HTTPException(422, "org_ids debe ser 'all' o una lista de enteros separada por comas")
+    if not ids:
+        raise HTTPException(422, "org_ids vacío")
+    return ids
+
+@router.get("/kpi/batch", response_model=OrgKPIPage)
+async def kpi_batch(
+    org_ids: str = Query("all", description="Lista separada por comas (1,2,3) o 'all'"),
+    _from: Optional[str] = None,
+    _to: Optional[str] = None,
+    sort: KPISort = "org_id",
+    order: Literal["asc", "desc"] = "asc",
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    s: AsyncSession = Depends(get_async_db),
+):
+    """
+    KPI de varias organizaciones con consultas agrupadas por org_id: el
+    número de consultas no depende del número de tiendas. Las orgs sin
+    datos en el periodo salen a cero.
+    """
+    f, t = period_bounds(_from, _to)
+    ids = _org_ids(org_ids)
+    DS, DE = models.DailySales, models.DailyExpense
+
+    if ids is None:
+        ids = (await s.execute(select(models.Org.id).order_by(models.Org.id),
+                               execution_options=_label("kpi_batch"))).scalars().all()
+
+    st_sales = (
+        select(DS.org_id, func.sum(DS.revenue), func.sum(DS.cogs))
+        .where(DS.org_id.in_(ids))
+        .group_by(DS.org_id)
+    )
+    st_sales = apply_date_range(st_sales, DS.date, f, t)
+    sales_by_org = {o: (r, c) for o, r, c in await s.execute(st_sales, execution_options=_label("kpi_batch"))}
+
+    st_exp = select(DE.org_id, func.sum(DE.amount_gross)).where(DE.org_id.in_(ids)).group_by(DE.org_id)
+    st_exp = apply_date_range(st_exp, DE.date, f, t)
+    exp_by_org = dict((await s.execute(st_exp, execution_options=_label("kpi_batch"))).all())
+
+    items = [
+        OrgKPI(org_id=o, **_kpi_out(*sales_by_org.get(o, (0.0, 0.0)), exp_by_org.get(o, 0.0)).model_dump())
+        for o in ids
+    ]
+    items.sort(key=lambda k: (getattr(k, sort), k.org_id), reverse=order == "desc")
+    end = offset + limit if limit else None
+    return OrgKPIPage(total=len(items), items=items[offset:end])
 
 # ---------- Timeseries ----------
 @router.get("/timeseries", response_model=List[TSPoint])
-def timeseries(
+async def timeseries(
     org_id: int = 1,
     granularity: Literal["day", "week", "month"] = "day",
     _from: Optional[str] = None,
     _to: Optional[str] = None,
+    fmt: TSFormat = Query("rows", alias="format", description="columnar: {dates: [...], ingresos: [...], ...}"),
+    s: AsyncSession = Depends(get_async_db),
 ):
     f, t = period_bounds(_from, _to)
-    with SessionLocal() as s:
-        # Group date function
-        if granularity == "day":
-            gdate = cast(models.Transaction.date, Date)
-        elif granularity == "week":
-            # ISO week start; group by year-week -> approximate by date_trunc in PG
-            gdate = func.date_trunc("week", models.Transaction.date).cast(Date)
-        else:
-            gdate = func.date_trunc("month", models.Transaction.date).cast(Date)
-
-        # ingresos / cogs grouped
-        st_rev = (
-            select(
-                gdate.label("d"),
-                func.coalesce(func.sum(revenue_expr()), 0.0).label("ingresos"),
-                func.coalesce(func.sum(cogs_expr()), 0.0).label("cogs"),
-            )
-            .select_from(models.Transaction)
-            .join(models.Product, models.Product.product_id == models.Transaction.product_id)
-            .where(models.Transaction.org_id == org_id)
-            .group_by(gdate)
-            .order_by(gdate)
+    DS, DE = models.DailySales, models.DailyExpense
+    # Histórico en Parquet/DuckDB si el motor analítico está activo
+    if analytics.enabled():
+        res = await _analytics(analytics.timeseries, org_id, granularity, f, t)
+        if res is not None:
+            return _ts_response(*res, fmt)
+
+    # ingresos / cogs grouped
+    gdate = bucket(DS.date, granularity)
+    st_rev = (
+        select(
+            gdate.label("d"),
+            func.coalesce(func.sum(DS.revenue), 0.0).label("ingresos"),
+            func.coalesce(func.sum(DS.cogs), 0.0).label("cogs"),
         )
-        st_rev = apply_date_range(st_rev, models.Transaction.date, f, t)
-        rows = s.execute(st_rev).all()
-
-        # gastos grouped
-        if granularity == "day":
-            egdate = cast(models.Expense.date, Date)
-        elif granularity == "week":
-            egdate = func.date_trunc("week", models.Expense.date).cast(Date)
-        else:
-            egdate = func.date_trunc("month", models.Expense.date).cast(Date)
+        .where(DS.org_id == org_id)
+        .group_by(gdate)
+        .order_by(gdate)
+    )
+    st_rev = apply_date_range(st_rev, DS.date, f, t)
+    rows = (await s.execute(st_rev, execution_options=_label("timeseries"))).all()
 
-        st_exp = (
-            select(
-                egdate.label("d"),
-                func.coalesce(func.sum(models.Expense.amount_gross), 0.0).label("gastos")
-            )
-            .select_from(models.Expense)
-            .where(models.Expense.org_id == org_id)
-            .group_by(egdate)
-            .order_by(egdate)
+    # gastos grouped
+    egdate = bucket(DE.date, granularity)
+    st_exp = (
+        select(
+            egdate.label("d"),
+            func.coalesce(func.sum(DE.amount_gross), 0.0).label("gastos")
         )
-        st_exp = apply_date_range(st_exp, models.Expense.date, f, t)
-        exp_rows = dict(s.execute(st_exp).all())
-
-        out: List[TSPoint] = []
-        for d, ingresos, cogs in rows:
-            gastos = float(exp_rows.get(d, 0.0))
-            margen = ingresos - cogs
-            beneficio = margen - gastos
-            out.append(
-                TSPoint(
-                    date=d,
-                    ingresos=round(ingresos, 2),
-                    gastos=round(gastos, 2),
-                    cogs=round(cogs, 2),
-                    margen_bruto=round(margen, 2),
-                    beneficio=round(beneficio, 2),
-                )
-            )
-        return out
+        .where(DE.org_id == org_id)
+        .group_by(egdate)
+        .order_by(egdate)
+    )
+    st_exp = apply_date_range(st_exp, DE.date, f, t)
+    exp_rows = dict((await s.execute(st_exp, execution_options=_label("timeseries"))).all())
+
+    return _ts_response(rows, exp_rows, fmt)
+
+# ---------- Ingresos por producto (nombres y categorías del catálogo) ----------
+async def _by_product(s: AsyncSession, org_id: int, f, t, endpoint: str) -> list:
+    """(product_id, ingresos) del periodo, sin JOIN: el catálogo pone nombre y categoría."""
+    DS = models.DailySales
+    st = (
+        select(DS.product_id, func.sum(DS.revenue))
+        .where(DS.org_id == org_id)
+        .group_by(DS.product_id)
+    )
+    st = apply_date_range(st, DS.date, f, t)
+    return (await s.execute(st, execution_options=_label(endpoint))).all()
+
+def _ranked(labels, rows, limit: int, empty: Optional[str] = None) -> List[NamedValue]:
+    """Suma los ingresos por etiqueta y devuelve las `limit` mayores."""
+    totals: Dict[Optional[str], float] = {}
+    for label, (_, v) in zip(labels, rows):
+        totals[label] = totals.get(label, 0.0) + float(v or 0.0)
+    top = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+    return [NamedValue(name=k or empty or "", value=round(v, 2)) for k, v in top]
 
 # ---------- Top products ----------
 @router.get("/top-products", response_model=List[NamedValue])
-def top_products(
+async def top_products(
     org_id: int = 1,
     limit: int = 10,
     _from: Optional[str] = None,
     _to: Optional[str] = None,
+    s: AsyncSession = Depends(get_async_db),
 ):
     f, t = period_bounds(_from, _to)
-    with SessionLocal() as s:
-        st = (
-            select(
-                models.Product.name,
-                func.coalesce(func.sum(revenue_expr()), 0.0).label("ingresos"),
-            )
-            .select_from(models.Transaction)
-            .join(models.Product, models.Product.product_id == models.Transaction.product_id)
-            .where(models.Transaction.org_id == org_id)
-            .group_by(models.Product.name)
-            .order_by(func.coalesce(func.sum(revenue_expr()), 0.0).desc())
-            .limit(limit)
-        )
-        st = apply_date_range(st, models.Transaction.date, f, t)
-        rows = s.execute(st).all()
-        return [NamedValue(name=r[0], value=round(float(r[1]), 2)) for r in rows]
+    from .. import catalog  # numpy/pandas: solo al primer uso
+
+    rows = await _by_product(s, org_id, f, t, "top-products")
+    cat = await catalog.get_async(s, org_id)
+    return _ranked(cat.names([r[0] for r in rows]), rows, limit)
 
 # ---------- By category ----------
 @router.get("/by-category", response_model=List[NamedValue])
-def by_category(
+async def by_category(
     org_id: int = 1,
     limit: int = 10,
     _from: Optional[str] = None,
     _to: Optional[str] = None,
+    s: AsyncSession = Depends(get_async_db),
 ):
     f, t = period_bounds(_from, _to)
-    with SessionLocal() as s:
-        st = (
-            select(
-                models.Product.category,
-                func.coalesce(func.sum(revenue_expr()), 0.0).label("ingresos"),
-            )
-            .select_from(models.Transaction)
-            .join(models.Product, models.Product.product_id == models.Transaction.product_id)
-            .where(models.Transaction.org_id == org_id)
-            .group_by(models.Product.category)
-            .order_by(func.coalesce(func.sum(revenue_expr()), 0.0).desc())
-            .limit(limit)
-        )
-        st = apply_date_range(st, models.Transaction.date, f, t)
-        rows = s.execute(st).all()
-        return [NamedValue(name=r[0] or "Sin categoría", value=round(float(r[1]), 2)) for r in rows]
+    if analytics.enabled():
+        rows = await _analytics(analytics.by_category, org_id, limit, f, t)
+        if rows is not None:
+            return [NamedValue(name=r[0] or "Sin categoría", value=round(float(r[1]), 2)) for r in rows]
+
+    from .. import catalog
+
+    rows = await _by_product(s, org_id, f, t, "by-category")
+    cat = await catalog.get_async(s, org_id)
+    return _ranked(cat.categories([r[0] for r in rows]), rows, limit, "Sin categoría")
+
+# ---------- Dashboard (todo en una consulta) ----------
+@router.get("/dashboard", response_model=Dashboard)
+async def dashboard(
+    org_id: int = 1,
+    granularity: Literal["day", "week", "month"] = "day",
+    limit: int = 10,
+    _from: Optional[str] = None,
+    _to: Optional[str] = None,
+    s: AsyncSession = Depends(get_async_db),
+):
+    """
+    KPI, serie temporal, top productos y categorías en un único viaje a la BD:
+    dos CTE filtran una vez la organización y el rango, y un UNION ALL devuelve
+    todos los agregados etiquetados por parte. El KPI sale de sumar la serie.
+    """
+    f, t = period_bounds(_from, _to)
+    DS, DE, P = models.DailySales, models.DailyExpense, models.Product
+
+    ds = apply_date_range(
+        select(DS.date, DS.revenue, DS.cogs, P.name, P.category)
+        .select_from(DS)
+        .join(P, P.id == DS.product_id)
+        .where(DS.org_id == org_id),
+        DS.date, f, t,
+    ).cte("ds")
+    de = apply_date_range(
+        select(DE.date, DE.amount_gross).where(DE.org_id == org_id),
+        DE.date, f, t,
+    ).cte("de")
+
+    def part(tag: str, d, name, v1, v2):
+        return (literal_column(f"'{tag}'").label("part"), d.label("d"), name.label("name"),
+                v1.label("v1"), v2.label("v2"))
+
+    no_date = cast(null(), Date)
+    no_name = cast(null(), String)
+    zero = literal_column("0.0")
+    revenue = func.sum(ds.c.revenue)
+
+    ts_d = bucket(ds.c.date, granularity)
+    ts = select(*part("ts", ts_d, no_name, revenue, func.sum(ds.c.cogs))).group_by(ts_d)
+    ex_d = bucket(de.c.date, granularity)
+    ex = select(*part("exp", ex_d, no_name, func.sum(de.c.amount_gross), zero)).group_by(ex_d)
+    prod = (
+        select(*part("prod", no_date, ds.c.name, revenue, zero))
+        .group_by(ds.c.name).order_by(revenue.desc()).limit(limit)
+        .subquery()
+    )
+    cat = (
+        select(*part("cat", no_date, ds.c.category, revenue, zero))
+        .group_by(ds.c.category).order_by(revenue.desc()).limit(limit)
+        .subquery()
+    )
+    stmt = union_all(ts, ex, select(prod), select(cat))
+
+    ts_rows, exp_rows, top, cats = [], {}, [], []
+    for part, d, name, v1, v2 in await s.execute(stmt, execution_options=_label("dashboard")):
+        if part == "ts":
+            ts_rows.append((d, v1, v2))
+        elif part == "exp":
+            exp_rows[d] = v1
+        elif part == "prod":
+            top.append(NamedValue(name=name, value=round(float(v1), 2)))
+        else:
+            cats.append(NamedValue(name=name or "Sin categoría", value=round(float(v1), 2)))
+
+    ts_rows.sort(key=lambda r: r[0])
+    top.sort(key=lambda nv: nv.value, reverse=True)
+    cats.sort(key=lambda nv: nv.value, reverse=True)
+    return Dashboard(
+        kpi=_kpi_out(
+            sum(r[1] for r in ts_rows),
+            sum(r[2] for r in ts_rows),
+            sum(exp_rows.values()),
+        ),
+        timeseries=_ts_points(ts_rows, exp_rows),
+        top_products=top,
+        by_category=cats,
+    )
 
 # ---------- Cashflow (ingresos vs gastos) ----------
-@router.get("/cashflow", response_model=List[TSPoint])
-def cashflow(
+CashMeasure = Literal["flujo", "ingresos", "gastos", "beneficio"]
+MAX_MA_DAYS = 365
+
+def _scan_from(f: Optional[date], running: bool, ma: List[int]) -> Optional[date]:
+    """
+    Primer día que hay que leer. El saldo arranca en el primer día con datos,
+    aunque se pida un rango: se recorre el histórico anterior a `f` y solo se
+    devuelve [f, t]. Sin saldo basta con los `max(ma) - 1` días previos a
+    `f` para que las medias del primer día ya tengan su ventana completa.
+    """
+    if running or f is None:
+        return None
+    return f - timedelta(days=max(ma, default=1) - 1)
+
+def _daily_totals(org_id: int, lo: Optional[date], hi: Optional[date]):
+    """(ingresos, cogs) y gastos por día con datos, de los agregados diarios."""
+    DS, DE = models.DailySales, models.DailyExpense
+    rev = apply_date_range(
+        select(DS.date.label("d"), func.sum(DS.revenue).label("ingresos"), func.sum(DS.cogs).label("cogs"))
+        .where(DS.org_id == org_id).group_by(DS.date),
+        DS.date, lo, hi,
+    )
+    exp = apply_date_range(
+        select(DE.date.label("d"), func.sum(DE.amount_gross).label("gastos"))
+        .where(DE.org_id == org_id).group_by(DE.date),
+        DE.date, lo, hi,
+    )
+    return rev, exp
+
+def _cashflow_stmt(org_id: int, f: Optional[date], t: Optional[date], fill: bool,
+                   running: bool, ma: List[int], measure: CashMeasure):
+    """
+    Serie diaria con huecos rellenados (generate_series) y las ventanas
+    pedidas: saldo acumulado (SUM OVER) y medias móviles (AVG OVER ROWS).
+    Todas las ventanas comparten el ORDER BY, así PG las calcula en una sola
+    pasada ordenada sobre los agregados diarios. Solo Postgres.
+    """
+    scan_from = _scan_from(f, running, ma)
+    rev, exp = _daily_totals(org_id, scan_from, t)
+    rev, exp = rev.cte("rev"), exp.cte("exp")
+
+    # Calendario completo: de `scan_from` (o el primer día con datos) a `t` (o el último)
+    lo = literal(scan_from, Date) if scan_from else func.least(
+        select(func.min(rev.c.d)).scalar_subquery(), select(func.min(exp.c.d)).scalar_subquery())
+    hi = literal(t, Date) if t else func.greatest(
+        select(func.max(rev.c.d)).scalar_subquery(), select(func.max(exp.c.d)).scalar_subquery())
+    days = select(
+        cast(func.generate_series(lo, hi, literal_column("interval '1 day'")), Date).label("d")
+    ).cte("days")
+
+    ingresos = func.coalesce(rev.c.ingresos, 0.0)
+    cogs = func.coalesce(rev.c.cogs, 0.0)
+    gastos = func.coalesce(exp.c.gastos, 0.0)
+    values = {
+        "flujo": ingresos - gastos,
+        "ingresos": ingresos,
+        "gastos": gastos,
+        "beneficio": ingresos - cogs - gastos,
+    }
+    cols = [
+        days.c.d, ingresos.label("ingresos"), cogs.label("cogs"), gastos.label("gastos"),
+        or_(rev.c.d.is_not(None), exp.c.d.is_not(None)).label("con_datos"),
+    ]
+    if running:
+        cols.append(func.sum(values["flujo"]).over(order_by=days.c.d, rows=(None, 0)).label("saldo"))
+    for n in ma:
+        cols.append(func.avg(values[measure]).over(order_by=days.c.d, rows=(-(n - 1), 0)).label(f"media_{n}"))
+
+    series = (
+        select(*cols)
+        .select_from(days.outerjoin(rev, rev.c.d == days.c.d).outerjoin(exp, exp.c.d == days.c.d))
+        .subquery()
+    )
+    stmt = select(series).order_by(series.c.d)
+    if f:
+        stmt = stmt.where(series.c.d >= f)
+    if not fill:
+        stmt = stmt.where(series.c.con_datos)
+    return stmt
+
+async def _cashflow_rows(s: AsyncSession, org_id: int, f: Optional[date], t: Optional[date],
+                         fill: bool, running: bool, ma: List[int], measure: CashMeasure) -> list:
+    """
+    Filas de la serie con ventanas. En Postgres, una consulta (_cashflow_stmt);
+    en el resto (SQLite en desarrollo y tests) se leen los totales por día y
+    el relleno y las ventanas se calculan con pandas, con el mismo resultado.
+    """
+    if s.bind.dialect.name == "postgresql":
+        stmt = _cashflow_stmt(org_id, f, t, fill, running, ma, measure)
+        return [r._mapping for r in await s.execute(stmt, execution_options=_label("cashflow"))]
+
+    import pandas as pd
+
+    scan_from = _scan_from(f, running, ma)
+    rev, exp = _daily_totals(org_id, scan_from, t)
+    rev = pd.DataFrame((await s.execute(rev, execution_options=_label("cashflow"))).all(),
+                       columns=["d", "ingresos", "cogs"]).set_index("d")
+    exp = pd.DataFrame((await s.execute(exp, execution_options=_label("cashflow"))).all(),
+                       columns=["d", "gastos"]).set_index("d")
+    df = rev.join(exp, how="outer")
+    if df.empty:
+        return []
+    df.index = pd.to_datetime(df.index)
+    with_data = df.index
+    df = df.reindex(pd.date_range(scan_from or with_data.min(), t or with_data.max(), freq="D"))
+    df = df.astype(float).fillna(0.0)
+
+    values = {
+        "flujo": df["ingresos"] - df["gastos"],
+        "ingresos": df["ingresos"],
+        "gastos": df["gastos"],
+        "beneficio": df["ingresos"] - df["cogs"] - df["gastos"],
+    }
+    if running:
+        df["saldo"] = values["flujo"].cumsum()
+    for n in ma:
+        df[f"media_{n}"] = values[measure].rolling(n, min_periods=1).mean()
+
+    if f:
+        df = df[df.index >= pd.Timestamp(f)]
+    if not fill:
+        df = df[df.index.isin(with_data)]
+    df.insert(0, "d", df.index.date)
+    return df.to_dict("records")
+
+def _cashflow_response(rows, running: bool, ma: List[int], fmt: TSFormat):
+    """Las columnas de la serie (_ts_points/_ts_columns) más flujo, saldo y medias."""
+    ts_rows = [(r["d"], r["ingresos"], r["cogs"]) for r in rows]
+    exp_rows = {r["d"]: r["gastos"] for r in rows}
+    flujo = [round(r["ingresos"] - r["gastos"], 2) for r in rows]
+    saldo = [round(r["saldo"], 2) for r in rows] if running else None
+    medias = {str(n): [round(float(r[f"media_{n}"]), 2) for r in rows] for n in ma}
+
+    if fmt == "columnar":
+        out = _ts_columns(ts_rows, exp_rows)
+        out["flujo"] = flujo
+        if running:
+            out["saldo"] = saldo
+        for n, vals in medias.items():
+            out[f"media_{n}"] = vals
+        return ORJSONResponse(out)
+
+    return [
+        CashflowPoint(
+            **p.model_dump(), flujo=flujo[i],
+            saldo=saldo[i] if running else None,
+            medias={n: vals[i] for n, vals in medias.items()} or None,
+        )
+        for i, p in enumerate(_ts_points(ts_rows, exp_rows))
+    ]
+
+@router.get("/cashflow", response_model=List[CashflowPoint], response_model_exclude_none=True)
+async def cashflow(
+    org_id: int = 1,
+    _from: Optional[str] = None,
+    _to: Optional[str] = None,
+    fill: bool = Query(False, description="Incluye los días sin ventas ni gastos (a cero)"),
+    running: bool = Query(False, description="Saldo acumulado de ingresos - gastos desde el primer día con datos"),
+    ma: List[int] = Query([], description=f"Medias móviles de N días (1-{MAX_MA_DAYS}), p. ej. ma=7&ma=30"),
+    ma_of: CashMeasure = Query("flujo", description="Medida sobre la que se calculan las medias"),
+    fmt: TSFormat = Query("rows", alias="format", description="columnar: {dates: [...], ingresos: [...], ...}"),
+    s: AsyncSession = Depends(get_async_db),
+):
+    """
+    Serie diaria de ingresos y gastos. Sin opciones es la serie diaria de
+    /timeseries. Con `fill`, `running` o `ma` la BD rellena los días vacíos
+    y calcula saldo y medias con funciones de ventana (ver _cashflow_stmt;
+    fuera de Postgres, con pandas): solo viajan los días del rango pedido.
+    """
+    if not (fill or running or ma):
+        # daily line good for small shops
+        return await timeseries(org_id=org_id, granularity="day", _from=_from, _to=_to, fmt=fmt, s=s)
+
+    ma = sorted(set(ma))
+    if any(n < 1 or n > MAX_MA_DAYS for n in ma):
+        raise HTTPException(422, f"ma debe estar entre 1 y {MAX_MA_DAYS}")
+    f, t = period_bounds(_from, _to)
+    rows = await _cashflow_rows(s, org_id, f, t, fill, running, ma, ma_of)
+    return _cashflow_response(rows, running, ma, fmt)
+
+# ---------- Exportación (streaming) ----------
+@router.get("/export", response_class=StreamingResponse)
+def export(
     org_id: int = 1,
     _from: Optional[str] = None,
     _to: Optional[str] = None,
+    fmt: exports.ExportFormat = Query("csv", alias="format"),
 ):
-    # daily line good for small shops
-    return timeseries(org_id=org_id, granularity="day", _from=_from, _to=_to)
+    """
+    Transacciones del periodo en CSV, NDJSON o Parquet (columnas de la
+    plantilla de ingesta). Se leen con cursor de servidor y se envían por
+    lotes: sirve para millones de filas sin cargarlas en memoria.
+    """
+    f, t = period_bounds(_from, _to)
+    T = models.Transaction
+    stmt = select(
+        T.txn_id, T.date, T.product_id, T.quantity, T.unit_price_gross,
+        T.discount, T.payment_method, T.vat_rate,
+    ).where(T.org_id == org_id)
+    stmt = apply_date_range(stmt, T.date, f, t).order_by(T.date, T.txn_id)
+    return exports.response(stmt, fmt, f"sales_org{org_id}_{f or 'inicio'}_{t or 'fin'}")
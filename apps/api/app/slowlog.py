@@ -0,0 +1,119 @@
+# apps/api/app/slowlog.py
+"""
+Registro de consultas lentas con captura de planes.
+
+Toda consulta que supera SLOW_QUERY_MS se escribe en el log (sentencia,
+parámetros y duración) y se guarda en un buffer circular en memoria. Para
+las consultas etiquetadas con la opción de ejecución `query_label` (las de
+app/routers/sales.py), una muestra (EXPLAIN_SAMPLE_RATE) se vuelve a
+ejecutar en segundo plano con EXPLAIN (ANALYZE, BUFFERS) (EXPLAIN QUERY PLAN
+en SQLite) y el plan queda asociado a la entrada.
+
+Consulta: GET /api/admin/slow-queries (ver app/routers/admin.py).
+"""
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import event
+
+log = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+EXPLAIN_SAMPLE_RATE = float(os.getenv("EXPLAIN_SAMPLE_RATE", "0.2"))
+EXPLAIN_TIMEOUT_MS = int(os.getenv("EXPLAIN_TIMEOUT_MS", "30000"))
+SLOW_QUERY_KEEP = int(os.getenv("SLOW_QUERY_KEEP", "200"))
+
+_entries: deque = deque(maxlen=SLOW_QUERY_KEEP)
+_ids = itertools.count(1)
+_lock = threading.Lock()
+# Un solo hilo: como mucho un EXPLAIN ANALYZE a la vez por proceso
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+_pending = threading.Event()
+
+
+def _short(value, limit: int = 500) -> str:
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def install(engine) -> None:
+    """Mide cada consulta del engine (síncrono; para async, .sync_engine)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._slowlog_t0 = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - context._slowlog_t0) * 1000
+        if elapsed_ms >= SLOW_QUERY_MS and context.execution_options.get("slow_log", True):
+            _record(statement, parameters, elapsed_ms, context)
+
+
+def _record(statement: str, parameters, elapsed_ms: float, context) -> None:
+    label = context.execution_options.get("query_label")
+    entry = {
+        "id": next(_ids),
+        "at": datetime.now(timezone.utc),
+        "label": label,
+        "duration_ms": round(elapsed_ms, 1),
+        "statement": statement,
+        "params": _short(parameters),
+        "plan": None,
+    }
+    with _lock:
+        _entries.append(entry)
+    log.warning("Consulta lenta (%.0f ms) [%s]: %s | params=%s",
+                elapsed_ms, label or "-", " ".join(statement.split()), entry["params"])
+
+    compiled = context.compiled
+    if (label and compiled is not None and not _pending.is_set()
+            and random.random() < EXPLAIN_SAMPLE_RATE):
+        _pending.set()
+        _executor.submit(_explain, entry, compiled.statement)
+
+
+def _explain(entry: dict, stmt) -> None:
+    """Vuelve a ejecutar la sentencia con EXPLAIN en una conexión aparte."""
+    from .db import init_engine
+
+    try:
+        engine = init_engine()
+        sql = str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+        opts = {"slow_log": False}
+        with engine.connect() as conn:
+            if engine.dialect.name == "postgresql":
+                conn.exec_driver_sql(f"SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MS}", execution_options=opts)
+                rows = conn.exec_driver_sql("EXPLAIN (ANALYZE, BUFFERS) " + sql, execution_options=opts).scalars().all()
+            else:
+                rows = [r[-1] for r in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, execution_options=opts)]
+            conn.rollback()
+        entry["plan"] = "\n".join(rows)
+    except Exception as e:
+        log.warning("No se pudo obtener el plan de la consulta %s: %s", entry["id"], e)
+        entry["plan"] = f"(error al obtener el plan: {e})"
+    finally:
+        _pending.clear()
+
+
+def entries(label: Optional[str] = None, limit: int = 50) -> List[dict]:
+    """Últimas consultas lentas (más recientes primero)."""
+    with _lock:
+        items = list(_entries)
+    items.reverse()
+    if label:
+        items = [e for e in items if e["label"] == label]
+    return items[:limit]
+
+
+def get(entry_id: int) -> Optional[dict]:
+    with _lock:
+        return next((e for e in _entries if e["id"] == entry_id), None)
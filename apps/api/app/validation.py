@@ -0,0 +1,151 @@
+# apps/api/app/validation.py
+"""
+Validación de la ingesta, por columnas y antes de escribir.
+
+Cada comprobación es una máscara sobre el bloque entero (pandas/NumPy):
+campos obligatorios, números y fechas que no se pueden leer, valores
+negativos o fuera de rango y, opcionalmente, productos que no existen.
+Las filas rechazadas salen con su motivo hacia un informe CSV descargable
+(/api/ingest/rejected/{id}); solo las válidas, ya convertidas, siguen a
+la escritura. El coste depende del número de columnas, no de filas malas.
+
+INGEST_UNKNOWN_PRODUCTS:
+- "create" (por defecto): ventas e inventario crean el producto que falte
+  como ficha provisional, como hasta ahora.
+- "reject": las filas con un product_id que no está en el catálogo de la
+  organización (app/catalog.py) se rechazan.
+
+Los informes se borran a los INGEST_REJECTED_RETENTION_DAYS días (7 por
+defecto): la limpieza se hace al crear un informe nuevo.
+"""
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from . import catalog
+
+UNKNOWN_PRODUCTS = os.getenv("INGEST_UNKNOWN_PRODUCTS", "create")
+
+# Campos sin los que la fila no se puede guardar
+REQUIRED = {
+    "products": ["product_id"],
+    "sales": ["txn_id", "product_id", "date", "unit_price_gross"],
+    "expenses": ["exp_id", "date", "amount_gross"],
+    "inventory": ["product_id"],
+}
+
+FLOAT_COLUMNS = {"unit_cost", "unit_price_gross", "discount", "vat_rate", "amount_gross"}
+# Enteros: vacío = 0 (sin dato)
+INT_COLUMNS = {"quantity", "stock_on_hand", "lead_time_days", "safety_stock"}
+NON_NEGATIVE = {"unit_cost", "unit_price_gross", "discount", "quantity",
+                "stock_on_hand", "lead_time_days", "safety_stock"}
+
+REASON_COLUMN = "motivo"
+LINE_COLUMN = "linea"
+
+# Días que se conservan los informes de filas rechazadas
+REJECTED_RETENTION_DAYS = float(os.getenv("INGEST_REJECTED_RETENTION_DAYS", "7"))
+
+
+def _blank(s: pd.Series) -> pd.Series:
+    """Vacío, NaN o solo espacios."""
+    return s.isna() | s.astype("string").str.strip().eq("").fillna(True)
+
+
+def validate(df: pd.DataFrame, kind: str, db: Optional[Session] = None,
+             org_id: int = 1) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Convierte los tipos y separa las filas válidas de las rechazadas.
+
+    Devuelve (válidas con columnas ya convertidas, rechazadas con los valores
+    originales más `linea` y `motivo`). `linea` es la del fichero de origen
+    suponiendo cabecera en la primera línea.
+    """
+    reasons = pd.Series("", index=df.index, dtype=object)
+    bad = np.zeros(len(df), dtype=bool)
+
+    def reject(mask: pd.Series, reason: str) -> None:
+        nonlocal bad
+        mask = mask.to_numpy(dtype=bool, na_value=False)
+        if mask.any():
+            reasons[mask] = reasons[mask] + (reason + "; ")
+            bad |= mask
+
+    for col in REQUIRED[kind]:
+        reject(_blank(df[col]), f"falta {col}")
+
+    converted: dict[str, pd.Series] = {}
+    for col in df.columns:
+        if col in FLOAT_COLUMNS or col in INT_COLUMNS:
+            num = pd.to_numeric(df[col], errors="coerce")
+            reject(num.isna() & ~_blank(df[col]), f"{col} no numérico")
+            if col in NON_NEGATIVE:
+                reject(num < 0, f"{col} negativo")
+            if col == "vat_rate":
+                reject((num < 0) | (num > 1), "vat_rate fuera de rango (0-1)")
+            converted[col] = num.fillna(0).astype(int) if col in INT_COLUMNS else num
+        elif col == "date":
+            when = pd.to_datetime(df[col], errors="coerce")
+            reject(when.isna() & ~_blank(df[col]), "fecha no válida")
+            converted[col] = when.dt.date
+
+    if db is not None and UNKNOWN_PRODUCTS == "reject" and kind in ("sales", "inventory"):
+        pid = df["product_id"].astype("string").str.strip()
+        unknown = catalog.get(db, org_id).positions(pid.astype(object)) < 0
+        reject(pd.Series(unknown, index=df.index) & ~_blank(pid), "producto desconocido")
+
+    rejected = df[bad].copy()
+    if len(rejected):
+        rejected.insert(0, LINE_COLUMN, rejected.index + 2)
+        rejected[REASON_COLUMN] = reasons[bad].str.rstrip("; ")
+
+    for col, values in converted.items():
+        df[col] = values
+    return df[~bad], rejected
+
+
+class RejectReport:
+    """
+    Informe CSV de filas rechazadas, escrito bloque a bloque en `directory`.
+    El fichero solo se crea si hay alguna fila rechazada; al crearlo se
+    borran los informes caducados del directorio (sweep_reports).
+    """
+
+    def __init__(self, directory: Path, report_id: Optional[str] = None):
+        self.id = report_id or str(uuid.uuid4())
+        self.path = Path(directory) / f"{self.id}.csv"
+        self.rows = 0
+
+    def add(self, rejected: pd.DataFrame) -> None:
+        if rejected.empty:
+            return
+        if self.rows == 0:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            sweep_reports(self.path.parent)
+        rejected.to_csv(self.path, mode="a", index=False, header=self.rows == 0)
+        self.rows += len(rejected)
+
+    def add_lines(self, lines: list[int], columns: list[str], reason: str) -> None:
+        """Líneas rechazadas sin valores legibles (p. ej. JSON roto)."""
+        if lines:
+            self.add(pd.DataFrame({LINE_COLUMN: lines, **{c: None for c in columns}, REASON_COLUMN: reason}))
+
+
+def sweep_reports(directory: Path, max_age_days: float = REJECTED_RETENTION_DAYS) -> int:
+    """Borra los informes de `directory` más antiguos que `max_age_days`. Devuelve cuántos."""
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for path in Path(directory).glob("*.csv"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:  # otro proceso lo borró antes
+            continue
+    return removed
@@ -0,0 +1,113 @@
+# apps/api/app/worker.py
+"""
+Worker de Celery para la ingesta en segundo plano y las tareas periódicas.
+
+Arranque (desde apps/api):
+    celery -A app.worker worker --loglevel=info
+    celery -A app.worker beat --loglevel=info     # previsiones de demanda
+
+Con CELERY_TASK_ALWAYS_EAGER=1 las tareas se ejecutan en el propio proceso,
+sin Redis (útil para tests y desarrollo local).
+"""
+import os
+from contextlib import closing
+from datetime import datetime, timezone
+
+from celery import Celery
+from celery.schedules import crontab
+from sqlalchemy import select
+
+from .db import init_engine
+from . import db as database
+from . import models
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Hora (UTC) del reajuste diario de previsiones
+FORECAST_HOUR = int(os.getenv("FORECAST_HOUR", "3"))
+
+celery_app = Celery("leaf", broker=os.getenv("CELERY_BROKER_URL", REDIS_URL))
+celery_app.conf.update(
+    task_always_eager=os.getenv("CELERY_TASK_ALWAYS_EAGER", "0") == "1",
+    task_eager_propagates=False,
+    task_ignore_result=True,  # el estado vive en la tabla ingest_jobs
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    beat_schedule={
+        "forecast-daily": {"task": "forecast.run_all", "schedule": crontab(hour=FORECAST_HOUR, minute=0)},
+    },
+)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@celery_app.task(name="ingest.run_job")
+def run_ingest_job(job_id: str) -> None:
+    """
+    Procesa el fichero de un IngestJob por bloques, actualizando los
+    contadores tras cada bloque confirmado. Si termina bien y sin filas
+    rechazadas guarda la huella del fichero (app/dedup.py). Las filas
+    rechazadas van a un informe CSV con el id del trabajo. Borra el fichero
+    al terminar.
+    """
+    from . import dedup
+    from .ingestion import ingest_frames, iter_table
+    from .routers.ingest import CHUNK_ROWS, REJECTED_DIR, error_message
+    from .validation import RejectReport
+
+    init_engine()
+    with database.SessionLocal() as db:
+        job = db.get(models.IngestJob, job_id)
+        if job is None or job.status != "queued":
+            return
+        job.status = "running"
+        job.started_at = _now()
+        db.commit()
+
+        try:
+            with open(job.path, "rb") as fh, \
+                    closing(iter_table(fh, job.filename, job.kind, CHUNK_ROWS)) as frames:
+                report = RejectReport(REJECTED_DIR, job.id)
+                for part in ingest_frames(job.kind, frames, db, job.org_id or 1, report):
+                    job.rows_in_file += part.rows_in_file
+                    job.inserted += part.inserted
+                    job.updated += part.updated
+                    job.skipped += part.skipped
+                    job.errors += part.errors
+                    db.commit()
+                if not job.errors:
+                    fh.seek(0)
+                    dedup.remember_file(db, job.org_id or 1, job.kind, dedup.file_digest(fh),
+                                        job.filename, job.rows_in_file)
+            job.status = "done"
+        except Exception as e:
+            db.rollback()
+            job.status = "error"
+            job.error = error_message(e) if hasattr(e, "detail") else str(e)
+        finally:
+            job.finished_at = _now()
+            db.commit()
+            try:
+                os.remove(job.path)
+            except OSError:
+                pass
+
+
+@celery_app.task(name="forecast.run_org")
+def run_forecast(org_id: int, full: bool = False) -> int:
+    """Reajusta las previsiones de demanda de una organización."""
+    from . import forecast
+
+    init_engine()
+    with database.SessionLocal() as db:
+        return forecast.run(db, org_id, full)
+
+
+@celery_app.task(name="forecast.run_all")
+def run_all_forecasts() -> None:
+    init_engine()
+    with database.SessionLocal() as db:
+        org_ids = db.scalars(select(models.Org.id)).all()
+    for org_id in org_ids:
+        run_forecast.delay(org_id)
@@ -0,0 +1,61 @@
+# apps/api/bench/compare.py
+"""
+Compara dos resultados de bench/run.py (base -> nuevo).
+
+    python -m bench.compare bench/results/A.json bench/results/B.json [--threshold 20]
+
+Muestra filas/s de la ingesta y p50/p99 por endpoint con la variación en %.
+Sale con código 1 si algún p99 empeora más de --threshold % (útil en CI).
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def _pct(old, new) -> float | None:
+    if not old or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def _fmt(p: float | None) -> str:
+    return "   n/a" if p is None else f"{p:+6.1f}%"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compara dos resultados del benchmark")
+    parser.add_argument("base", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--threshold", type=float, default=20.0, help="% de empeoramiento de p99 tolerado")
+    args = parser.parse_args()
+
+    base, new = json.loads(args.base.read_text()), json.loads(args.new.read_text())
+    print(f"base: {base['meta']['commit']} ({base['meta']['backend']})  "
+          f"nuevo: {new['meta']['commit']} ({new['meta']['backend']})")
+
+    print("\ningesta (filas/s)")
+    for kind, b in base["ingest"].items():
+        n = new["ingest"].get(kind, {})
+        print(f"  {kind:<12} {b['rows_per_s']:>12} -> {n.get('rows_per_s', '-'):>12}  "
+              f"{_fmt(_pct(b['rows_per_s'], n.get('rows_per_s')))}")
+
+    regressions = []
+    print("\nendpoints (ms)            p50 base -> nuevo              p99 base -> nuevo")
+    for name, b in base["endpoints"].items():
+        n = new["endpoints"].get(name)
+        if not n or not b.get("n") or not n.get("n"):
+            continue
+        d99 = _pct(b["p99_ms"], n["p99_ms"])
+        print(f"  {name:<22} {b['p50_ms']:>9} -> {n['p50_ms']:<9} {_fmt(_pct(b['p50_ms'], n['p50_ms']))}"
+              f"   {b['p99_ms']:>9} -> {n['p99_ms']:<9} {_fmt(d99)}")
+        if d99 is not None and d99 > args.threshold:
+            regressions.append(name)
+
+    if regressions:
+        print(f"\nRegresiones de p99 > {args.threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
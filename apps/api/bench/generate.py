@@ -0,0 +1,159 @@
+# apps/api/bench/generate.py
+"""
+Generador de datos sintéticos con las columnas de las plantillas de ingesta
+(TEMPLATES en app/routers/ingest.py).
+
+    python -m bench.generate --out data/synth --sales 1000000 [--orgs 3] [--seed 42]
+
+Por organización escribe org_<n>/{products,sales,expenses,inventory}.csv.
+Los datos son reproducibles con la misma semilla y aproximan un comercio
+real: popularidad de productos tipo Zipf, estacionalidad semanal, tendencia,
+descuentos ocasionales y gastos fijos mensuales + variables. Las ventas se
+generan y escriben por bloques, así que escala de 10k a 50M filas con
+memoria acotada.
+"""
+import argparse
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from app.routers.ingest import TEMPLATES
+
+CHUNK = 1_000_000
+
+CATEGORIES = ["bebidas", "panadería", "lácteos", "frutas", "limpieza", "snacks", "congelados", "droguería"]
+PAYMENT_METHODS = np.array(["tarjeta", "efectivo", "bizum"])
+VAT_RATES = np.array([0.21, 0.10, 0.04])
+# Peso relativo de cada día de la semana (lunes..domingo)
+WEEKDAY_WEIGHT = np.array([0.8, 0.85, 0.9, 1.0, 1.25, 1.45, 0.75])
+FIXED_EXPENSES = [("alquiler", 1800.0), ("nóminas", 6500.0), ("seguros", 140.0)]
+VARIABLE_EXPENSES = [("luz", 320.0), ("agua", 60.0), ("proveedores", 900.0), ("marketing", 150.0)]
+
+
+def _write(df: pd.DataFrame, path: Path, kind: str, first: bool) -> None:
+    df[TEMPLATES[kind]].to_csv(path, mode="w" if first else "a", header=first, index=False)
+
+
+def products(rng: np.random.Generator, org: int, n: int) -> pd.DataFrame:
+    price = np.round(rng.lognormal(mean=1.2, sigma=0.7, size=n), 2) + 0.5
+    ids = np.char.add(f"O{org}-P", np.arange(n).astype(str))
+    return pd.DataFrame({
+        "product_id": ids,
+        "name": np.char.add("Producto ", ids),
+        "category": rng.choice(CATEGORIES, size=n),
+        "unit_cost": np.round(price * rng.uniform(0.4, 0.7, size=n), 2),
+        "vat_rate": rng.choice(VAT_RATES, size=n, p=[0.6, 0.3, 0.1]),
+        "_price": price,
+    })
+
+
+def _day_weights(start: date, days: int) -> np.ndarray:
+    """Probabilidad de venta por día: estacionalidad semanal + tendencia suave."""
+    d = np.arange(days)
+    weekday = (start.weekday() + d) % 7
+    w = WEEKDAY_WEIGHT[weekday] * (1.0 + 0.3 * d / max(days - 1, 1))
+    return w / w.sum()
+
+
+def sales(rng: np.random.Generator, org: int, prods: pd.DataFrame, rows: int,
+          start: date, days: int, path: Path) -> None:
+    n = len(prods)
+    # Popularidad tipo Zipf: pocos productos concentran muchas ventas
+    pop = 1.0 / np.arange(1, n + 1) ** 1.1
+    pop = rng.permutation(pop / pop.sum())
+    day_p = _day_weights(start, days)
+    dates = np.array([start + timedelta(days=int(i)) for i in range(days)], dtype="datetime64[D]")
+    price = prods["_price"].to_numpy()
+    vat = prods["vat_rate"].to_numpy()
+    ids = prods["product_id"].to_numpy()
+
+    written = 0
+    while written < rows:
+        m = min(CHUNK, rows - written)
+        p = rng.choice(n, size=m, p=pop)
+        qty = rng.poisson(0.6, size=m) + 1
+        unit = np.round(price[p] * rng.uniform(0.95, 1.05, size=m), 2)
+        disc = np.where(rng.random(m) < 0.08, np.round(unit * qty * rng.uniform(0.05, 0.2, size=m), 2), np.nan)
+        df = pd.DataFrame({
+            "txn_id": np.char.add(f"O{org}-T", np.arange(written, written + m).astype(str)),
+            "date": np.sort(dates[rng.choice(days, size=m, p=day_p)]),
+            "product_id": ids[p],
+            "quantity": qty,
+            "unit_price_gross": unit,
+            "discount": disc,
+            "payment_method": rng.choice(PAYMENT_METHODS, size=m, p=[0.6, 0.3, 0.1]),
+            "vat_rate": vat[p],
+        })
+        _write(df, path, "sales", first=written == 0)
+        written += m
+
+
+def expenses(rng: np.random.Generator, org: int, start: date, days: int, per_day: float) -> pd.DataFrame:
+    rows = []
+    d, end = start, start + timedelta(days=days)
+    while d < end:
+        if d.day == 1:
+            rows += [(d, cat, "Gasto fijo mensual", amount) for cat, amount in FIXED_EXPENSES]
+        for _ in range(rng.poisson(per_day)):
+            cat, base = VARIABLE_EXPENSES[rng.integers(len(VARIABLE_EXPENSES))]
+            rows.append((d, cat, "", round(base * rng.uniform(0.5, 1.5), 2)))
+        d += timedelta(days=1)
+    df = pd.DataFrame(rows, columns=["date", "category", "description", "amount_gross"])
+    df["exp_id"] = [f"O{org}-E{i}" for i in range(len(df))]
+    df["vat_rate"] = 0.21
+    df["payment_method"] = "transferencia"
+    return df
+
+
+def inventory(rng: np.random.Generator, prods: pd.DataFrame) -> pd.DataFrame:
+    n = len(prods)
+    return pd.DataFrame({
+        "product_id": prods["product_id"],
+        "stock_on_hand": rng.integers(0, 120, size=n),
+        "lead_time_days": rng.integers(1, 15, size=n),
+        "safety_stock": rng.integers(0, 10, size=n),
+    })
+
+
+def generate(out: Path, sales_rows: int, n_products: int, orgs: int = 1, days: int = 365,
+             end: date = date(2024, 12, 31), seed: int = 42) -> Dict[int, Path]:
+    """Genera los CSV de `orgs` organizaciones; `sales_rows` filas de ventas por organización."""
+    start = end - timedelta(days=days - 1)
+    dirs = {}
+    for org in range(1, orgs + 1):
+        rng = np.random.default_rng([seed, org])
+        d = out / f"org_{org}"
+        d.mkdir(parents=True, exist_ok=True)
+        prods = products(rng, org, n_products)
+        _write(prods, d / "products.csv", "products", first=True)
+        sales(rng, org, prods, sales_rows, start, days, d / "sales.csv")
+        _write(expenses(rng, org, start, days, per_day=0.6), d / "expenses.csv", "expenses", first=True)
+        _write(inventory(rng, prods), d / "inventory.csv", "inventory", first=True)
+        dirs[org] = d
+    return dirs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Genera CSV sintéticos con el formato de las plantillas de ingesta")
+    parser.add_argument("--out", type=Path, default=Path("data/synth"))
+    parser.add_argument("--sales", type=int, default=100_000, help="Filas de ventas por organización")
+    parser.add_argument("--products", type=int, default=None, help="Por defecto ~ ventas / 50 (100..50k)")
+    parser.add_argument("--orgs", type=int, default=1)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    n_products = args.products or int(np.clip(args.sales // 50, 100, 50_000))
+    t = time.perf_counter()
+    dirs = generate(args.out, args.sales, n_products, args.orgs, args.days, seed=args.seed)
+    for org, d in dirs.items():
+        print(f"org {org}: {d}")
+    print(f"{args.sales * args.orgs} ventas, {n_products} productos/org en {time.perf_counter() - t:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
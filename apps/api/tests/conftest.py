@@ -0,0 +1,40 @@
+# apps/api/tests/conftest.py
+"""
+Los tests usan SQLite en un directorio temporal, la caché en memoria y
+Celery en modo eager (todo en un proceso): no hacen falta Postgres ni Redis.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+_TMP = Path(tempfile.mkdtemp(prefix="leaf-tests-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP / 'leaf.db'}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("REDIS_URL", None)
+os.environ["CACHE_LOCAL"] = "1"  # un solo proceso: la caché en memoria es válida
+os.environ["DB_AUTO_MIGRATE"] = "1"
+os.environ["INGEST_SPOOL_DIR"] = str(_TMP / "spool")
+os.environ["INGEST_EXCEL_WORKERS"] = "0"
+os.environ["CELERY_TASK_ALWAYS_EAGER"] = "1"
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Engine propio sobre una BD vacía (tests de esquema)."""
+    from sqlalchemy import create_engine
+
+    eng = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    yield eng
+    eng.dispose()
@@ -0,0 +1,17 @@
+# apps/api/tests/test_admin.py
+from app.routers import admin
+
+
+def test_admin_closed_without_token(client, monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", None)
+    assert client.get("/api/admin/slow-queries").status_code == 404
+    assert client.get("/api/admin/slow-queries", headers={"X-Admin-Token": ""}).status_code == 404
+
+
+def test_admin_requires_matching_token(client, monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "s3cret")
+    assert client.get("/api/admin/slow-queries").status_code == 403
+    assert client.get("/api/admin/slow-queries", headers={"X-Admin-Token": "nope"}).status_code == 403
+    r = client.get("/api/admin/slow-queries", headers={"X-Admin-Token": "s3cret"})
+    assert r.status_code == 200
+    assert isinstance(r.json(), list)
@@ -0,0 +1,39 @@
+# apps/api/tests/test_bulk.py
+from sqlalchemy.orm import Session
+
+from app import models
+from app.bulk import bulk_upsert
+from app.migrate import migrate
+
+HEADER = b"product_id,name,category,unit_cost,vat_rate\n"
+
+
+def _upload(client, name, body):
+    r = client.post("/api/ingest/upload?kind=products", files={"file": (name, body, "text/csv")})
+    assert r.status_code == 200, r.text
+    body = r.json()
+    return body["inserted"], body["updated"], body["skipped"], body["errors"]
+
+
+def test_ingest_counts_new_modified_and_unchanged_rows(client):
+    rows = [b"BULK-1,Uno,varios,1,0.21\n", b"BULK-2,Dos,varios,2,0.21\n"]
+    assert _upload(client, "bulk-1.csv", HEADER + b"".join(rows)) == (2, 0, 0, 0)
+
+    # BULK-1 sin cambios, BULK-2 con otro coste, BULK-3 nuevo
+    changed = HEADER + rows[0] + b"BULK-2,Dos,varios,2.5,0.21\nBULK-3,Tres,varios,3,0.21\n"
+    assert _upload(client, "bulk-2.csv", changed) == (1, 1, 1, 0)
+
+
+def test_bulk_upsert_counts_repeated_keys_as_updates(engine):
+    migrate(engine)
+    with Session(engine) as db:
+        db.add(models.Org(id=1, name="Tienda"))
+        db.add(models.Product(id="P1", org_id=1, name="Café", unit_cost=1.0, vat_rate=0.1))
+        db.commit()
+        row = {"org_id": 1, "product_id": "P1", "stock_on_hand": 5.0}
+        assert bulk_upsert(db, models.Inventory, [row], keys=["org_id", "product_id"]) == (1, 0)
+        # La última fila de cada clave gana; las repetidas cuentan como actualizadas
+        again = [dict(row, stock_on_hand=6.0), dict(row, stock_on_hand=7.0)]
+        assert bulk_upsert(db, models.Inventory, again, keys=["org_id", "product_id"]) == (0, 2)
+        db.commit()
+        assert db.get(models.Inventory, 1).stock_on_hand == 7.0
@@ -0,0 +1,48 @@
+# apps/api/tests/test_cache.py
+from datetime import date
+
+from app import cache
+from app import db as database
+from app import models
+
+ORG = 13
+
+
+def test_no_shared_backend_disables_caching():
+    backend = cache.make_backend(redis_url=None, local=False)
+    assert backend.version("1") is None  # sin versión, el middleware no cachea
+    assert isinstance(cache.make_backend(redis_url=None, local=True), cache._LocalBackend)
+
+
+def test_cached_endpoint_miss_hit_304_and_invalidation(client):
+    with database.SessionLocal() as db:
+        db.add(models.Org(id=ORG, name="Caché"))
+        db.add(models.DailyExpense(org_id=ORG, date=date(2024, 9, 1), amount_gross=12.0))
+        db.commit()
+
+    url = f"/api/sales/kpi?org_id={ORG}"
+    miss = client.get(url)
+    assert miss.headers["X-Cache"] == "MISS"
+    assert int(miss.headers["content-length"]) == len(miss.content)
+    hit = client.get(url)
+    assert (hit.headers["X-Cache"], hit.json()) == ("HIT", miss.json())
+    assert client.get(url, headers={"If-None-Match": miss.headers["ETag"]}).status_code == 304
+
+    # La ingesta invalida la versión: nueva clave, nuevo cálculo
+    with database.SessionLocal() as db:
+        db.get(models.DailyExpense, (ORG, date(2024, 9, 1))).amount_gross = 20.0
+        db.commit()
+    cache.bump_version(ORG)
+    fresh = client.get(url)
+    assert fresh.headers["X-Cache"] == "MISS"
+    assert fresh.headers["ETag"] != miss.headers["ETag"]
+    assert fresh.json()["gastos_neto"] == 20.0
+
+
+def test_other_routes_pass_through(client):
+    r = client.get("/api/health")
+    assert "ETag" not in r.headers and "X-Cache" not in r.headers
+    # Errores de rutas cacheables no se guardan
+    for _ in range(2):
+        r = client.get("/api/sales/kpi?org_id=abc")
+        assert r.status_code == 422 and "X-Cache" not in r.headers
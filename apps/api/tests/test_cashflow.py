@@ -0,0 +1,71 @@
+# apps/api/tests/test_cashflow.py
+from datetime import date
+
+import pytest
+
+from app import db as database
+from app import models
+
+ORG = 7
+
+
+@pytest.fixture(scope="module")
+def org(client):
+    """Ventas los días 1, 3 y 4; un gasto el día 2 (ninguna fila el 5)."""
+    with database.SessionLocal() as db:
+        db.add(models.Org(id=ORG, name="Cashflow"))
+        db.add(models.Product(id="CASH-A", org_id=ORG, name="A", unit_cost=1.0, vat_rate=0.21))
+        db.flush()
+        for day, revenue in ((1, 100.0), (3, 50.0), (4, 30.0)):
+            db.add(models.DailySales(org_id=ORG, date=date(2024, 7, day), product_id="CASH-A",
+                                     revenue=revenue, cogs=revenue / 2, quantity=1.0))
+        db.add(models.DailyExpense(org_id=ORG, date=date(2024, 7, 2), amount_gross=40.0))
+        db.commit()
+    return ORG
+
+
+def _get(client, query):
+    r = client.get(f"/api/sales/cashflow?org_id={ORG}&{query}")
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_cashflow_without_options_is_unchanged(client, org):
+    points = _get(client, "")
+    assert [p["date"] for p in points] == ["2024-07-01", "2024-07-03", "2024-07-04"]
+    assert "saldo" not in points[0] and "medias" not in points[0]
+
+
+def test_cashflow_fill_running_and_moving_average(client, org):
+    points = _get(client, "fill=true&running=true&ma=2&_to=2024-07-05")
+    assert [p["date"] for p in points] == [f"2024-07-0{d}" for d in range(1, 6)]
+    assert [p["flujo"] for p in points] == [100.0, -40.0, 50.0, 30.0, 0.0]
+    assert [p["saldo"] for p in points] == [100.0, 60.0, 110.0, 140.0, 140.0]
+    assert [p["medias"]["2"] for p in points] == [100.0, 30.0, 5.0, 40.0, 15.0]
+
+
+def test_cashflow_window_counts_history_before_from(client, org):
+    points = _get(client, "running=true&ma=2&_from=2024-07-03")
+    # Solo días con datos del rango; saldo y medias incluyen los días previos
+    assert [p["date"] for p in points] == ["2024-07-03", "2024-07-04"]
+    assert [p["saldo"] for p in points] == [110.0, 140.0]
+    assert [p["medias"]["2"] for p in points] == [5.0, 40.0]
+
+
+def test_cashflow_columnar(client, org):
+    cols = _get(client, "format=columnar&fill=true&ma=2&ma_of=ingresos")
+    assert cols["dates"] == ["2024-07-01", "2024-07-02", "2024-07-03", "2024-07-04"]
+    assert cols["media_2"] == [100.0, 50.0, 25.0, 40.0]
+    assert "saldo" not in cols
+
+
+def test_cashflow_cache_key_keeps_repeated_params(client, org):
+    both = client.get(f"/api/sales/cashflow?org_id={ORG}&ma=7&ma=30")
+    one = client.get(f"/api/sales/cashflow?org_id={ORG}&ma=30")
+    assert both.headers["ETag"] != one.headers["ETag"]
+    assert set(both.json()[0]["medias"]) == {"7", "30"}
+    assert set(one.json()[0]["medias"]) == {"30"}
+    # Mismo conjunto en otro orden: misma clave
+    again = client.get(f"/api/sales/cashflow?ma=30&org_id={ORG}&ma=7")
+    assert again.headers["ETag"] == both.headers["ETag"]
+    assert again.headers["X-Cache"] == "HIT"
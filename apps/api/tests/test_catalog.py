@@ -0,0 +1,48 @@
+# apps/api/tests/test_catalog.py
+from app import catalog, models
+from app import db as database
+from app.cache import get_backend
+
+ORG = 22
+
+
+def _add_product(db, pid):
+    db.add(models.Product(id=pid, org_id=ORG, name=pid, unit_cost=1.0, vat_rate=0.1))
+
+
+def test_version_bump_reloads_catalog(client):
+    with database.SessionLocal() as db:
+        db.add(models.Org(id=ORG, name="Catálogo"))
+        _add_product(db, "CAT-A")
+        db.commit()
+
+        first = catalog.get(db, ORG)
+        assert "CAT-A" in first.ids
+        assert catalog.get(db, ORG) is first  # misma versión: en memoria
+
+        # Otro worker escribe un producto y sube la versión
+        _add_product(db, "CAT-B")
+        db.commit()
+        assert catalog.get(db, ORG) is first
+        get_backend().bump(f"catalog:{ORG}")
+        second = catalog.get(db, ORG)
+        assert second is not first and "CAT-B" in second.ids
+
+        # La ingesta marca la sesión y la versión sube al confirmar
+        _add_product(db, "CAT-C")
+        catalog.mark_dirty(db, ORG)
+        db.commit()
+        assert "CAT-C" in catalog.get(db, ORG).ids
+
+
+def test_rollback_does_not_invalidate(client):
+    with database.SessionLocal() as db:
+        cat = catalog.get(db, ORG)
+        version = catalog._version(ORG)
+        _add_product(db, "CAT-X")
+        db.flush()
+        catalog.mark_dirty(db, ORG)
+        db.rollback()
+        db.commit()
+        assert catalog._version(ORG) == version
+        assert catalog.get(db, ORG) is cat
@@ -0,0 +1,47 @@
+# apps/api/tests/test_compression.py
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.compression import COMPRESS_MIN_BYTES, CompressionMiddleware, choose_encoding
+
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+def _client(body: str, streaming: bool = False) -> TestClient:
+    async def endpoint(request):
+        if streaming:
+            return StreamingResponse(iter([body[:10], body[10:]]), media_type="text/csv")
+        return PlainTextResponse(body)
+
+    app = Starlette(routes=[Route("/", endpoint)])
+    return TestClient(CompressionMiddleware(app, minimum_size=100))
+
+
+def test_gzip_skipped_below_minimum_size():
+    r = _client("x" * 99).get("/", headers=GZIP)
+    assert "content-encoding" not in r.headers
+    assert r.headers["content-length"] == "99"
+
+
+def test_gzip_above_minimum_size_and_streaming():
+    r = _client("x" * 100).get("/", headers=GZIP)
+    assert r.headers["content-encoding"] == "gzip"
+    assert int(r.headers["content-length"]) < 100 and r.text == "x" * 100
+    assert "Accept-Encoding" in r.headers["vary"]
+
+    # En streaming no se conoce el tamaño: se comprime bloque a bloque
+    r = _client("a,b\n" * 5, streaming=True).get("/", headers=GZIP)
+    assert r.headers["content-encoding"] == "gzip" and r.text == "a,b\n" * 5
+
+
+def test_small_api_response_not_compressed(client):
+    r = client.get("/api/sales/kpi?org_id=1", headers=GZIP)
+    assert r.status_code == 200 and len(r.content) < COMPRESS_MIN_BYTES
+    assert "content-encoding" not in r.headers
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip;q=0, deflate") is None
+    assert choose_encoding("identity, gzip;q=0.5") == "gzip"
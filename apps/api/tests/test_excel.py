@@ -0,0 +1,60 @@
+# apps/api/tests/test_excel.py
+import io
+
+import pandas as pd
+import pytest
+from sqlalchemy import func, select
+
+from app import db as database
+from app import excel, models
+from app.routers.ingest import TEMPLATES
+
+pytest.importorskip("openpyxl")  # extra `excel`
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _expenses(prefix, days, amounts):
+    return pd.DataFrame({
+        "exp_id": [f"{prefix}{d}" for d in days],
+        "date": [f"2024-05-{d:02d}" for d in days],
+        "category": "alquiler", "description": None,
+        "amount_gross": amounts, "vat_rate": 0.21, "payment_method": "transferencia",
+    })
+
+
+def _workbook(sheets: dict) -> bytes:
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+    return buf.getvalue()
+
+
+def test_read_frames_keeps_template_sheets_in_order():
+    data = _workbook({
+        "Enero": _expenses("XR", [1, 2], [10.0, 20.0]),
+        "Notas": pd.DataFrame({"nota": ["revisar"]}),
+        "Febrero": _expenses("XR", [3], [30.0]).assign(extra="x"),
+    })
+    frames = list(excel.read_frames(io.BytesIO(data), TEMPLATES["expenses"], {"exp_id": str}))
+
+    assert [len(df) for df in frames] == [2, 1]
+    assert list(frames[1].columns) == TEMPLATES["expenses"]  # sin la columna extra
+    assert frames[1]["exp_id"].tolist() == ["XR3"]
+
+
+def test_upload_multi_sheet_workbook(client):
+    data = _workbook({
+        "Enero": _expenses("XU", [1, 2], [10.0, None]),  # la segunda sin importe
+        "Resumen": pd.DataFrame({"total": [10.0]}),
+        "Febrero": _expenses("XU", [3, 4], [30.0, 40.0]),
+    })
+    r = client.post("/api/ingest/upload?kind=expenses", files={"file": ("gastos.xlsx", data, XLSX)})
+
+    assert r.status_code == 200, r.text
+    out = r.json()
+    assert (out["rows_in_file"], out["inserted"], out["errors"]) == (4, 3, 1)
+    assert out["rejected_report"] is not None
+    with database.SessionLocal() as db:
+        assert db.scalar(select(func.count()).where(models.Expense.id.like("XU%"))) == 3
@@ -0,0 +1,56 @@
+# apps/api/tests/test_exports.py
+import csv
+import io
+import json
+from datetime import date
+
+import pytest
+
+from app import db as database
+from app import exports, models
+
+ORG = 16
+DAYS = [1, 1, 2, 3, 3, 4, 5]
+
+
+@pytest.fixture(scope="module")
+def org(client):
+    with database.SessionLocal() as db:
+        db.add(models.Org(id=ORG, name="Exportación"))
+        db.add(models.Product(id="EXP-A", org_id=ORG, name="Café", unit_cost=1.0, vat_rate=0.1))
+        db.flush()
+        db.add_all([
+            models.Transaction(txn_id=f"EXP-T{i}", org_id=ORG, date=date(2024, 7, d), product_id="EXP-A",
+                               quantity=1.0, unit_price_gross=2.5, discount=0.0, payment_method="tarjeta")
+            for i, d in enumerate(DAYS)
+        ])
+        db.add_all([
+            models.Expense(id=f"EXP-G{i}", org_id=ORG, date=date(2024, 7, d), category="luz",
+                           description="Factura, julio", amount_gross=30.0)
+            for i, d in enumerate(DAYS[:3])
+        ])
+        db.commit()
+    return ORG
+
+
+def test_sales_csv_header_and_rows_across_batches(client, org, monkeypatch):
+    monkeypatch.setattr(exports, "EXPORT_BATCH", 2)  # varios lotes del cursor
+    r = client.get(f"/api/sales/export?org_id={ORG}&_from=2024-07-01&_to=2024-07-03")
+    assert r.status_code == 200
+    assert r.headers["content-disposition"] == 'attachment; filename="sales_org16_2024-07-01_2024-07-03.csv"'
+
+    rows = list(csv.reader(io.StringIO(r.text)))
+    assert rows[0] == ["txn_id", "date", "product_id", "quantity", "unit_price_gross",
+                       "discount", "payment_method", "vat_rate"]
+    assert len(rows) - 1 == 5  # días 1-3, ambos extremos incluidos
+    assert [row[1] for row in rows[1:]] == sorted(row[1] for row in rows[1:])
+
+
+def test_expenses_ndjson_rows(client, org):
+    r = client.get(f"/api/expenses/export?org_id={ORG}&format=ndjson")
+    assert r.status_code == 200
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert len(lines) == 3
+    assert list(lines[0]) == ["exp_id", "date", "category", "description",
+                              "amount_gross", "vat_rate", "payment_method"]
+    assert lines[0]["description"] == "Factura, julio"
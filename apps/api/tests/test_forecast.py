@@ -0,0 +1,35 @@
+# apps/api/tests/test_forecast.py
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app import forecast, models
+from app.migrate import migrate
+
+
+def test_refit_updates_fitted_at(engine):
+    migrate(engine)
+    F = models.DemandForecast
+    with Session(engine) as db:
+        db.add(models.Org(id=1, name="Tienda"))
+        db.add(models.Product(id="P1", org_id=1, name="Café", unit_cost=1.0, vat_rate=0.1))
+        db.flush()
+        start = date(2024, 3, 1)
+        db.add_all([
+            models.DailySales(org_id=1, date=start + timedelta(days=i), product_id="P1",
+                              revenue=10.0, cogs=4.0, quantity=2.0)
+            for i in range(14)
+        ])
+        db.commit()
+        assert forecast.run(db, 1) == 1
+
+        old = datetime(2000, 1, 1)
+        db.execute(update(F).values(fitted_at=old))
+        db.add(models.DailySales(org_id=1, date=start + timedelta(days=14), product_id="P1",
+                                 revenue=15.0, cogs=6.0, quantity=3.0))
+        db.commit()
+        assert forecast.run(db, 1) == 1
+
+        fitted_at = db.scalar(select(F.fitted_at).where(F.product_id == "P1"))
+        assert fitted_at.replace(tzinfo=None) > old
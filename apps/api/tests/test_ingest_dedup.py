@@ -0,0 +1,37 @@
+# apps/api/tests/test_ingest_dedup.py
+from app import validation
+
+SALES = (
+    b"txn_id,date,product_id,quantity,unit_price_gross,discount,payment_method,vat_rate\n"
+    b"D1,2024-05-02,DEDUP-A,1,10,0,efectivo,0.21\n"
+    b"D2,2024-05-02,DEDUP-B,2,5,0,efectivo,0.21\n"
+)
+PRODUCTS = (
+    b"product_id,name,category,unit_cost,vat_rate\n"
+    b"DEDUP-A,Producto A,varios,4,0.21\n"
+)
+
+
+def _upload(client, kind, name, body):
+    return client.post(f"/api/ingest/upload?kind={kind}", files={"file": (name, body, "text/csv")})
+
+
+def test_reupload_after_fixing_rejected_rows(client, monkeypatch):
+    monkeypatch.setattr(validation, "UNKNOWN_PRODUCTS", "reject")
+    _upload(client, "products", "dedup-b.csv",
+            b"product_id,name,category,unit_cost,vat_rate\nDEDUP-B,Producto B,varios,2,0.21\n")
+
+    # DEDUP-A aún no existe: su fila se rechaza
+    r = _upload(client, "sales", "ventas.csv", SALES)
+    assert r.status_code == 200
+    assert (r.json()["inserted"], r.json()["errors"]) == (1, 1)
+
+    # Se da de alta el producto y se vuelve a subir el mismo fichero
+    assert _upload(client, "products", "dedup-a.csv", PRODUCTS).status_code == 200
+    r = _upload(client, "sales", "ventas.csv", SALES)
+    assert r.status_code == 200
+    body = r.json()
+    assert (body["inserted"], body["skipped"], body["errors"]) == (1, 1, 0)
+
+    # Ya importado entero: ahora sí es un duplicado
+    assert _upload(client, "sales", "ventas.csv", SALES).status_code == 409
@@ -0,0 +1,52 @@
+# apps/api/tests/test_ingest_jobs.py
+from kombu.exceptions import OperationalError
+from sqlalchemy import select
+
+from app import db as database
+from app import models
+from app.routers.ingest import SPOOL_DIR
+from app.worker import run_ingest_job
+
+CSV = b"exp_id,date,category,description,amount_gross,vat_rate,payment_method\nJ1,2024-03-01,luz,,50,0.21,tarjeta\n"
+
+
+def test_job_enqueue_failure_marks_error(client, monkeypatch):
+    def broker_down(*args, **kwargs):
+        raise OperationalError("Error 111 connecting to localhost:6379. Connection refused.")
+
+    monkeypatch.setattr(run_ingest_job, "delay", broker_down)
+    before = set(SPOOL_DIR.glob("*")) if SPOOL_DIR.exists() else set()
+
+    r = client.post("/api/ingest/jobs?kind=expenses", files={"file": ("broker-caido.csv", CSV, "text/csv")})
+    assert r.status_code == 503
+
+    with database.SessionLocal() as db:
+        job = db.scalars(
+            select(models.IngestJob).where(models.IngestJob.filename == "broker-caido.csv")
+        ).one()
+    assert job.status == "error"
+    assert "Connection refused" in job.error
+    assert job.finished_at is not None
+    # El fichero del spool no se queda huérfano
+    assert set(SPOOL_DIR.glob("*")) == before
+
+
+def test_job_runs_eagerly(client):
+    body = CSV + b"J2,2024-03-02,agua,,20,0.21,tarjeta\n"
+    before = set(SPOOL_DIR.glob("*.csv"))
+    r = client.post("/api/ingest/jobs?kind=expenses", files={"file": ("eager.csv", body, "text/csv")})
+    assert r.status_code == 202
+    job_id = r.json()["id"]
+
+    job = client.get(f"/api/ingest/jobs/{job_id}").json()
+    assert job["status"] == "done"
+    assert (job["rows_in_file"], job["inserted"], job["updated"], job["skipped"], job["errors"]) == (2, 2, 0, 0, 0)
+    assert job["finished_at"] is not None
+    # El worker borra su copia del spool
+    assert set(SPOOL_DIR.glob("*.csv")) == before
+
+    # Mismo contenido con un importe cambiado: una actualizada, una sin cambios
+    changed = CSV + b"J2,2024-03-02,agua,,25,0.21,tarjeta\n"
+    r = client.post("/api/ingest/jobs?kind=expenses", files={"file": ("eager-2.csv", changed, "text/csv")})
+    job = client.get(f"/api/ingest/jobs/{r.json()['id']}").json()
+    assert (job["status"], job["inserted"], job["updated"], job["skipped"]) == ("done", 0, 1, 1)
@@ -0,0 +1,103 @@
+# apps/api/tests/test_ingest_stream.py
+import asyncio
+import json
+
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from app import ingestion, validation
+from app.routers import ingest
+
+
+class _Request:
+    """Lo único que usa _stream_acks: el cuerpo por trozos, con pausas opcionales."""
+
+    def __init__(self, *chunks):
+        self._chunks = chunks
+
+    async def stream(self):
+        for chunk in self._chunks:
+            if isinstance(chunk, float):
+                await asyncio.sleep(chunk)
+            else:
+                yield chunk
+
+
+def _sale(txn_id: str) -> bytes:
+    return json.dumps({
+        "txn_id": txn_id, "date": "2024-06-01", "product_id": "STR-P", "quantity": 1,
+        "unit_price_gross": 2.5, "discount": 0, "payment_method": "efectivo", "vat_rate": 0.1,
+    }).encode() + b"\n"
+
+
+def _acks(*chunks) -> list[dict]:
+    async def run():
+        return [json.loads(line) async for line in ingest._stream_acks(_Request(*chunks))]
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def batches(client, monkeypatch):
+    monkeypatch.setattr(ingest, "STREAM_BATCH_ROWS", 1000)
+    monkeypatch.setattr(ingest, "STREAM_FLUSH_MS", 10_000)
+    return monkeypatch
+
+
+def test_flush_by_row_count(batches):
+    batches.setattr(ingest, "STREAM_BATCH_ROWS", 2)
+    *acks, final = _acks(b"".join(_sale(f"STR-N{i}") for i in range(5)))
+
+    assert [(a["first_line"], a["last_line"], a["inserted"]) for a in acks] == [(1, 2, 2), (3, 4, 2), (5, 5, 1)]
+    assert not any(a["final"] for a in acks)
+    assert final["final"] and final["batch"] == 3
+    assert (final["rows_in_file"], final["inserted"], final["errors"], final["last_line"]) == (5, 5, 0, 5)
+    assert final["error"] is None and final["rejected_report"] is None
+
+
+def test_flush_by_timeout(batches):
+    batches.setattr(ingest, "STREAM_FLUSH_MS", 50)
+    # Dos líneas, luego el TPV calla: el lote se escribe sin esperar al resto
+    acks = _acks(_sale("STR-T1") + _sale("STR-T2"), 0.5, _sale("STR-T3"))
+
+    assert [(a["batch"], a["first_line"], a["last_line"]) for a in acks[:-1]] == [(1, 1, 2), (2, 3, 3)]
+    assert acks[-1]["inserted"] == 3
+
+
+def test_malformed_lines_are_rejected(batches):
+    *acks, final = _acks(_sale("STR-M1"), b"{no es json\n[1, 2]\n", _sale("STR-M2"))
+
+    assert (acks[0]["inserted"], acks[0]["errors"]) == (2, 2)
+    assert (final["rows_in_file"], final["inserted"], final["errors"]) == (4, 2, 2)
+    report_id = final["rejected_report"].rsplit("/", 1)[1]
+    rejected = pd.read_csv(validation.RejectReport(ingest.REJECTED_DIR, report_id).path)
+    assert rejected[validation.LINE_COLUMN].tolist() == [2, 3]
+    assert set(rejected[validation.REASON_COLUMN]) == {"JSON no válido"}
+
+
+def test_failed_batch_reports_error(batches):
+    batches.setattr(ingest, "STREAM_BATCH_ROWS", 2)
+    write = ingestion.write_stream_batch
+    calls = []
+
+    def failing(rows, lines, report, org_id=1):
+        calls.append(lines)
+        if len(calls) == 2:
+            raise HTTPException(500, {"message": "Error guardando datos: disco lleno"})
+        return write(rows, lines, report, org_id)
+
+    batches.setattr(ingestion, "write_stream_batch", failing)
+    *acks, final = _acks(b"".join(_sale(f"STR-E{i}") for i in range(5)))
+
+    # Solo se confirma el primer lote; el resto del cuerpo no se lee
+    assert [(a["first_line"], a["last_line"]) for a in acks] == [(1, 2)]
+    assert final["final"] and final["error"] == "Error guardando datos: disco lleno"
+    assert (final["inserted"], final["batch"]) == (2, 1)
+
+
+def test_stream_endpoint(batches, client):
+    r = client.post("/api/ingest/stream", content=_sale("STR-H1") + b"roto\n")
+    assert r.status_code == 200 and r.headers["content-type"] == "application/x-ndjson"
+    *acks, final = [json.loads(line) for line in r.text.splitlines()]
+    assert len(acks) == 1 and final["final"]
+    assert (final["inserted"], final["errors"]) == (1, 1)
@@ -0,0 +1,77 @@
+# apps/api/tests/test_ingest_upload.py
+import pytest
+from sqlalchemy import func, select
+
+from app import db as database
+from app import ingestion, models
+from app.routers import ingest
+
+HEADER = b"exp_id,date,category,description,amount_gross,vat_rate,payment_method\n"
+
+
+def _csv(prefix, n):
+    return HEADER + b"".join(
+        f"{prefix}{i},2024-04-0{i},luz,,{10 * i},0.21,tarjeta\n".encode() for i in range(1, n + 1)
+    )
+
+
+def _stored(prefix):
+    with database.SessionLocal() as db:
+        return db.scalar(select(func.count()).where(models.Expense.id.like(f"{prefix}%")))
+
+
+@pytest.fixture
+def frames(monkeypatch):
+    """Bloques de 2 filas; registra los bloques escritos y puede fallar el n-ésimo."""
+    monkeypatch.setattr(ingest, "CHUNK_ROWS", 2)
+    write = ingestion._write_frame
+    state = {"sizes": [], "fail_at": None}
+
+    def spy(kind, df, db, org_id=1):
+        state["sizes"].append(len(df))
+        if len(state["sizes"]) == state["fail_at"]:
+            raise RuntimeError("disco lleno")
+        return write(kind, df, db, org_id)
+
+    monkeypatch.setattr(ingestion, "_write_frame", spy)
+    return state
+
+
+def _upload(client, name, body, query=""):
+    return client.post(f"/api/ingest/upload?kind=expenses{query}", files={"file": (name, body, "text/csv")})
+
+
+def test_upload_is_chunked_by_default(client, frames):
+    r = _upload(client, "chunked.csv", _csv("CH", 5))
+    assert r.status_code == 200
+    assert (r.json()["rows_in_file"], r.json()["inserted"]) == (5, 5)
+    assert frames["sizes"] == [2, 2, 1]
+
+
+def test_chunk_failure_reports_committed_progress(client, frames):
+    frames["fail_at"] = 2
+    body = _csv("PF", 5)
+    r = _upload(client, "partial.csv", body)
+    assert r.status_code == 500
+    detail = r.json()["detail"]
+    assert "disco lleno" in detail["message"]
+    assert detail["committed"]["inserted"] == 2
+    assert detail["last_committed_line"] == 3  # cabecera + 2 filas
+    assert _stored("PF") == 2
+
+    # El fichero no quedó registrado: el reintento salta lo ya escrito
+    frames["fail_at"] = None
+    r = _upload(client, "partial.csv", body)
+    assert r.status_code == 200
+    assert (r.json()["inserted"], r.json()["skipped"]) == (3, 2)
+    assert _stored("PF") == 5
+
+
+def test_unchunked_upload_is_all_or_nothing(client, frames):
+    frames["fail_at"] = 1
+    r = _upload(client, "whole.csv", _csv("WH", 5), "&stream=false")
+    assert r.status_code == 500
+    assert r.json()["detail"]["committed"]["inserted"] == 0
+    assert r.json()["detail"]["last_committed_line"] is None
+    assert frames["sizes"] == [5]
+    assert _stored("WH") == 0
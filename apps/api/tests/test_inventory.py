@@ -0,0 +1,32 @@
+# apps/api/tests/test_inventory.py
+import pandas as pd
+
+from app.routers.inventory import reorder_table
+
+
+def test_reorder_table_on_known_history():
+    inv = pd.DataFrame({
+        "product_id": ["P2", "P1", "P3"],
+        "name": ["Té", "Café", "Azúcar"],
+        "stock_on_hand": [50, 10, 1],
+        "lead_time_days": [2, 5, None],
+        "safety_stock": [0, 3, 4],
+    })
+    # 30 días de ventana: P1 vende 2/día, P2 1/día, P3 nada
+    hist = pd.DataFrame({"product_id": ["P1", "P2"], "quantity": [60.0, 30.0]})
+
+    out = reorder_table(inv, hist, h=7, window=30)
+
+    assert list(out.columns) == [
+        "product_id", "name", "demand_h", "stock_on_hand", "lead_time_days",
+        "safety_stock", "reorder_point", "reorder_qty",
+    ]
+    rows = {r["product_id"]: r for r in out.to_dict(orient="records")}
+    # P1: punto de pedido 2*5+3 = 13 >= stock 10 -> pedir ceil(13 + 14 - 10)
+    assert (rows["P1"]["demand_h"], rows["P1"]["reorder_point"], rows["P1"]["reorder_qty"]) == (14.0, 13.0, 17)
+    # P2: stock por encima del punto de pedido (2) -> nada
+    assert (rows["P2"]["demand_h"], rows["P2"]["reorder_point"], rows["P2"]["reorder_qty"]) == (7.0, 2.0, 0)
+    # P3: sin ventas ni plazo, solo cubre el stock de seguridad
+    assert (rows["P3"]["demand_h"], rows["P3"]["reorder_point"], rows["P3"]["reorder_qty"]) == (0.0, 4.0, 3)
+    # Lo más urgente primero
+    assert out["product_id"].tolist() == ["P1", "P3", "P2"]
@@ -0,0 +1,23 @@
+# apps/api/tests/test_metrics.py
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app import metrics
+
+
+def test_instrument_engine_survives_failed_statements(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'm.db'}")
+    metrics.instrument_engine(engine, "test-fallos")
+    before = metrics.SQL_QUERIES._values.get(("test-fallos",), 0.0)
+
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM no_existe"))
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+        # Las sentencias fallidas no dejan tiempos de inicio en la conexión
+        assert not conn.info.get("leaf_t0")
+
+    # Solo cuenta la que terminó
+    assert metrics.SQL_QUERIES._values[("test-fallos",)] == before + 1
@@ -0,0 +1,78 @@
+# apps/api/tests/test_migrate.py
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from app import models
+from app.bulk import bulk_upsert
+from app.db import Base
+from app.migrate import migrate
+
+# `inventory` tal y como la creaba el esquema original (sin clave única)
+BASELINE_INVENTORY = """
+CREATE TABLE inventory (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    org_id INTEGER REFERENCES orgs (id),
+    product_id VARCHAR(60) NOT NULL REFERENCES products (id),
+    name VARCHAR(200),
+    demand_h FLOAT,
+    stock_on_hand FLOAT,
+    lead_time_days INTEGER,
+    safety_stock FLOAT
+)
+"""
+
+
+def _baseline(engine) -> None:
+    tables = [t for t in Base.metadata.sorted_tables if t.name != "inventory"]
+    Base.metadata.create_all(bind=engine, tables=tables)
+    with engine.begin() as conn:
+        conn.execute(text(BASELINE_INVENTORY))
+        conn.execute(text("INSERT INTO orgs (id, name) VALUES (1, 'Tienda')"))
+        conn.execute(text("INSERT INTO products (id, name, unit_cost, vat_rate) VALUES ('P1', 'Café', 1, 0.1), ('P2', 'Té', 1, 0.1)"))
+        conn.execute(text(
+            "INSERT INTO inventory (org_id, product_id, stock_on_hand) "
+            "VALUES (1, 'P1', 5), (1, 'P1', 7), (1, 'P2', 3)"
+        ))
+
+
+def test_migrate_upgrades_baseline_inventory(engine):
+    _baseline(engine)
+    migrate(engine)
+
+    indexes = {i["name"]: i for i in inspect(engine).get_indexes("inventory")}
+    assert indexes["uq_inventory_org_product"]["unique"]
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT product_id, stock_on_hand FROM inventory ORDER BY product_id"
+        )).all()
+    # Se conserva la fila más reciente de cada producto
+    assert rows == [("P1", 7), ("P2", 3)]
+
+    # El upsert de la ingesta ya tiene objetivo para ON CONFLICT
+    with Session(engine) as db:
+        ins, upd = bulk_upsert(db, models.Inventory, [
+            {"org_id": 1, "product_id": "P1", "stock_on_hand": 9.0},
+            {"org_id": 1, "product_id": "P2", "stock_on_hand": 1.0},
+        ], keys=["org_id", "product_id"])
+        db.commit()
+    assert (ins, upd) == (0, 2)
+
+
+def test_migrate_is_idempotent(engine):
+    migrate(engine)
+    migrate(engine)
+    uniques = [i for i in inspect(engine).get_indexes("inventory") if i["unique"]]
+    assert uniques == []  # en una BD nueva basta la UNIQUE de la tabla
+    assert inspect(engine).get_unique_constraints("inventory")
+
+
+def test_migrate_adds_org_date_indexes(engine):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_transactions_org_date"))
+        conn.execute(text("DROP INDEX ix_expenses_org_date"))
+    migrate(engine)
+
+    for table in ("transactions", "expenses"):
+        indexes = {i["name"]: i["column_names"] for i in inspect(engine).get_indexes(table)}
+        assert indexes[f"ix_{table}_org_date"] == ["org_id", "date"]
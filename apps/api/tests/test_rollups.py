@@ -0,0 +1,61 @@
+# apps/api/tests/test_rollups.py
+from sqlalchemy import select
+
+from app import db as database
+from app import models, rollups
+
+HEADER = b"txn_id,date,product_id,quantity,unit_price_gross,discount,payment_method,vat_rate\n"
+
+
+def _upload(client, name, lines):
+    body = HEADER + b"".join(line.encode() + b"\n" for line in lines)
+    r = client.post("/api/ingest/upload?kind=sales", files={"file": (name, body, "text/csv")})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _daily(org_id=1):
+    D = models.DailySales
+    with database.SessionLocal() as db:
+        rows = db.execute(
+            select(D.date, D.product_id, D.revenue, D.cogs, D.quantity)
+            .where(D.org_id == org_id, D.product_id.like("ROLL-%"))
+            .order_by(D.date, D.product_id)
+        ).all()
+    return [(d, p, round(r, 6), round(c, 6), q) for d, p, r, c, q in rows]
+
+
+def test_new_sales_add_deltas_and_updates_refresh(client, monkeypatch):
+    refreshed = []
+    refresh = rollups.refresh_sales_days
+
+    def spy(db, org_id, days):
+        refreshed.append(set(days))
+        refresh(db, org_id, days)
+
+    monkeypatch.setattr(rollups, "refresh_sales_days", spy)
+
+    _upload(client, "roll-1.csv", [
+        "R1,2024-06-01,ROLL-A,1,10,0,efectivo,0.21",
+        "R2,2024-06-01,ROLL-B,2,5,1,efectivo,0.21",
+    ])
+    _upload(client, "roll-2.csv", [
+        "R3,2024-06-01,ROLL-A,3,10,0,efectivo,0.21",
+        "R4,2024-06-02,ROLL-A,1,10,0,efectivo,0.21",
+    ])
+    # Solo filas nuevas: ningún día se recalcula entero
+    assert all(not days for days in refreshed)
+
+    # R1 cambia de cantidad y de día: se recalculan su día anterior y el nuevo
+    _upload(client, "roll-3.csv", ["R1,2024-06-02,ROLL-A,2,10,0,efectivo,0.21"])
+    assert {d.isoformat() for d in refreshed[-1]} == {"2024-06-01", "2024-06-02"}
+
+    incremental = _daily()
+    with database.SessionLocal() as db:
+        rollups.rebuild(db, 1)
+    assert incremental == _daily()
+    assert [(str(d), p, r, q) for d, p, r, _, q in incremental] == [
+        ("2024-06-01", "ROLL-A", 30.0, 3.0),
+        ("2024-06-01", "ROLL-B", 9.0, 2.0),
+        ("2024-06-02", "ROLL-A", 30.0, 3.0),
+    ]
@@ -0,0 +1,112 @@
+# apps/api/tests/test_sales.py
+from datetime import date
+
+import pytest
+
+from app import db as database
+from app import models
+
+ORG = 11
+
+# (día, producto, ingresos, cogs)
+SALES = [
+    (1, "SAL-A", 100.0, 40.0), (1, "SAL-B", 20.0, 5.0),
+    (2, "SAL-C", 55.0, 30.0),
+    (3, "SAL-A", 10.0, 4.0), (3, "SAL-B", 80.0, 20.0),
+]
+
+
+@pytest.fixture(scope="module")
+def org(client):
+    with database.SessionLocal() as db:
+        db.add(models.Org(id=ORG, name="Ventas"))
+        db.add_all([
+            models.Product(id="SAL-A", org_id=ORG, name="Café", category="bebidas", unit_cost=1.0, vat_rate=0.1),
+            models.Product(id="SAL-B", org_id=ORG, name="Té", category="bebidas", unit_cost=1.0, vat_rate=0.1),
+            models.Product(id="SAL-C", org_id=ORG, name="Tarta", category=None, unit_cost=1.0, vat_rate=0.1),
+        ])
+        db.flush()
+        db.add_all([
+            models.DailySales(org_id=ORG, date=date(2024, 8, d), product_id=p, revenue=r, cogs=c, quantity=1.0)
+            for d, p, r, c in SALES
+        ])
+        db.add(models.DailyExpense(org_id=ORG, date=date(2024, 8, 2), amount_gross=35.0))
+        db.commit()
+    return ORG
+
+
+def _get(client, path):
+    sep = "&" if "?" in path else "?"
+    r = client.get(f"/api/sales/{path}{sep}org_id={ORG}")
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_dashboard_matches_separate_endpoints(client, org):
+    dash = _get(client, "dashboard?limit=2")
+    assert dash["kpi"] == _get(client, "kpi")
+    assert dash["timeseries"] == _get(client, "timeseries")
+    assert dash["top_products"] == _get(client, "top-products?limit=2")
+    assert dash["by_category"] == _get(client, "by-category?limit=2")
+
+    assert dash["kpi"] == {
+        "ingresos_neto": 265.0, "cogs_neto": 99.0, "margen_bruto": 166.0,
+        "gastos_neto": 35.0, "beneficio_neto": 131.0,
+    }
+    assert dash["top_products"] == [{"name": "Café", "value": 110.0}, {"name": "Té", "value": 100.0}]
+    assert dash["by_category"] == [{"name": "bebidas", "value": 210.0}, {"name": "Sin categoría", "value": 55.0}]
+    assert [p["beneficio"] for p in dash["timeseries"]] == [75.0, -10.0, 66.0]
+
+
+@pytest.fixture(scope="module")
+def batch_orgs(org):
+    # org_id -> (ingresos, cogs, gastos); la 19 no tiene datos en el periodo
+    data = {17: (400.0, 100.0, 0.0), 18: (50.0, 10.0, 100.0), 19: None}
+    with database.SessionLocal() as db:
+        for o, vals in data.items():
+            db.add(models.Org(id=o, name=f"Tienda {o}"))
+            if vals is None:
+                continue
+            db.add(models.Product(id=f"KB-{o}", org_id=o, name="Pan", unit_cost=1.0, vat_rate=0.1))
+            db.flush()
+            db.add(models.DailySales(org_id=o, date=date(2024, 8, 2), product_id=f"KB-{o}",
+                                     revenue=vals[0], cogs=vals[1], quantity=1.0))
+            if vals[2]:
+                db.add(models.DailyExpense(org_id=o, date=date(2024, 8, 2), amount_gross=vals[2]))
+        db.commit()
+    return f"{ORG},17,18,19"
+
+
+def _batch(client, org_ids, **params):
+    r = client.get("/api/sales/kpi/batch", params={"org_ids": org_ids, **params})
+    assert r.status_code == 200, r.text
+    page = r.json()
+    return page["total"], [i["org_id"] for i in page["items"]], page["items"]
+
+
+def test_kpi_batch_sort_and_pagination(client, batch_orgs):
+    total, ids, items = _batch(client, batch_orgs)
+    assert (total, ids) == (4, [ORG, 17, 18, 19])
+    assert items[0]["beneficio_neto"] == 131.0  # 265 - 99 - 35
+    assert items[3]["ingresos_neto"] == 0.0
+
+    assert _batch(client, batch_orgs, sort="beneficio_neto")[1] == [18, 19, ORG, 17]
+    assert _batch(client, batch_orgs, sort="ingresos_neto", order="desc")[1] == [17, ORG, 18, 19]
+
+    total, ids, _ = _batch(client, batch_orgs, sort="ingresos_neto", order="desc", limit=2, offset=1)
+    assert (total, ids) == (4, [ORG, 18])
+    assert _batch(client, batch_orgs, offset=10)[:2] == (4, [])
+
+
+@pytest.mark.parametrize("path", ["timeseries", "cashflow"])
+def test_columnar_round_trip(client, org, path):
+    rows = _get(client, path)
+    cols = _get(client, f"{path}?format=columnar")
+    assert cols["dates"] == [p["date"] for p in rows]
+    rebuilt = [
+        {k: (d if k == "date" else cols[k][i]) for k in rows[0]}
+        for i, d in enumerate(cols["dates"])
+    ]
+    assert rebuilt == rows
+    assert rows[1] == {"date": "2024-08-02", "ingresos": 55.0, "gastos": 35.0, "cogs": 30.0,
+                       "beneficio": -10.0, "margen_bruto": 25.0}
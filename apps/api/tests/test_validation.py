@@ -0,0 +1,28 @@
+# apps/api/tests/test_validation.py
+import os
+import time
+
+import pandas as pd
+
+from app import validation
+
+
+def test_new_report_sweeps_expired_ones(tmp_path):
+    old, recent = tmp_path / "viejo.csv", tmp_path / "reciente.csv"
+    old.write_text("linea,motivo\n")
+    recent.write_text("linea,motivo\n")
+    eight_days_ago = time.time() - 8 * 86400
+    os.utime(old, (eight_days_ago, eight_days_ago))
+
+    report = validation.RejectReport(tmp_path)
+    report.add(pd.DataFrame({validation.LINE_COLUMN: [2], validation.REASON_COLUMN: ["x"]}))
+
+    assert not old.exists()
+    assert recent.exists() and report.path.exists()
+    # Un segundo bloque del mismo informe no vuelve a recorrer el directorio
+    old.write_text("linea,motivo\n")
+    os.utime(old, (eight_days_ago, eight_days_ago))
+    report.add(pd.DataFrame({validation.LINE_COLUMN: [3], validation.REASON_COLUMN: ["x"]}))
+    assert old.exists() and report.rows == 2
+
+    assert validation.sweep_reports(tmp_path, max_age_days=7) == 1